@@ -3,7 +3,8 @@ import pandas as pd
 import modules.utils as utils
 import modules.auth as auth
 # Importamos las funciones de carga desde tu data_loader actualizado
-from modules.data_loader import cargar_base_datos, cargar_metadata_jugadores, cargar_catalogo_equipos
+from modules.data_loader import cargar_datos_iniciales, cargar_base_datos
+from modules.data_loader import particion_master, declarar_columnas, columnas_para, columnas_master, TABLA_MASTER, TABLA_PLAYERS, TABLA_ROSTERS
 
 # Importamos las Vistas
 import views.players_avg as view_players_avg
@@ -12,6 +13,9 @@ import views.equipos_smry as view_equipos_smry
 import views.equipos_4f as view_equipos_4f
 import views.players_prfl as view_players_prfl
 
+# Columnas que usa main.py además de las que declara cada vista al importarse
+declarar_columnas(TABLA_MASTER, ['Categoria', 'equipo_nombre'])
+
 # 1. Configuración Global
 st.set_page_config(
     page_title="Analytics Liga ABE — GravityStats x Nada Está en el Aire",
@@ -35,22 +39,31 @@ if 'selected_player_id' not in st.session_state:
 if 'view_mode' not in st.session_state:
     st.session_state.view_mode = 'main' # 'main' o 'profile'
 
-# 3. Carga de Datos Global
+# 3. Carga de Datos Global (stats, metadata y catálogo en paralelo)
 try:
     with st.spinner('Cargando base de datos...'):
-        # A) Carga de Stats (Games) - Carril A
-        df_raw = cargar_base_datos()
-        
-        # B) Carga de Metadata (Bio y Rosters) desde Supabase - Carril C (Nuevo)
-        df_players, df_rosters = cargar_metadata_jugadores()
-        
-        # C) Carga de Catálogo de Equipos
-        df_equipos_cat = cargar_catalogo_equipos()
+        barra_carga = st.empty()
+        datos, errores_carga = cargar_datos_iniciales(
+            columnas_master=columnas_master(),
+            columnas_players=columnas_para(TABLA_PLAYERS),
+            columnas_rosters=columnas_para(TABLA_ROSTERS),
+            on_progress=lambda hechos, total: barra_carga.progress(hechos / total, text=f"Descargando bloque {hechos} de {total}"),
+        )
+        barra_carga.empty()
+
+    # A) Stats (Games) - Carril A | B) Metadata (Bio y Rosters) - Carril C | C) Catálogo de Equipos
+    df_raw = datos['master'][0]  # Hechos jugador-juego (los de equipo se unen en cada vista)
+    df_players, df_rosters = datos['metadata']
+    df_equipos_cat = datos['catalogo']
 
 except Exception as e:
     st.error(f"Error técnico cargando datos: {e}")
     st.stop()
 
+# Una fuente caída no tumba a las demás: solo avisamos
+for fuente, error in errores_carga.items():
+    st.warning(f"⚠️ No se pudo cargar '{fuente}': {error}")
+
 # 4. Sidebar y Navegación
 st.sidebar.image("GravityStats_Logo.png", width=300)
 st.sidebar.markdown(
@@ -68,16 +81,20 @@ opciones_cat = ["Femenil D1", "Varonil D1"]
 categoria_sel = st.sidebar.selectbox("Categoría:", opciones_cat, index=0)
 utils.rastrear_cambio("Categoría Seleccionada", categoria_sel)
 
-# Filtrado Global del DataFrame de Jugadores (Game Logs)
-if not df_raw.empty:
-    df = df_raw[df_raw['Categoria'] == categoria_sel].copy()
-else:
-    df = pd.DataFrame()
+# Filtrado Global del DataFrame de Jugadores (Game Logs): partición compartida, ya con alias de equipo
+df = particion_master(columnas_master(), categoria_sel)
 
 # Aviso si no hay jugadores
 if df.empty:
     st.sidebar.warning(f"No hay datos de stats para {categoria_sel}.")
 
+# Edad de las stats (el master): al vencer el TTL se sigue mostrando la versión vigente mientras se refresca.
+# Solo el master: que el catálogo o la metadata (TTL de 1 h) sean más viejos no hace viejas a las stats.
+segundos, refrescando = cargar_base_datos.antiguedad()
+if segundos is not None:
+    edad_txt = "hace menos de 1 min" if segundos < 60 else f"hace {int(segundos // 60)} min"
+    st.sidebar.caption(f"🕒 Stats actualizadas {edad_txt}" + (" · actualizando..." if refrescando else ""))
+
 st.sidebar.divider()
 
 # --- CALLBACK PARA RESETEAR LA VISTA ---
@@ -93,26 +110,6 @@ opcion = st.sidebar.radio(
 )
 utils.rastrear_cambio("Vista Principal", opcion)
 
-# --- LIMPIEZA DE NOMBRES (Alias) ---
-alias_equipos = {
-    "ANAHUAC QUERETARO": "Anáhuac QRO", "ANAHUAC XALAPA": "Anáhuac XAL",
-    "AUTONOMA DE CHIHUAHUA": "UACH", "CETYS MEXICALI": "CETYS",
-    "CEU MONTERREY": "CEU", "INTERAMERICANA": "Inter",
-    "TEC MTY GUADALAJARA": "Tec GDL", "TEC MTY HIDALGO": "Tec HGO",
-    "TEC MTY MONTERREY": "Tec MTY", "TEC MTY PUEBLA": "Tec PUE",
-    "TEC MTY SANTA FE": "Tec CSF", "TEC MTY TOLUCA": "Tec TOL",
-    "UANE": "UANE", "UANL": "UANL", "UDLAP": "UDLAP",
-    "UMAD": "UMAD", "UNIVERSIDAD MONTRER": "Montrer",
-    "UP MEXICO": "UP MX", "UPAEP": "UPAEP",
-    "ANAHUAC NORTE": "Anáhuac NTE", "CETYS TIJUANA": "CETYS",
-    "MODELO MERIDA": "Modelo", "TEC MTY AGUASCALIENTES": "Tec AGS",
-    "TEC MTY CEM": "Tec CEM", "TEC MTY QUERETARO": "Tec QRO",
-    "UVAQ MORELIA": "UVAQ"
-}
-
-if not df.empty:
-    df['equipo_nombre'] = df['equipo_nombre'].replace(alias_equipos)
-
 # 5. Enrutador de Vistas (LÓGICA DRILL-DOWN)
 
 # A) Si estamos en modo Perfil, mostramos SOLO el perfil (Overlay)
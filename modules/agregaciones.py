@@ -0,0 +1,575 @@
+# modules/agregaciones.py
+"""
+Agregaciones por ventana ("últimos X juegos") de players_avg, players_adv, equipos_smry y equipos_4f.
+Camino por defecto: pandas sobre las particiones en memoria. Para jugadores, ventanas_jugador()
+arma una vez por versión de datos las sumas acumuladas de cada jugador (juegos del más reciente
+al más viejo); cualquier ventana sale de restar dos filas por jugador, sin ordenar ni agrupar.
+Para equipos, juegos_equipo() es la tabla equipo-juego compartida (puntos, W/L, posesiones) y
+CuboEquipos guarda sobre ella equipos x ventanas x métricas (con rankings) ya calculados.
+Camino opcional (SQL pushdown): con ABE_DATABASE_URL (o st.secrets["postgres"]["url"]) la misma
+agregación corre en Postgres con ROW_NUMBER() OVER (...) y solo viajan las filas agregadas.
+Si la base no está configurada o la consulta falla, las funciones *_sql regresan None y la vista
+sigue por pandas.
+Verificación contra el camino pandas (Postgres local, o sqlite sin servidor):
+    python -m modules.agregaciones --verificar postgresql://usuario@localhost/abe [--sembrar N]
+Verificación de que un refresco sin cambios en la fuente configurada no invalida lo derivado:
+    python -m modules.agregaciones --refresco
+"""
+import sys
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from modules.almacen import derivado, version
+from modules.fuentes import url_postgres, motor_postgres
+from modules.data_loader import (TABLA_MASTER, tipo_columna, sanitizar_master, compactar_tipos, con_datos_de_equipo,
+                                 cargar_base_datos, columnas_master, particion_master, particion_equipos, particionar,
+                                 alias_sin_choques, separar_hechos, unir_equipo, es_columna_equipo, LLAVE_MASTER, LLAVE_EQUIPO)
+
+try:
+    import sqlalchemy as sa  # Opcional: sin él solo existe el camino pandas
+except ImportError:
+    sa = None
+
+log = logging.getLogger(__name__)
+
+# --- CONFIGURACIÓN ---
+LLAVES_JUGADOR = ['id_player', 'Nombre', 'equipo_nombre']
+COLS_BOOLEANAS = {'starter'}  # En Postgres puede ser boolean: se castea vía entero
+
+AGG_PROMEDIOS = {
+    'sPoints': 'mean', 'sReboundsTotal': 'mean', 'sAssists': 'mean',
+    'sThreePointersMade': 'mean', 'sMinutes': 'mean', 'starter': 'sum',
+    'sFieldGoalsMade': 'mean', 'sFieldGoalsAttempted': 'mean',
+    'sTwoPointersMade': 'mean', 'sTwoPointersAttempted': 'mean',
+    'sThreePointersAttempted': 'mean', 'sFreeThrowsMade': 'mean',
+    'sFreeThrowsAttempted': 'mean', 'sReboundsOffensive': 'mean',
+    'sReboundsDefensive': 'mean', 'sTurnovers': 'mean', 'sSteals': 'mean',
+    'sBlocks': 'mean', 'sFoulsPersonal': 'mean', 'sFoulsOn': 'mean',
+    'id_abe': 'count'
+}
+
+AGG_TOTALES = {
+    'id_abe': 'count', 'sMinutes': 'sum', 'starter': 'sum',
+    'sPoints': 'sum', 'sFieldGoalsMade': 'sum', 'sFieldGoalsAttempted': 'sum',
+    'sThreePointersMade': 'sum', 'sTwoPointersMade': 'sum',
+    'sFreeThrowsMade': 'sum', 'sFreeThrowsAttempted': 'sum',
+    'sReboundsOffensive': 'sum', 'sReboundsDefensive': 'sum', 'sReboundsTotal': 'sum',
+    'sAssists': 'sum', 'sTurnovers': 'sum', 'sSteals': 'sum', 'sBlocks': 'sum',
+    'sFoulsPersonal': 'sum',
+    'Tm_FGA': 'sum', 'Tm_FTA': 'sum', 'Tm_TOV': 'sum', 'Tm_MIN': 'sum',
+    'Tm_FG': 'sum', 'Tm_ORB': 'sum', 'Tm_DRB': 'sum', 'Tm_TRB': 'sum',
+    'Tm_AST': 'sum', 'Tm_STL': 'sum', 'Tm_BLK': 'sum', 'Tm_3PM': 'sum',
+    'Tm_FTM': 'sum', 'Tm_2PM': 'sum', 'Tm_3PA': 'sum', 'Tm_PF': 'sum',
+    'Opp_DRB': 'sum', 'Opp_ORB': 'sum', 'Opp_TRB': 'sum', 'Opp_FGA': 'sum', 'Opp_FG': 'sum', 'Opp_3PA': 'sum', 'Opp_3PM': 'sum',
+    'Opp_PF': 'sum', 'Opp_FTA': 'sum', 'Opp_FTM': 'sum', 'Opp_TOV': 'sum', 'Opp_MIN': 'sum'
+}
+
+COLS_CHECK_4F = [
+    'Tm_Score', 'Tm_FG', 'Tm_FGA', 'Tm_3PM', 'Tm_FTM', 'Tm_FTA', 'Tm_ORB', 'Tm_DRB', 'Tm_TOV',
+    'Opp_Score', 'Opp_FG', 'Opp_FGA', 'Opp_3PM', 'Opp_FTM', 'Opp_FTA', 'Opp_ORB', 'Opp_DRB', 'Opp_TOV'
+]
+COLS_SUMA_4F = [
+    'W', 'L', 'Tm_PTS', 'Opp_PTS', 'Tm_Poss', 'Opp_Poss',
+    'Tm_FG', 'Tm_FGA', 'Tm_3PM', 'Tm_FTM', 'Tm_FTA', 'Tm_TOV', 'Tm_ORB', 'Tm_DRB',
+    'Opp_FG', 'Opp_FGA', 'Opp_3PM', 'Opp_FTM', 'Opp_FTA', 'Opp_TOV', 'Opp_ORB', 'Opp_DRB'
+]
+
+# --- CAMINO PANDAS ---
+def ultimos_juegos_jugador(df_view, ventana=None):
+    """Juegos con minutos de cada jugador; con `ventana`, solo sus últimos `ventana` (desempate por id_abe)."""
+    df_juegos = df_view[df_view['sMinutes'] > 0]
+    if ventana is not None:
+        df_juegos = df_juegos.sort_values(['Fecha', 'id_abe'], ascending=False, kind='stable')
+        df_juegos = df_juegos.groupby('id_player').head(ventana)
+    return df_juegos
+
+def promedios_por_jugador(df_juegos):
+    """Promedios por partido (y titularidades, juegos) de players_avg."""
+    return df_juegos.groupby(LLAVES_JUGADOR, observed=True).agg(AGG_PROMEDIOS).reset_index()
+
+def totales_por_jugador(df_juegos):
+    """Totales de jugador y de su equipo en los mismos juegos (players_adv); requiere columnas Tm_*/Opp_*."""
+    return df_juegos.groupby(LLAVES_JUGADOR, observed=True).agg(AGG_TOTALES).reset_index()
+
+def four_factors_por_equipo(df_teams, ventana):
+    """Sumas por equipo de sus últimos `ventana` juegos: puntos, W/L, posesiones y conteos de Four Factors."""
+    df_games = tabla_juegos_equipo(df_teams)
+
+    # Agregación (Sumar)
+    df_sorted = df_games.sort_values(['equipo_nombre', 'Fecha', 'id_abe'], ascending=[True, False, False], kind='stable')
+    df_window = df_sorted.groupby('equipo_nombre', observed=True).head(ventana)
+
+    agg_dict = {c: 'sum' for c in COLS_SUMA_4F if c in df_window.columns}
+    return df_window.groupby('equipo_nombre', observed=True).agg(agg_dict).reset_index()
+
+# --- TABLA DE HECHOS EQUIPO-JUEGO ---
+def tabla_juegos_equipo(df_teams):
+    """
+    Hechos equipo-juego: box score con nulos en 0, puntos (Score o reconstruidos), W/L, posesiones
+    propias y del rival, y número de juego de cada equipo (1 = el primero). Orden: equipo, Fecha, id_abe.
+    """
+    # Preparación de Datos (Rellenar Nulos)
+    df_games = df_teams.copy()
+    for c in COLS_CHECK_4F:
+        if c not in df_games.columns: df_games[c] = 0.0
+        else: df_games[c] = df_games[c].fillna(0)
+
+    # Calcular PTS si hace falta
+    if 'Tm_Score' in df_games.columns and df_games['Tm_Score'].sum() > 0:
+        df_games['Tm_PTS'] = df_games['Tm_Score']
+    else:
+        df_games['Tm_PTS'] = (2 * df_games['Tm_FG']) + df_games['Tm_3PM'] + df_games['Tm_FTM']
+
+    if 'Opp_Score' in df_games.columns and df_games['Opp_Score'].sum() > 0:
+        df_games['Opp_PTS'] = df_games['Opp_Score']
+    else:
+        df_games['Opp_PTS'] = (2 * df_games['Opp_FG']) + df_games['Opp_3PM'] + df_games['Opp_FTM']
+
+    df_games['W'] = np.where(df_games['Tm_PTS'] > df_games['Opp_PTS'], 1, 0)
+    df_games['L'] = np.where(df_games['Tm_PTS'] < df_games['Opp_PTS'], 1, 0)
+
+    # Posesiones (Fórmula Original)
+    # Equipo
+    denom_orb = df_games['Tm_ORB'] + df_games['Opp_DRB']
+    orb_pct = np.divide(df_games['Tm_ORB'], denom_orb, out=np.zeros_like(df_games['Tm_ORB'], dtype=float), where=denom_orb!=0)
+    missed_fg = df_games['Tm_FGA'] - df_games['Tm_FG']
+    df_games['Tm_Poss'] = (df_games['Tm_FGA'] - (orb_pct * missed_fg * 1.07) + df_games['Tm_TOV'] + (0.4 * df_games['Tm_FTA']))
+
+    # Rival
+    denom_orb_opp = df_games['Opp_ORB'] + df_games['Tm_DRB']
+    orb_pct_opp = np.divide(df_games['Opp_ORB'], denom_orb_opp, out=np.zeros_like(df_games['Opp_ORB'], dtype=float), where=denom_orb_opp!=0)
+    opp_missed_fg = df_games['Opp_FGA'] - df_games['Opp_FG']
+    df_games['Opp_Poss'] = (df_games['Opp_FGA'] - (orb_pct_opp * opp_missed_fg * 1.07) + df_games['Opp_TOV'] + (0.4 * df_games['Opp_FTA']))
+
+    # Número de juego (cronológico, desempate por id_abe)
+    df_games = df_games.sort_values(['equipo_nombre', 'Fecha', 'id_abe'], kind='stable', ignore_index=True)
+    df_games['Juego'] = df_games.groupby('equipo_nombre', observed=True).cumcount() + 1
+    return df_games
+
+def juegos_equipo(categoria):
+    """Tabla equipo-juego de una categoría, una vez por versión de datos (compartida: solo lectura)."""
+    def construir():
+        df_teams = particion_equipos(columnas_master(), categoria)
+        return df_teams if df_teams.empty else tabla_juegos_equipo(df_teams)
+    return derivado(('juegos_equipo', categoria), construir)
+
+# --- CUBO DE VENTANAS (EQUIPOS) ---
+def rango_min(valores, ascendente=False):
+    """rank(method='min') entre equipos (eje 0) de cada ventana (eje 1); NaN queda NaN."""
+    if ascendente:
+        mejores = valores[None, :, :] < valores[:, None, :]
+    else:
+        mejores = valores[None, :, :] > valores[:, None, :]
+    return np.where(np.isnan(valores), np.nan, 1.0 + mejores.sum(axis=1))
+
+class CuboEquipos:
+    """
+    Sumas de los últimos 1..max_juegos juegos de cada equipo (Fecha e id_abe descendentes), como
+    arreglos equipos x ventanas en `datos` (más 'GP'). Las métricas y rankings se agregan una vez
+    sobre todas las ventanas; tabla(ventana) solo rebana una columna de cada arreglo.
+    """
+    def __init__(self, df_juegos, columnas):
+        df = df_juegos.sort_values(['equipo_nombre', 'Fecha', 'id_abe'], ascending=[True, False, False], kind='stable')
+        por_equipo = df.groupby('equipo_nombre', observed=True)
+        equipo = por_equipo.ngroup().to_numpy()
+        rango = por_equipo.cumcount().to_numpy()  # 0 = juego más reciente
+        self.equipos = df['equipo_nombre'].drop_duplicates().reset_index(drop=True)
+        self.max_juegos = int(rango.max()) + 1 if len(rango) else 1
+
+        columnas = [c for c in columnas if c in df.columns]
+        juegos = np.zeros((len(self.equipos), self.max_juegos, len(columnas)))
+        # Como la suma de pandas, los nulos no cuentan; después del último juego la suma ya no cambia
+        juegos[equipo, rango] = np.nan_to_num(df[columnas].to_numpy(dtype=float, na_value=np.nan))
+        acumulado = np.cumsum(juegos, axis=1)
+        self.datos = {}
+        for k, col in enumerate(columnas):
+            entero = pd.api.types.is_integer_dtype(df[col]) or pd.api.types.is_bool_dtype(df[col])
+            self.datos[col] = acumulado[:, :, k].astype(np.int64) if entero else acumulado[:, :, k]
+        jugados = np.bincount(equipo, minlength=len(self.equipos))
+        self.datos['GP'] = np.minimum(np.arange(1, self.max_juegos + 1)[None, :], jugados[:, None])
+
+    def indice(self, ventana):
+        """Columna de la ventana `ventana` (más juegos que max_juegos = todos)."""
+        return min(max(int(ventana), 1), self.max_juegos) - 1
+
+    def fija(self, columna, ventana):
+        """`columna` en la ventana `ventana` repetida en todas las ventanas (ej. bloque de últimos 5)."""
+        valores = self.datos[columna][:, [self.indice(ventana)]]
+        return np.repeat(valores, self.max_juegos, axis=1)
+
+    def tabla(self, ventana, columnas=None):
+        """DataFrame equipo_nombre + `columnas` (por defecto todas) de los últimos `ventana` juegos."""
+        i = self.indice(ventana)
+        df = pd.DataFrame({c: self.datos[c][:, i] for c in (columnas or self.datos)})
+        df.insert(0, 'equipo_nombre', self.equipos)
+        return df
+
+# --- VENTANAS POR SUMAS PREFIJO (JUGADORES) ---
+class VentanasJugador:
+    """
+    Sumas acumuladas por (id_player, Nombre, equipo_nombre) en el orden de ultimos_juegos_jugador
+    (Fecha e id_abe descendentes). La suma de los últimos N juegos de un grupo es
+    acumulada[fin] - acumulada[inicio], con `fin` el primer juego del grupo cuyo rango es >= N.
+    """
+    def __init__(self, df_juegos, columnas):
+        df = df_juegos.sort_values(['Fecha', 'id_abe'], ascending=False, kind='stable')
+        rango = df.groupby('id_player', observed=True).cumcount().to_numpy()  # 0 = juego más reciente
+        grupo = df.groupby(LLAVES_JUGADOR, observed=True).ngroup().to_numpy()
+        orden = np.lexsort((rango, grupo))
+        self.columnas = [c for c in columnas if c in df.columns]
+        self.tipos = {c: df[c].dtype for c in self.columnas}
+        self.claves = (df.iloc[orden][LLAVES_JUGADOR].drop_duplicates().reset_index(drop=True))
+        self.max_rango = int(rango.max()) + 1 if len(rango) else 1
+
+        grupo, rango = grupo[orden], rango[orden]
+        self.llave_fila = grupo.astype(np.int64) * self.max_rango + rango
+        self.inicio = np.searchsorted(grupo, np.arange(len(self.claves)))
+        valores = df[self.columnas].to_numpy(dtype=float, na_value=np.nan)[orden]
+        nulos = np.isnan(valores)
+        self.acumulada = self._acumular(np.where(nulos, 0.0, valores))
+        # Con nulos, la media es sobre los juegos con dato (como groupby.mean)
+        self.validos = self._acumular(~nulos) if nulos.any() else None
+
+    @staticmethod
+    def _acumular(valores):
+        acumulada = np.zeros((len(valores) + 1, valores.shape[1]))
+        np.cumsum(valores, axis=0, out=acumulada[1:])
+        return acumulada
+
+    def _rangos(self, ventana):
+        n = self.max_rango if ventana is None else min(int(ventana), self.max_rango)
+        grupos = np.arange(len(self.claves), dtype=np.int64)
+        fin = np.searchsorted(self.llave_fila, grupos * self.max_rango + n)
+        return self.inicio, fin
+
+    def agregar(self, ventana, agregaciones):
+        """
+        Equivalente a ultimos_juegos_jugador(df, ventana).groupby(LLAVES_JUGADOR).agg(agregaciones)
+        (solo 'sum', 'mean' y 'count' de id_abe). Las sumas enteras salen en int64.
+        """
+        inicio, fin = self._rangos(ventana)
+        juegos = fin - inicio
+        con_juegos = juegos > 0
+        inicio, fin, juegos = inicio[con_juegos], fin[con_juegos], juegos[con_juegos]
+        resultado = self.acumulada[fin] - self.acumulada[inicio]
+
+        medias = [k for k, c in enumerate(self.columnas) if agregaciones.get(c) == 'mean']
+        if medias:
+            # Con nulos, la media es sobre los juegos con dato (como groupby.mean)
+            n = juegos[:, None] if self.validos is None else self.validos[fin][:, medias] - self.validos[inicio][:, medias]
+            resultado[:, medias] = np.divide(resultado[:, medias], n, out=np.full(resultado[:, medias].shape, np.nan), where=n > 0)
+
+        df = self.claves[con_juegos].reset_index(drop=True)
+        posicion = {c: k for k, c in enumerate(self.columnas)}
+        columnas = {}
+        for col, agg in agregaciones.items():
+            if col == 'id_abe':
+                columnas[col] = juegos
+            elif col in posicion:
+                tipo = self.tipos[col]
+                valores = resultado[:, posicion[col]]
+                if pd.api.types.is_float_dtype(tipo): columnas[col] = valores.astype(tipo)
+                elif agg == 'sum': columnas[col] = valores.astype(np.int64)
+                else: columnas[col] = valores
+        return pd.concat([df, pd.DataFrame(columnas)], axis=1)
+
+    def promedios(self, ventana=None):
+        return self.agregar(ventana, AGG_PROMEDIOS)
+
+    def totales(self, ventana=None):
+        return self.agregar(ventana, AGG_TOTALES)
+
+def juegos_jugadores(categoria, equipo=None):
+    """
+    Game logs de una categoría (y equipo) de la versión vigente, tomados del almacén. Los cálculos
+    guardados por versión leen de aquí y no de un frame capturado antes: pudo publicarse otro.
+    """
+    df = particion_master(columnas_master(), categoria)
+    if equipo is not None and not df.empty:
+        df = df[df['equipo_nombre'] == equipo]
+    return df
+
+def ventanas_jugador(categoria, equipo=None, con_equipo=False):
+    """
+    Índice de ventanas de los juegos con minutos de `categoria` (y `equipo`), construido una vez
+    por versión de datos. Con `con_equipo` se unen antes, una sola vez, las columnas Tm_*/Opp_*
+    de cada juego para sacar los totales de players_adv.
+    """
+    def construir():
+        df_juegos = ultimos_juegos_jugador(juegos_jugadores(categoria, equipo))
+        if con_equipo:
+            df_juegos = con_datos_de_equipo(df_juegos, columnas_master())
+        agregaciones = AGG_TOTALES if con_equipo else AGG_PROMEDIOS
+        return VentanasJugador(df_juegos, [c for c in agregaciones if c != 'id_abe'])
+    return derivado(('ventanas_jugador', categoria, equipo, con_equipo), construir)
+
+# --- CAMINO SQL (PUSHDOWN OPCIONAL) ---
+_sql_no_disponible = threading.Event()  # La base no respondió: el resto del proceso usa pandas
+
+def activo():
+    return sa is not None and not _sql_no_disponible.is_set() and bool(url_postgres())
+
+def _q(col):
+    return f'"{col}"'
+
+def _expr_minutos(col, dialecto):
+    """'MM:SS' (o minutos decimales) -> float en SQL, con las mismas reglas que vectorizar_minutos."""
+    texto = f"CAST({_q(col)} AS TEXT)"
+    if dialecto == 'sqlite':
+        sep = f"instr({texto}, ':')"
+        return (f"(CASE WHEN {sep} > 1 THEN CAST(substr({texto}, 1, {sep} - 1) AS REAL)"
+                f" + CAST(substr({texto}, {sep} + 1) AS REAL) / 60.0"
+                f" ELSE COALESCE(CAST({texto} AS REAL), 0) END)")
+    return (f"(CASE WHEN {texto} ~ '^[0-9]+:[0-9]*(:.*)?$'"
+            f" THEN CAST(split_part({texto}, ':', 1) AS DOUBLE PRECISION)"
+            f" + CAST(COALESCE(NULLIF(split_part({texto}, ':', 2), ''), '0') AS DOUBLE PRECISION) / 60.0"
+            f" WHEN {texto} ~ '^-?[0-9]*\\.?[0-9]+$' THEN CAST({texto} AS DOUBLE PRECISION)"
+            f" ELSE 0 END)")
+
+def _expr_numero(col, dialecto):
+    """Columna numérica como en sanitizar_master: minutos a decimal y nulos a 0."""
+    if tipo_columna(col) == 'minutos':
+        return _expr_minutos(col, dialecto)
+    if col in COLS_BOOLEANAS:
+        return f"COALESCE(CAST(CAST({_q(col)} AS INTEGER) AS DOUBLE PRECISION), 0)"
+    return f"COALESCE(CAST({_q(col)} AS DOUBLE PRECISION), 0)"
+
+def _orden_reciente(particion, prefijo=''):
+    """Número de juego de más reciente a más viejo dentro de `particion` (desempate por id_abe, como pandas)."""
+    return (f"ROW_NUMBER() OVER (PARTITION BY {prefijo}{_q(particion)}"
+            f" ORDER BY {prefijo}{_q('Fecha')} DESC NULLS LAST, {prefijo}{_q('id_abe')} DESC)")
+
+_FUNCIONES_SQL = {'mean': 'AVG', 'sum': 'SUM', 'count': 'COUNT'}
+
+def _cte_equipo_juego(cols, dialecto):
+    """Una fila por juego x equipo (la del primer jugador, como derivar_tabla_equipos) con `cols` numéricas."""
+    expresiones = "".join(f", {_expr_numero(c, dialecto)} AS {_q(c)}" for c in cols)
+    return f"""
+            SELECT {_q('id_abe')}, {_q('equipo_nombre')}, {_q('Fecha')}{expresiones}
+            FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY {_q('id_abe')}, {_q('equipo_nombre')} ORDER BY {_q('id_player')}) AS n_fila
+                FROM {_q(TABLA_MASTER)}
+                WHERE {_q('Categoria')} = :categoria AND {_q('equipo_nombre')} IS NOT NULL
+            ) filas
+            WHERE n_fila = 1"""
+
+def _sql_jugadores(agregaciones, dialecto, con_equipo, con_ventana):
+    """Ventana por jugador sobre sus juegos con minutos; las columnas Tm_*/Opp_* salen de su equipo-juego."""
+    cols_equipo = [c for c in agregaciones if es_columna_equipo(c)]
+    cols_jugador = [c for c in agregaciones if c != 'id_abe' and c not in cols_equipo]
+    expresiones = ", ".join(f"{_expr_numero(c, dialecto)} AS {_q(c)}" for c in cols_jugador)
+    llaves = ", ".join(f"j.{_q(c)}" for c in LLAVES_JUGADOR)
+    filtro_equipo = f" AND j.{_q('equipo_nombre')} IN :equipos" if con_equipo else ""
+    filtro_ventana = " AND n_juego <= :ventana" if con_ventana else ""
+
+    cte_equipo, union_equipo, select_equipo = "", "", ""
+    if cols_equipo:
+        cte_equipo = f"equipo_juego AS ({_cte_equipo_juego(cols_equipo, dialecto)}\n        ), "
+        union_equipo = (f" LEFT JOIN equipo_juego e ON e.{_q('id_abe')} = j.{_q('id_abe')}"
+                        f" AND e.{_q('equipo_nombre')} = j.{_q('equipo_nombre')}")
+        select_equipo = "".join(f", COALESCE(e.{_q(c)}, 0) AS {_q(c)}" for c in cols_equipo)
+
+    agregados = ", ".join(f"{_FUNCIONES_SQL[f]}({_q(c)}) AS {_q(c)}" for c, f in agregaciones.items())
+    llaves_salida = ", ".join(_q(c) for c in LLAVES_JUGADOR)
+    return f"""
+        WITH {cte_equipo}juegos AS (
+            SELECT {llaves}, j.{_q('id_abe')}, {expresiones}{select_equipo},
+                   {_orden_reciente('id_player', 'j.')} AS n_juego
+            FROM {_q(TABLA_MASTER)} j{union_equipo}
+            WHERE j.{_q('Categoria')} = :categoria{filtro_equipo}
+              AND {_expr_minutos('sMinutes', dialecto)} > 0
+        )
+        SELECT {llaves_salida}, {agregados}
+        FROM juegos
+        WHERE {_q('Nombre')} IS NOT NULL AND {_q('equipo_nombre')} IS NOT NULL{filtro_ventana}
+        GROUP BY {llaves_salida}
+        ORDER BY {llaves_salida}
+    """
+
+def _sql_four_factors(dialecto):
+    q = _q
+
+    def posesiones(tm, opp):
+        orb = f"{q(tm + '_ORB')} + {q(opp + '_DRB')}"
+        pct = f"(CASE WHEN {orb} <> 0 THEN {q(tm + '_ORB')} / ({orb}) ELSE 0 END)"
+        return f"{q(tm + '_FGA')} - ({pct} * ({q(tm + '_FGA')} - {q(tm + '_FG')}) * 1.07) + {q(tm + '_TOV')} + (0.4 * {q(tm + '_FTA')})"
+
+    def puntos(lado):
+        return (f"CASE WHEN total_{lado.lower()}_score > 0 THEN {q(lado + '_Score')}"
+                f" ELSE (2 * {q(lado + '_FG')}) + {q(lado + '_3PM')} + {q(lado + '_FTM')} END")
+
+    sumas = ", ".join(f"SUM({q(c)}) AS {q(c)}" for c in COLS_SUMA_4F)
+    return f"""
+        WITH equipo_juego AS ({_cte_equipo_juego(COLS_CHECK_4F, dialecto)}
+        ), totales AS (
+            SELECT *, SUM({q('Tm_Score')}) OVER () AS total_tm_score, SUM({q('Opp_Score')}) OVER () AS total_opp_score
+            FROM equipo_juego
+        ), puntos AS (
+            SELECT *, {puntos('Tm')} AS {q('Tm_PTS')}, {puntos('Opp')} AS {q('Opp_PTS')}
+            FROM totales
+        ), juegos AS (
+            SELECT *,
+                   CASE WHEN {q('Tm_PTS')} > {q('Opp_PTS')} THEN 1 ELSE 0 END AS {q('W')},
+                   CASE WHEN {q('Tm_PTS')} < {q('Opp_PTS')} THEN 1 ELSE 0 END AS {q('L')},
+                   {posesiones('Tm', 'Opp')} AS {q('Tm_Poss')},
+                   {posesiones('Opp', 'Tm')} AS {q('Opp_Poss')},
+                   {_orden_reciente('equipo_nombre')} AS n_juego
+            FROM puntos
+        )
+        SELECT {q('equipo_nombre')}, {sumas}
+        FROM juegos
+        WHERE n_juego <= :ventana
+        GROUP BY {q('equipo_nombre')}
+        ORDER BY {q('equipo_nombre')}
+    """
+
+def _alias_categoria(conexion, categoria):
+    """Mismo mapa de alias que la partición de la categoría (se calcula sobre todos sus equipos)."""
+    nombres = conexion.execute(
+        sa.text(f"SELECT DISTINCT {_q('equipo_nombre')} FROM {_q(TABLA_MASTER)} "
+                f"WHERE {_q('Categoria')} = :categoria AND {_q('equipo_nombre')} IS NOT NULL"),
+        {'categoria': categoria}).scalars().all()
+    return alias_sin_choques(nombres)
+
+def _consultar(motor, construir_sql, parametros, categoria, equipo=None):
+    """Corre la agregación y regresa el frame con los nombres de equipo ya con alias."""
+    with motor.connect() as conexion:
+        alias = _alias_categoria(conexion, categoria)
+        parametros = dict(parametros, categoria=categoria)
+        consulta = sa.text(construir_sql(motor.dialect.name))
+        if equipo is not None:
+            # La vista filtra por alias; la base tiene los nombres originales
+            parametros['equipos'] = [n for n, a in alias.items() if a == equipo]
+            consulta = consulta.bindparams(sa.bindparam('equipos', expanding=True))
+        df = pd.read_sql(consulta, conexion, params=parametros)
+    df['equipo_nombre'] = df['equipo_nombre'].map(alias)
+    return df
+
+def _via_sql(nombre, parametros, calcular):
+    """Una consulta por combinación de parámetros y versión de los datos; None = usar pandas."""
+    if not activo(): return None
+    try:
+        # Copia: el resultado queda compartido por versión y las vistas le agregan columnas
+        return derivado(('sql', nombre, parametros), calcular).copy()
+    except sa.exc.OperationalError as e:
+        _sql_no_disponible.set()
+        log.warning(f"Base SQL no disponible, las agregaciones siguen en pandas: {e}")
+    except Exception as e:
+        log.warning(f"Agregación SQL '{nombre}' falló, se usa pandas: {e}")
+    return None
+
+def _jugadores_sql(agregaciones, categoria, equipo, ventana, motor=None):
+    motor = motor or motor_postgres(url_postgres())
+    construir = lambda dialecto: _sql_jugadores(agregaciones, dialecto, equipo is not None, ventana is not None)
+    parametros = {} if ventana is None else {'ventana': ventana}
+    return _consultar(motor, construir, parametros, categoria, equipo)
+
+def promedios_por_jugador_sql(categoria, equipo=None, ventana=None):
+    """Lo mismo que promedios_por_jugador(ultimos_juegos_jugador(...)), resuelto en la base."""
+    return _via_sql('promedios', (categoria, equipo, ventana),
+                    lambda: _jugadores_sql(AGG_PROMEDIOS, categoria, equipo, ventana))
+
+def totales_por_jugador_sql(categoria, equipo=None, ventana=None):
+    """Lo mismo que totales_por_jugador sobre los últimos juegos (con columnas de equipo), en la base."""
+    return _via_sql('totales', (categoria, equipo, ventana),
+                    lambda: _jugadores_sql(AGG_TOTALES, categoria, equipo, ventana))
+
+def four_factors_por_equipo_sql(categoria, ventana, motor=None):
+    """Lo mismo que four_factors_por_equipo, resuelto en la base."""
+    def calcular():
+        return _consultar(motor or motor_postgres(url_postgres()), _sql_four_factors, {'ventana': ventana}, categoria)
+    if motor is not None: return calcular()
+    return _via_sql('four_factors', (categoria, ventana), calcular)
+
+# --- VERIFICACIÓN CONTRA PANDAS ---
+def _diferencias(df_pandas, df_sql, llaves, tolerancia=1e-4):
+    """Columnas que no coinciden entre ambos caminos (llaves como texto, números con tolerancia relativa)."""
+    a = df_pandas.astype({c: str for c in llaves}).sort_values(llaves, ignore_index=True)
+    b = df_sql.astype({c: str for c in llaves}).sort_values(llaves, ignore_index=True)
+    if len(a) != len(b):
+        return [f"filas {len(a)} vs {len(b)}"]
+    malas = [c for c in llaves if not a[c].equals(b[c])]
+    for c in [c for c in a.columns if c not in llaves]:
+        if not np.allclose(a[c].to_numpy(float), b[c].to_numpy(float), rtol=tolerancia, atol=tolerancia):
+            malas.append(c)
+    return malas
+
+def _master_consistente(n_filas):
+    """Master sintético con la forma real: un renglón por jugador-juego, una categoría por juego y
+    los Tm_*/Opp_* iguales en todos los renglones del mismo equipo-juego."""
+    from modules.benchmarks import master_sintetico
+    df = master_sintetico(n_filas).drop_duplicates(LLAVE_MASTER, ignore_index=True)
+    df['Categoria'] = df.groupby('id_abe')['Categoria'].transform('first')
+    cols_equipo = [c for c in df.columns if es_columna_equipo(c)]
+    df[cols_equipo] = df.groupby(LLAVE_EQUIPO)[cols_equipo].transform('first')
+    return df
+
+def verificar(url, sembrar=None):
+    """Compara el camino SQL contra pandas en varias ventanas y filtros. Regresa True si todo coincide."""
+    if sa is None:
+        raise SystemExit("Falta sqlalchemy (ver requirements.txt)")
+    motor = sa.create_engine(url)
+    if sembrar:
+        _master_consistente(sembrar).to_sql(TABLA_MASTER, motor, if_exists='replace', index=False)
+        print(f"Sembradas {sembrar:,} filas sintéticas en {TABLA_MASTER}")
+
+    crudo = pd.read_sql(sa.text(f"SELECT * FROM {_q(TABLA_MASTER)}"), motor)
+    df_jug, df_eq = separar_hechos(compactar_tipos(sanitizar_master(crudo)).sort_values(['id_abe', 'id_player'], ignore_index=True))
+    part_jug, part_eq = particionar(df_jug), particionar(df_eq)
+
+    ok = True
+    def reportar(nombre, malas):
+        nonlocal ok
+        ok = ok and not malas
+        print(f"  {'ok ' if not malas else 'DIF'} {nombre}" + (f": {', '.join(malas)}" if malas else ""))
+
+    for categoria, df_cat in part_jug.items():
+        print(f"{categoria} ({len(df_cat):,} jugador-juego)")
+        max_juegos = int(df_cat.groupby('equipo_nombre', observed=True)['id_abe'].nunique().max())
+        equipos = [None, sorted(df_cat['equipo_nombre'].unique())[0]]
+        for ventana in sorted({1, 3, max(1, max_juegos // 2)}) + [None]:
+            for equipo in equipos:
+                df_view = df_cat if equipo is None else df_cat[df_cat['equipo_nombre'] == equipo]
+                juegos = ultimos_juegos_jugador(df_view, ventana)
+                etiqueta = f"ventana={ventana} equipo={equipo or 'Todos'}"
+                reportar(f"promedios {etiqueta}", _diferencias(
+                    promedios_por_jugador(juegos),
+                    _jugadores_sql(AGG_PROMEDIOS, categoria, equipo, ventana, motor), LLAVES_JUGADOR))
+                reportar(f"totales   {etiqueta}", _diferencias(
+                    totales_por_jugador(unir_equipo(juegos, df_eq)),
+                    _jugadores_sql(AGG_TOTALES, categoria, equipo, ventana, motor), LLAVES_JUGADOR))
+            reportar(f"4 factors ventana={ventana or max_juegos}", _diferencias(
+                four_factors_por_equipo(part_eq[categoria], ventana or max_juegos),
+                four_factors_por_equipo_sql(categoria, ventana or max_juegos, motor), ['equipo_nombre']))
+    return ok
+
+def verificar_refresco():
+    """
+    Carga el master de la fuente configurada, lo refresca (como al vencer el TTL) y revisa que, sin
+    cambios en la fuente, juegos_equipo de cada categoría siga siendo el mismo objeto. Regresa True si sí.
+    """
+    columnas = columnas_master()
+    categorias = sorted(particionar(cargar_base_datos(columnas)[1]))
+    antes = {categoria: juegos_equipo(categoria) for categoria in categorias}
+    version_antes = version()
+    cargar_base_datos.refrescar(columnas)
+    print(f"versión {version_antes} -> {version()}")
+    ok = version() == version_antes
+    for categoria in categorias:
+        mismo = juegos_equipo(categoria) is antes[categoria]
+        ok = ok and mismo
+        print(f"  {'ok ' if mismo else 'DIF'} juegos_equipo({categoria!r})" + ("" if mismo else ": objeto nuevo"))
+    return ok
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if '--refresco' in args:
+        sys.exit(0 if verificar_refresco() else 1)
+    if '--verificar' not in args:
+        print(__doc__)
+        sys.exit(0)
+    siguiente = args[args.index('--verificar') + 1:][:1]
+    url = siguiente[0] if siguiente and not siguiente[0].startswith('--') else url_postgres()
+    sembrar = int(args[args.index('--sembrar') + 1]) if '--sembrar' in args else None
+    sys.exit(0 if verificar(url, sembrar) else 1)
@@ -0,0 +1,316 @@
+# modules/almacen.py
+"""
+Almacén de datasets compartido por todo el proceso.
+A diferencia de st.cache_data (que serializa y entrega una copia por llamada), aquí todas las
+sesiones y reruns reciben el MISMO objeto: los frames publicados son de solo lectura por contrato
+(las vistas derivan, no asignan columnas sobre lo que reciben).
+Al vencer el TTL se sigue sirviendo la versión vigente mientras un hilo la refresca en segundo
+plano (stale-while-revalidate); solo la primera carga de cada llave hace esperar al usuario.
+Las cargas son single-flight: si varias sesiones piden la misma llave a la vez, una sola descarga
+va en vuelo y las demás esperan su resultado (o su error).
+Los cálculos de las vistas (agregados, métricas) se memorizan aparte con memorizado(): llave =
+versión de los datos + parámetros, con desalojo LRU bajo un presupuesto de bytes (ABE_MEMO_MB).
+"""
+import os
+import sys
+import time
+import logging
+import threading
+import functools
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as EsperaAgotada
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+import modules.cache_compartido as cache_compartido
+
+log = logging.getLogger(__name__)
+
+@st.cache_resource
+def _almacen():
+    return {
+        'entradas': {},     # llave -> {'valor', 'cargado' (monotónico), 'actualizado' (fecha)}
+        'derivados': {},    # (version, llave) -> valor
+        'version': 0,       # Sube cada vez que se publica un objeto distinto
+        'en_vuelo': {},     # clave -> Future de la carga/cálculo en curso (single-flight)
+        'refrescando': set(),  # llaves con un refresco en segundo plano en curso
+        'memo': OrderedDict(),  # (version, llave) -> (valor, bytes); el final es lo más reciente
+        'memo_bytes': 0,
+        'memo_conteos': {'aciertos': 0, 'fallos': 0, 'desalojos': 0},
+        'lock': threading.Lock(),
+    }
+
+# Segundos que una sesión espera una carga ajena en vuelo antes de rendirse
+ESPERA_MAXIMA = 180
+# Presupuesto de memoria para resultados memorizados de las vistas
+MEMO_MB = float(os.environ.get("ABE_MEMO_MB", 256))
+
+class CargaInterrumpida(Exception):
+    """El hilo que hacía la carga se detuvo (ej. rerun o cierre de su sesión) sin dejar resultado."""
+
+def version():
+    """Versión global de los datos; sirve como llave de invalidación para cálculos derivados."""
+    return _almacen()['version']
+
+def _nombre(llave):
+    return llave[0] if isinstance(llave, tuple) else llave
+
+def _vuelo_compartido(almacen, clave, calcular, timeout=None):
+    """
+    Single-flight: si ya hay un cálculo de `clave` en vuelo, espera su resultado hasta `timeout`
+    segundos (ESPERA_MAXIMA por defecto; un error del líder se propaga tal cual); si no, este
+    hilo lo hace y lo comparte.
+    """
+    timeout = ESPERA_MAXIMA if timeout is None else timeout
+    while True:
+        with almacen['lock']:
+            futuro = almacen['en_vuelo'].get(clave)
+            lider = futuro is None
+            if lider:
+                futuro = almacen['en_vuelo'][clave] = Future()
+        if lider:
+            break
+        try:
+            return futuro.result(timeout=timeout)
+        except EsperaAgotada:
+            raise TimeoutError(f"La carga de {_nombre(clave[1])} lleva más de {timeout} s en vuelo") from None
+        except CargaInterrumpida:
+            continue  # El líder se detuvo sin resultado: este hilo toma su lugar
+
+    try:
+        valor = calcular()
+        futuro.set_result(valor)
+        return valor
+    except Exception as e:
+        futuro.set_exception(e)
+        raise
+    except BaseException:
+        # StopException/RerunException de Streamlit: es de la sesión del líder, no de quien espera
+        futuro.set_exception(CargaInterrumpida())
+        raise
+    finally:
+        with almacen['lock']:
+            almacen['en_vuelo'].pop(clave, None)
+
+def publicar(llave, valor):
+    """Guarda `valor` bajo `llave`. Si es un objeto distinto al vigente, sube la versión."""
+    almacen = _almacen()
+    with almacen['lock']:
+        anterior = almacen['entradas'].get(llave)
+        almacen['entradas'][llave] = {'valor': valor, 'cargado': time.monotonic(), 'actualizado': datetime.now()}
+        if anterior is None or anterior['valor'] is not valor:
+            almacen['version'] += 1
+            almacen['derivados'].clear()
+            _vaciar_memo(almacen)
+
+def _es_vacio(valor):
+    if isinstance(valor, pd.DataFrame): return valor.empty
+    if isinstance(valor, tuple): return all(_es_vacio(v) for v in valor)
+    return valor is None
+
+def _es_valido(nuevo, anterior):
+    """Un refresco que regresa vacío (los loaders tragan sus errores así) no reemplaza datos buenos."""
+    return not _es_vacio(nuevo) or _es_vacio(anterior)
+
+def _posponer(almacen, llave):
+    """Tras un refresco fallido la versión vigente cuenta como recién cargada: se reintenta al siguiente TTL."""
+    with almacen['lock']:
+        if llave in almacen['entradas']:
+            almacen['entradas'][llave]['cargado'] = time.monotonic()
+
+def _refrescar(almacen, llave, cargar):
+    """Recarga `llave` en segundo plano y la intercambia de forma atómica solo si el resultado es válido."""
+    def _recargar_y_validar():
+        nuevo = cargar()
+        anterior = almacen['entradas'].get(llave)
+        if anterior is None or _es_valido(nuevo, anterior['valor']):
+            publicar(llave, nuevo)
+            return nuevo
+        log.warning(f"Refresco de {_nombre(llave)} descartado: vino vacío")
+        _posponer(almacen, llave)
+        return anterior['valor']
+
+    try:
+        _vuelo_compartido(almacen, ('carga', llave), _recargar_y_validar)
+    except Exception as e:
+        log.warning(f"Refresco de {_nombre(llave)} en segundo plano falló, se mantiene la versión vigente: {e}", exc_info=True)
+        _posponer(almacen, llave)
+    finally:
+        with almacen['lock']:
+            almacen['refrescando'].discard(llave)
+
+def obtener(llave, cargar, ttl=None, recargar=None):
+    """
+    Valor compartido de `llave`. Si no existe se carga con `cargar()` (bloquea, pero una sola
+    carga por llave aunque lleguen muchas sesiones). Si tiene más de `ttl` segundos se regresa
+    tal cual y se lanza un refresco en segundo plano con `recargar()` (por defecto `cargar`),
+    así ninguna petición espera por un refresco programado.
+    Con ABE_CACHE_COMPARTIDO activo, ambas cargas pasan antes por el nivel compartido entre réplicas.
+    """
+    almacen = _almacen()
+    recargar = recargar or cargar
+    if cache_compartido.activo():
+        cargar = functools.partial(cache_compartido.cargar, llave, cargar, ttl)
+        recargar = functools.partial(cache_compartido.cargar, llave, recargar, ttl)
+    entrada = almacen['entradas'].get(llave)
+    if entrada is not None:
+        if ttl is not None and time.monotonic() - entrada['cargado'] > ttl:
+            with almacen['lock']:
+                lanzar = llave not in almacen['refrescando']
+                almacen['refrescando'].add(llave)
+            if lanzar:
+                threading.Thread(target=_refrescar, args=(almacen, llave, recargar),
+                                 daemon=True, name="almacen-refresco").start()
+        return entrada['valor']
+
+    def _cargar_y_publicar():
+        entrada = almacen['entradas'].get(llave)  # Pudo publicarse mientras tomábamos el turno
+        if entrada is not None:
+            return entrada['valor']
+        valor = cargar()
+        publicar(llave, valor)
+        return valor
+    return _vuelo_compartido(almacen, ('carga', llave), _cargar_y_publicar)
+
+def antiguedad(prefijo=None):
+    """
+    (segundos desde la actualización más vieja, ¿hay refrescos en curso?) de todo el almacén, o solo
+    de las entradas de una función si se da `prefijo` (ej. el master, no el catálogo).
+    """
+    almacen = _almacen()
+    es_de = lambda llave: prefijo is None or _nombre(llave) == prefijo
+    with almacen['lock']:
+        fechas = [e['actualizado'] for llave, e in almacen['entradas'].items() if es_de(llave)]
+        refrescando = any(es_de(llave) for llave in almacen['refrescando'])
+    if not fechas: return None, refrescando
+    return (datetime.now() - min(fechas)).total_seconds(), refrescando
+
+def compartido(ttl=None):
+    """
+    Decorador estilo st.cache_data(ttl=...) pero sin copias: la llave son los argumentos que no
+    empiezan con '_' y todas las llamadas reciben el mismo objeto.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            publicos = {k: v for k, v in kwargs.items() if not k.startswith('_')}
+            llave = (funcion.__qualname__, args, tuple(sorted(publicos.items())))
+            # El refresco en segundo plano no lleva los '_' (ej. callbacks de la sesión que lo disparó)
+            return obtener(llave, lambda: funcion(*args, **kwargs), ttl=ttl,
+                           recargar=lambda: funcion(*args, **publicos))
+
+        def refrescar(*args, **kwargs):
+            """El mismo refresco que se lanza al vencer el TTL, pero en este hilo (ej. verificaciones)."""
+            publicos = {k: v for k, v in kwargs.items() if not k.startswith('_')}
+            llave = (funcion.__qualname__, args, tuple(sorted(publicos.items())))
+            recargar = lambda: funcion(*args, **publicos)
+            if cache_compartido.activo():
+                recargar = functools.partial(cache_compartido.cargar, llave, recargar, ttl)
+            _refrescar(_almacen(), llave, recargar)
+        envoltura.clear = lambda: limpiar(funcion.__qualname__)
+        envoltura.refrescar = refrescar
+        envoltura.antiguedad = lambda: antiguedad(funcion.__qualname__)
+        return envoltura
+    return decorador
+
+def derivado(llave, calcular):
+    """Cálculo sobre los datos compartidos que se hace una vez por versión (ej. filtro por categoría)."""
+    almacen = _almacen()
+    clave = (almacen['version'], llave)
+    with almacen['lock']:
+        if clave in almacen['derivados']:
+            return almacen['derivados'][clave]
+
+    def _calcular_y_guardar():
+        valor = calcular()
+        with almacen['lock']:
+            # Si la versión cambió mientras calculábamos, no se guarda (ya nació viejo)
+            if almacen['version'] == clave[0]:
+                almacen['derivados'][clave] = valor
+        return valor
+    return _vuelo_compartido(almacen, ('derivado', llave, clave[0]), _calcular_y_guardar)
+
+def limpiar(prefijo=None):
+    """Descarta entradas (todas, o las de una función) y sube la versión."""
+    almacen = _almacen()
+    with almacen['lock']:
+        for llave in [k for k in almacen['entradas'] if prefijo is None or (isinstance(k, tuple) and k[0] == prefijo)]:
+            del almacen['entradas'][llave]
+        almacen['version'] += 1
+        almacen['derivados'].clear()
+        _vaciar_memo(almacen)
+
+# --- MEMOIZACIÓN DE CÁLCULOS (LRU POR BYTES) ---
+def tamano_bytes(valor):
+    """Memoria real de un resultado: memory_usage(deep) para frames, nbytes para arreglos."""
+    if isinstance(valor, pd.DataFrame): return int(valor.memory_usage(index=True, deep=True).sum())
+    if isinstance(valor, pd.Series): return int(valor.memory_usage(index=True, deep=True))
+    if hasattr(valor, 'nbytes'): return int(valor.nbytes)
+    if isinstance(valor, (tuple, list)): return sum(tamano_bytes(v) for v in valor)
+    if isinstance(valor, dict): return sum(tamano_bytes(v) for v in valor.values())
+    return sys.getsizeof(valor)
+
+def _vaciar_memo(almacen):
+    """Con lock tomado. Lo de versiones anteriores ya no se puede pedir: se libera completo."""
+    almacen['memo'].clear()
+    almacen['memo_bytes'] = 0
+
+def _guardar_memo(almacen, clave, valor):
+    presupuesto = MEMO_MB * 1024 ** 2
+    peso = tamano_bytes(valor)
+    if peso > presupuesto:
+        return  # Uno solo no cabe: se calcula cada vez en lugar de vaciar todo lo demás
+    with almacen['lock']:
+        if almacen['version'] != clave[0] or clave in almacen['memo']:
+            return
+        almacen['memo'][clave] = (valor, peso)
+        almacen['memo_bytes'] += peso
+        while almacen['memo_bytes'] > presupuesto:
+            _, (_, liberado) = almacen['memo'].popitem(last=False)
+            almacen['memo_bytes'] -= liberado
+            almacen['memo_conteos']['desalojos'] += 1
+
+def memo(llave, calcular):
+    """
+    Resultado de `calcular()` para la versión vigente de los datos, memorizado bajo `llave`.
+    Comparte el objeto (solo lectura, como el resto del almacén) y es single-flight.
+    """
+    almacen = _almacen()
+    with almacen['lock']:
+        clave = (almacen['version'], llave)
+        entrada = almacen['memo'].get(clave)
+        if entrada is not None:
+            almacen['memo'].move_to_end(clave)
+            almacen['memo_conteos']['aciertos'] += 1
+            return entrada[0]
+        almacen['memo_conteos']['fallos'] += 1
+
+    def _calcular_y_guardar():
+        valor = calcular()
+        _guardar_memo(almacen, clave, valor)
+        return valor
+    return _vuelo_compartido(almacen, ('memo', llave, clave[0]), _calcular_y_guardar)
+
+def memorizado(funcion):
+    """
+    Decorador para cálculos de las vistas: la llave es la versión de los datos más los argumentos
+    que no empiezan con '_' (esos no entran en la llave). El cálculo no debe recibir sus frames de
+    fuera: los lee del almacén adentro, así corresponden a la versión con la que se guarda (si se
+    publica otra mientras calcula, el resultado no se guarda).
+    """
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        publicos = {k: v for k, v in kwargs.items() if not k.startswith('_')}
+        llave = (f"{funcion.__module__}.{funcion.__qualname__}", args, tuple(sorted(publicos.items())))
+        return memo(llave, lambda: funcion(*args, **kwargs))
+    return envoltura
+
+def estadisticas_memo():
+    """Aciertos, fallos, desalojos, entradas y MB ocupados de la memoización."""
+    almacen = _almacen()
+    with almacen['lock']:
+        conteos = dict(almacen['memo_conteos'])
+        conteos.update(entradas=len(almacen['memo']), mb=almacen['memo_bytes'] / 1024 ** 2, presupuesto_mb=MEMO_MB)
+    total = conteos['aciertos'] + conteos['fallos']
+    conteos['tasa_aciertos'] = conteos['aciertos'] / total if total else 0.0
+    return conteos
@@ -0,0 +1,273 @@
+# modules/benchmarks.py
+"""
+Micro-benchmarks de la capa de datos sobre una vista maestra sintética.
+Uso: python -m modules.benchmarks [nombre ...] [--filas N]
+"""
+import sys
+import time
+import json
+import gzip
+import tempfile
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from modules.data_loader import sanitizar_master
+from modules.fuentes import decodificar_respuesta, FuenteLocal, url_postgres, motor_postgres, sa
+from modules.ingesta import ingestar, leer_archivo, validar, sql_crear_tabla
+from modules.agregaciones import (AGG_TOTALES, AGG_PROMEDIOS, LLAVES_JUGADOR, VentanasJugador, ultimos_juegos_jugador,
+                                  promedios_por_jugador, CuboEquipos, tabla_juegos_equipo, four_factors_por_equipo,
+                                  COLS_SUMA_4F)
+from modules.metricas import metricas_avanzadas, metricas_avanzadas_fusionadas, numba
+
+# Columnas con la forma de vista_analitica_master
+COLS_JUGADOR = [
+    'sPoints', 'sFieldGoalsMade', 'sFieldGoalsAttempted', 'sTwoPointersMade', 'sTwoPointersAttempted',
+    'sThreePointersMade', 'sThreePointersAttempted', 'sFreeThrowsMade', 'sFreeThrowsAttempted',
+    'sReboundsOffensive', 'sReboundsDefensive', 'sReboundsTotal', 'sAssists', 'sTurnovers',
+    'sSteals', 'sBlocks', 'sFoulsPersonal', 'sFoulsOn', 'starter',
+]
+COLS_EQUIPO = ['FG', 'FGA', '2PM', '3PM', '3PA', 'FTM', 'FTA', 'ORB', 'DRB', 'TRB',
+               'AST', 'STL', 'BLK', 'TOV', 'PF', 'Score']
+
+# --- DATOS SINTÉTICOS ---
+def master_sintetico(n_filas, seed=0):
+    """Frame 'crudo' como lo arma pd.DataFrame(response.data): minutos en texto, fechas ISO, algunos None."""
+    rng = np.random.default_rng(seed)
+    n_juegos = max(1, n_filas // 24)
+    id_abe = np.sort(rng.integers(1, n_juegos + 1, n_filas))
+
+    minutos = rng.integers(0, 40, n_filas).astype(str)
+    segundos = np.char.zfill(rng.integers(0, 60, n_filas).astype(str), 2)
+    fechas = pd.Timestamp('2025-01-01') + pd.to_timedelta(id_abe // 4, unit='D')
+
+    datos = {
+        'id_abe': id_abe,
+        'id_player': rng.integers(1, 900, n_filas),
+        'Nombre': np.char.add('Jugador ', rng.integers(1, 900, n_filas).astype(str)),
+        'equipo_nombre': rng.choice(['UDLAP', 'UANL', 'TEC MTY MONTERREY', 'CETYS MEXICALI', 'UPAEP'], n_filas),
+        'Categoria': rng.choice(['Femenil D1', 'Varonil D1'], n_filas),
+        'Opp_Name': rng.choice(['UDLAP', 'UANL', 'UMAD', None], n_filas),
+        'Fecha': fechas.strftime('%Y-%m-%d').to_numpy(),
+        'sMinutes': np.char.add(np.char.add(minutos, ':'), segundos).astype(object),
+        'Tm_MIN': np.full(n_filas, '200:00', dtype=object),
+    }
+    for col in COLS_JUGADOR:
+        datos[col] = rng.integers(0, 15, n_filas)
+    for col in COLS_EQUIPO:
+        datos[f'Tm_{col}'] = rng.integers(0, 90, n_filas)
+        datos[f'Opp_{col}'] = rng.integers(0, 90, n_filas)
+    datos['Opp_MIN'] = np.full(n_filas, 200)
+
+    df = pd.DataFrame(datos)
+    # JSON trae nulos sueltos: esas columnas llegan como float/object
+    df['sFoulsOn'] = df['sFoulsOn'].astype(object).where(rng.random(n_filas) > 0.02, None)
+    return df
+
+# --- IMPLEMENTACIÓN ANTERIOR (REFERENCIA) ---
+def _minutos_timedelta(series):
+    mask_is_float = ~series.astype(str).str.contains(':')
+    result_minutes = pd.Series(0.0, index=series.index)
+    result_minutes.loc[mask_is_float] = pd.to_numeric(series.loc[mask_is_float], errors='coerce').fillna(0.0)
+    m_s_part = series.loc[~mask_is_float].astype(str).str.split(':').str[:2].str.join(':')
+    try:
+        duration = pd.to_timedelta('00:' + m_s_part)
+        result_minutes.loc[~mask_is_float] = duration.dt.total_seconds() / 60.0
+    except:
+        result_minutes.loc[~mask_is_float] = 0.0
+    return result_minutes.fillna(0.0)
+
+def _sanitizar_por_columna(df_master):
+    """Versión previa: to_numeric columna por columna y minutos vía timedelta."""
+    for col in ['sMinutes', 'Tm_MIN']:
+        if col in df_master.columns:
+            df_master[col] = _minutos_timedelta(df_master[col])
+    df_master['Fecha'] = pd.to_datetime(df_master['Fecha'], errors='coerce')
+    cols_numericas = [c for c in df_master.columns if c.startswith('s') or c.startswith('Tm_') or c.startswith('Opp_')]
+    for col in cols_numericas:
+        if col not in ['sMinutes', 'Tm_MIN', 'Opp_Name']:
+            df_master[col] = pd.to_numeric(df_master[col], errors='coerce').fillna(0)
+    df_master['Opp_Name'] = df_master['Opp_Name'].astype(str).replace(['nan', 'None', '0', '0.0'], '-')
+    return df_master
+
+# --- MEDICIÓN ---
+def medir(funcion, preparar, repeticiones=5):
+    """Mejor tiempo (segundos) de `repeticiones` corridas; `preparar()` arma la entrada fuera del cronómetro."""
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        entrada = preparar()
+        inicio = time.perf_counter()
+        funcion(entrada)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+def bench_sanitizacion(n_filas):
+    df_crudo = master_sintetico(n_filas)
+    por_10k = 10000 / n_filas
+    t_antes = medir(_sanitizar_por_columna, df_crudo.copy)
+    t_ahora = medir(sanitizar_master, df_crudo.copy)
+    print(f"sanitizacion ({n_filas:,} filas)")
+    print(f"  por columna + timedelta : {t_antes * 1000 * por_10k:8.2f} ms / 10k filas")
+    print(f"  esquema + bloque numpy  : {t_ahora * 1000 * por_10k:8.2f} ms / 10k filas  ({t_antes / t_ahora:.1f}x)")
+
+def bench_formato_descarga(n_filas):
+    """Decodificación de la respuesta: JSON (lista de dicts por fila) vs CSV columnar."""
+    df_crudo = master_sintetico(n_filas)
+    cuerpo_json = json.dumps(df_crudo.to_dict('records'), default=str)
+    cuerpo_csv = df_crudo.to_csv(index=False)
+    por_10k = 10000 / n_filas
+
+    # Lo que hace cada camino con el cuerpo HTTP: JSON -> lista de dicts -> DataFrame; CSV -> read_csv
+    t_json = medir(lambda cuerpo: decodificar_respuesta(json.loads(cuerpo)), lambda: cuerpo_json)
+    t_csv = medir(decodificar_respuesta, lambda: cuerpo_csv)
+    kb = lambda texto: len(texto.encode()) / 1024
+    kb_gz = lambda texto: len(gzip.compress(texto.encode())) / 1024
+    print(f"formato de descarga ({n_filas:,} filas)")
+    print(f"  json (dicts por fila) : {t_json * 1000 * por_10k:8.2f} ms / 10k filas  | {kb(cuerpo_json):9,.0f} KB ({kb_gz(cuerpo_json):7,.0f} KB gzip)")
+    print(f"  csv columnar          : {t_csv * 1000 * por_10k:8.2f} ms / 10k filas  | {kb(cuerpo_csv):9,.0f} KB ({kb_gz(cuerpo_csv):7,.0f} KB gzip)  ({t_json / t_csv:.1f}x)")
+
+def bench_fuente_local(n_filas):
+    """Carga completa (lectura + sanitización) de la vista maestra desde fixtures locales parquet y csv."""
+    df_crudo = master_sintetico(n_filas)
+    por_10k = 10000 / n_filas
+    with tempfile.TemporaryDirectory() as carpeta_parquet, tempfile.TemporaryDirectory() as carpeta_csv:
+        df_crudo.to_parquet(f"{carpeta_parquet}/master.parquet", index=False)
+        df_crudo.to_csv(f"{carpeta_csv}/master.csv", index=False)
+        print(f"fuente local ({n_filas:,} filas)")
+        for etiqueta, carpeta in (('parquet', carpeta_parquet), ('csv', carpeta_csv)):
+            fuente = FuenteLocal(carpeta)
+            t = medir(lambda f: sanitizar_master(f.leer('master', orden=('id_abe', 'id_player'))), lambda: fuente)
+            print(f"  {etiqueta:<8}: {t * 1000 * por_10k:8.2f} ms / 10k filas")
+
+def totales_sinteticos(n_filas, seed=0):
+    """Totales por jugador-ventana con la forma que recibe metricas_avanzadas (incluye ceros en denominadores)."""
+    rng = np.random.default_rng(seed)
+    cols = [c for c in AGG_TOTALES if c not in ('id_abe', 'starter')]
+    totales = pd.DataFrame({c: rng.integers(0, 400, n_filas).astype(float) for c in cols})
+    totales.loc[::17, ['Tm_MIN', 'sFieldGoalsAttempted']] = 0
+    totales['GP'] = rng.integers(1, 36, n_filas)
+    return totales
+
+def bench_metricas(n_filas):
+    """Tabla avanzada completa (modules/metricas.py) para n_filas jugador-ventana."""
+    totales = totales_sinteticos(n_filas)
+    t = medir(metricas_avanzadas, lambda: totales)
+    print(f"metricas avanzadas ({n_filas:,} jugador-ventana)")
+    print(f"  motor vectorizado : {t * 1000 * 10000 / n_filas:8.2f} ms / 10k filas")
+
+JUGADORES_LIGA = 400  # Jugador-ventana de una categoría completa
+
+def bench_kernels(n_filas):
+    """Tabla avanzada: motor vectorizado vs kernel fusionado (en sitio y con numba) a escala liga y 100x."""
+    print(f"kernels de métricas avanzadas (numba {'sí' if numba else 'no'})")
+    for n in (JUGADORES_LIGA, JUGADORES_LIGA * 100):
+        totales = totales_sinteticos(n)
+        referencia = metricas_avanzadas(totales)
+        caminos = [('vectorizado', metricas_avanzadas), ('en sitio', lambda t: metricas_avanzadas_fusionadas(t, jit=False))]
+        if numba is not None:
+            metricas_avanzadas_fusionadas(totales, jit=True)  # Compilación fuera del cronómetro
+            caminos.append(('numba', lambda t: metricas_avanzadas_fusionadas(t, jit=True)))
+        t_base = None
+        for etiqueta, funcion in caminos:
+            iguales = np.allclose(funcion(totales).to_numpy(), referencia.to_numpy(), rtol=1e-12, equal_nan=True)
+            t = medir(funcion, lambda: totales, repeticiones=20)
+            t_base = t_base or t
+            print(f"  {n:>7,} filas | {etiqueta:<11}: {t * 1000:8.3f} ms  ({t_base / t:4.1f}x){'' if iguales else '  ¡DIFERENTE!'}")
+
+def _mismos_valores(a, b):
+    """Mismas llaves y columnas; números iguales salvo redondeo (float32 y sumas acumuladas)."""
+    if list(a.columns) != list(b.columns) or not a[LLAVES_JUGADOR].equals(b[LLAVES_JUGADOR]): return False
+    return all(np.allclose(a[c].to_numpy(float), b[c].to_numpy(float), rtol=1e-6, equal_nan=True) for c in a.columns if c not in LLAVES_JUGADOR)
+
+def bench_ventanas(n_filas):
+    """Promedios de "últimos X juegos" para todas las ventanas: ordenar + head + groupby por ventana vs sumas acumuladas."""
+    df = master_sintetico(n_filas)
+    # Plantillas estables (el master sintético reparte nombre y equipo al azar por fila)
+    df['Nombre'] = 'Jugador ' + df['id_player'].astype(str)
+    df['equipo_nombre'] = np.array(['UDLAP', 'UANL', 'TEC MTY MONTERREY', 'CETYS MEXICALI', 'UPAEP'])[df['id_player'] % 5]
+    df = sanitizar_master(df)
+    df = df[df['Categoria'] == 'Femenil D1']
+    max_juegos = int(ultimos_juegos_jugador(df).groupby('id_player', observed=True).size().max())
+    ventanas = range(1, max_juegos + 1)
+    columnas = [c for c in AGG_PROMEDIOS if c != 'id_abe']
+
+    t_antes = medir(lambda d: [promedios_por_jugador(ultimos_juegos_jugador(d, v)) for v in ventanas], lambda: df, repeticiones=3)
+    t_indice = medir(lambda d: VentanasJugador(ultimos_juegos_jugador(d), columnas), lambda: df, repeticiones=3)
+    indice = VentanasJugador(ultimos_juegos_jugador(df), columnas)
+    t_ahora = medir(lambda i: [i.promedios(v) for v in ventanas], lambda: indice, repeticiones=3)
+    iguales = all(_mismos_valores(promedios_por_jugador(ultimos_juegos_jugador(df, v)), indice.promedios(v)) for v in (1, 5, None))
+    print(f"ventanas de jugador ({len(df):,} filas de una categoría, ventanas 1..{max_juegos})")
+    print(f"  groupby por ventana   : {t_antes * 1000 / max_juegos:8.2f} ms / ventana")
+    print(f"  índice (una vez)      : {t_indice * 1000:8.2f} ms")
+    print(f"  sumas acumuladas      : {t_ahora * 1000 / max_juegos:8.2f} ms / ventana  ({t_antes / t_ahora:.1f}x){'' if iguales else '  ¡DIFERENTE!'}")
+
+def bench_cubo_equipos(n_filas):
+    """Sumas de Four Factors para todas las ventanas: groupby por ventana vs cubo equipos x ventanas."""
+    df = sanitizar_master(master_sintetico(n_filas)).drop_duplicates(['id_abe', 'equipo_nombre'])
+    max_juegos = int(df.groupby('equipo_nombre', observed=True).size().max())
+    ventanas = range(1, max_juegos + 1)
+
+    t_antes = medir(lambda d: [four_factors_por_equipo(d, v) for v in ventanas], lambda: df, repeticiones=3)
+    t_cubo = medir(lambda d: CuboEquipos(tabla_juegos_equipo(d), COLS_SUMA_4F), lambda: df, repeticiones=3)
+    cubo = CuboEquipos(tabla_juegos_equipo(df), COLS_SUMA_4F)
+    t_ahora = medir(lambda c: [c.tabla(v) for v in ventanas], lambda: cubo, repeticiones=3)
+    iguales = all(np.allclose(four_factors_por_equipo(df, v)[COLS_SUMA_4F].to_numpy(float), cubo.tabla(v, COLS_SUMA_4F)[COLS_SUMA_4F].to_numpy(float))
+                  for v in (1, 5, max_juegos))
+    print(f"cubo de equipos ({len(df):,} juegos-equipo, ventanas 1..{max_juegos})")
+    print(f"  groupby por ventana : {t_antes * 1000 / max_juegos:8.3f} ms / ventana")
+    print(f"  cubo (una vez)      : {t_cubo * 1000:8.3f} ms")
+    print(f"  rebanada del cubo   : {t_ahora * 1000 / max_juegos:8.3f} ms / ventana  ({t_antes / t_ahora:.1f}x){'' if iguales else '  ¡DIFERENTE!'}")
+
+def bench_ingesta(n_filas):
+    """COPY + upsert contra un Postgres real (ABE_DATABASE_URL): carga inicial y recarga de las mismas llaves."""
+    url = url_postgres()
+    if not url or sa is None:
+        print("ingesta: requiere ABE_DATABASE_URL (Postgres con psycopg2) y sqlalchemy; se omite")
+        return
+    tabla = "_bench_ingesta"
+    motor = motor_postgres(url)
+    crudo = master_sintetico(n_filas).drop_duplicates(['id_abe', 'id_player'], ignore_index=True)
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = f"{carpeta}/boxscores.csv"
+        crudo.to_csv(ruta, index=False)
+        validas, _ = validar(leer_archivo(ruta), ruta)
+        with motor.begin() as conexion:
+            conexion.execute(sa.text(f'DROP TABLE IF EXISTS "{tabla}"'))
+            conexion.execute(sa.text(sql_crear_tabla(tabla, validas)))
+        try:
+            simulacro = ingestar([ruta], simulacro=True)
+            insercion = ingestar([ruta], url, tabla)
+            upsert = ingestar([ruta], url, tabla)
+        finally:
+            with motor.begin() as conexion:
+                conexion.execute(sa.text(f'DROP TABLE IF EXISTS "{tabla}"'))
+    por_seg = lambda m: m['validas'] / m['t_carga']
+    # El servidor es la carga menos la serialización de los lotes (misma en los tres caminos)
+    servidor = lambda m: m['validas'] / max(m['t_carga'] - simulacro['t_carga'], 1e-9)
+    print(f"ingesta ({len(crudo):,} filas, lotes de {simulacro['lotes']})")
+    print(f"  lectura + validación   : {simulacro['validas'] / simulacro['t_validacion']:10,.0f} filas/s")
+    print(f"  serialización (cliente): {por_seg(simulacro):10,.0f} filas/s")
+    for etiqueta, m in (('COPY + insert', insercion), ('COPY + upsert', upsert)):
+        print(f"  {etiqueta:<23}: {por_seg(m):10,.0f} filas/s ({servidor(m):,.0f} filas/s en el servidor)"
+              f"{'' if m['cargadas'] == m['validas'] else '  ¡DIFERENTE!'}")
+
+BENCHMARKS = {
+    'sanitizacion': bench_sanitizacion,
+    'formato': bench_formato_descarga,
+    'fuente_local': bench_fuente_local,
+    'metricas': bench_metricas,
+    'kernels': bench_kernels,
+    'ventanas': bench_ventanas,
+    'cubo_equipos': bench_cubo_equipos,
+    'ingesta': bench_ingesta,
+}
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    n_filas = 100000
+    if '--filas' in args:
+        i = args.index('--filas')
+        n_filas = int(args[i + 1])
+        del args[i:i + 2]
+    print(f"# {datetime.now():%Y-%m-%d %H:%M} | pandas {pd.__version__} | numpy {np.__version__}")
+    for nombre in (args or BENCHMARKS):
+        BENCHMARKS[nombre](n_filas)
@@ -0,0 +1,146 @@
+# modules/cache_compartido.py
+"""
+Nivel de caché opcional compartido entre réplicas de la app (mismo host o volumen compartido).
+Se activa con la variable de entorno ABE_CACHE_COMPARTIDO=<carpeta>. Cada dataset del almacén se
+guarda ahí como Arrow sin compresión + manifiesto con sello de versión; las demás réplicas lo
+mapean en memoria en vez de volver a pedirlo a Supabase. Un candado de archivo por dataset hace
+que, al vencer, solo una réplica lo descargue.
+"""
+import os
+import time
+import hashlib
+import logging
+from datetime import datetime
+import pandas as pd
+from modules.snapshot import guardar_snapshot, leer_snapshot, leer_manifiesto
+
+log = logging.getLogger(__name__)
+
+try:
+    import fcntl  # Solo POSIX; sin él no hay candado entre réplicas (cada una descarga)
+except ImportError:
+    fcntl = None
+
+DIRECTORIO = os.environ.get("ABE_CACHE_COMPARTIDO")
+ESPERA_CANDADO = 180  # Segundos máximos esperando a que otra réplica termine su descarga
+# nombre -> (sello, valor) de lo último que este proceso leyó o escribió: mismo sello = mismo objeto,
+# así el almacén no sube de versión cuando el dataset compartido no cambió
+_VISTOS = {}
+
+def activo():
+    return bool(DIRECTORIO)
+
+def _nombre(llave):
+    """Nombre de archivo estable para una llave del almacén: función + huella de sus argumentos."""
+    funcion = llave[0] if isinstance(llave, tuple) else str(llave)
+    return f"{funcion}_{hashlib.sha1(repr(llave).encode()).hexdigest()[:12]}"
+
+def _partes(valor):
+    """Los loaders regresan un frame o una tupla de frames (metadata)."""
+    if isinstance(valor, pd.DataFrame): return [valor], False
+    if isinstance(valor, tuple) and all(isinstance(v, pd.DataFrame) for v in valor): return list(valor), True
+    return None, False
+
+def _vigente(manifiesto, ttl):
+    if not manifiesto: return False
+    if ttl is None: return True
+    guardado = datetime.fromisoformat(manifiesto['guardado'])
+    return (datetime.now() - guardado).total_seconds() <= ttl
+
+def _manifiesto(nombre):
+    """El manifiesto de la parte 0 es el índice del dataset (se escribe al final)."""
+    return leer_manifiesto(f"{nombre}__0", DIRECTORIO)
+
+def _leer(nombre, manifiesto):
+    """Lee las partes de un dataset; None si alguna falta o cambió de sello a media lectura."""
+    frames = []
+    for i in range(manifiesto.get('partes', 1)):
+        df, manif_parte = leer_snapshot(f"{nombre}__{i}", directorio=DIRECTORIO, sin_copia=True)
+        if df is None or manif_parte.get('sello') != manifiesto.get('sello'):
+            return None
+        frames.append(df)
+    return tuple(frames) if manifiesto.get('tupla') else frames[0]
+
+def _leer_vigente(nombre, manifiesto):
+    """Como _leer, pero si el sello es el último que vio este proceso regresa ese mismo objeto."""
+    visto = _VISTOS.get(nombre)
+    if visto is not None and visto[0] == manifiesto.get('sello'):
+        return visto[1]
+    valor = _leer(nombre, manifiesto)
+    if valor is not None:
+        _VISTOS[nombre] = (manifiesto.get('sello'), valor)
+    return valor
+
+def _mismo_valor(a, b):
+    """Mismo objeto, o mismos frames (otra réplica pudo descargar lo mismo que ya estaba)."""
+    if a is b: return True
+    (frames_a, _), (frames_b, _) = _partes(a), _partes(b)
+    if frames_a is None or frames_b is None or len(frames_a) != len(frames_b): return False
+    return all(x.reset_index(drop=True).equals(y.reset_index(drop=True)) for x, y in zip(frames_a, frames_b))
+
+def _guardar(nombre, valor, anterior):
+    frames, es_tupla = _partes(valor)
+    if frames is None or all(df.empty for df in frames):
+        return  # Vacío = carga fallida; no se comparte
+    sello = (anterior or {}).get('sello', 0)
+    visto = _VISTOS.get(nombre)
+    if visto is None or visto[0] != sello or visto[1] is not valor:
+        sello += 1  # El origen no regresó el mismo objeto: versión nueva para las demás réplicas
+    # La parte 0 va al último: cuando su sello cambia, las demás ya están escritas
+    for i in reversed(range(len(frames))):
+        extra = {'sello': sello, 'partes': len(frames), 'tupla': es_tupla} if i == 0 else {'sello': sello}
+        guardar_snapshot(f"{nombre}__{i}", frames[i], extra=extra, directorio=DIRECTORIO)
+    _VISTOS[nombre] = (sello, valor)
+
+class _Candado:
+    """flock exclusivo sobre <carpeta>/<nombre>.lock, con espera acotada."""
+    def __init__(self, nombre):
+        self.ruta = os.path.join(DIRECTORIO, f"{nombre}.lock")
+        self.archivo = None
+
+    def __enter__(self):
+        if fcntl is None: return self
+        os.makedirs(DIRECTORIO, exist_ok=True)
+        self.archivo = open(self.ruta, 'a')
+        limite = time.monotonic() + ESPERA_CANDADO
+        while True:
+            try:
+                fcntl.flock(self.archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return self
+            except BlockingIOError:
+                if time.monotonic() > limite:
+                    log.warning(f"Candado de '{self.ruta}' ocupado por más de {ESPERA_CANDADO} s; se descarga sin él")
+                    return self
+                time.sleep(0.2)
+
+    def __exit__(self, *exc):
+        if self.archivo is not None:
+            self.archivo.close()  # Cerrar libera el flock
+
+def cargar(llave, cargar_origen, ttl=None):
+    """
+    Trae el dataset de `llave` del nivel compartido si alguna réplica lo dejó vigente (menos de
+    `ttl` segundos); si no, toma el candado, vuelve a revisar y solo entonces llama a
+    `cargar_origen()` y publica el resultado con un sello de versión nuevo.
+    """
+    nombre = _nombre(llave)
+    manifiesto = _manifiesto(nombre)
+    if _vigente(manifiesto, ttl):
+        valor = _leer_vigente(nombre, manifiesto)
+        if valor is not None: return valor
+
+    with _Candado(nombre):
+        manifiesto = _manifiesto(nombre)  # Otra réplica pudo terminar mientras esperábamos
+        if _vigente(manifiesto, ttl):
+            valor = _leer_vigente(nombre, manifiesto)
+            if valor is not None: return valor
+
+        valor = cargar_origen()
+        visto = _VISTOS.get(nombre)
+        if visto is not None and _mismo_valor(visto[1], valor):
+            valor = visto[1]  # Sin cambios: mismo objeto (y mismo sello) que ya se tenía
+        try:
+            _guardar(nombre, valor, manifiesto)
+        except Exception as e:
+            log.warning(f"No se pudo escribir '{nombre}' en el caché compartido: {e}")
+        return valor
@@ -2,104 +2,513 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from supabase import create_client, Client
+import threading
+import hashlib
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from datetime import datetime
+from modules.snapshot import guardar_snapshot, leer_snapshot
+from modules.almacen import compartido, derivado
+from modules.fuentes import fuente_datos, ColumnaInexistente, COL_ACTUALIZACION
+
+log = logging.getLogger(__name__)
+
+# --- CONFIGURACIÓN DE DESCARGA ---
+# PostgREST corta cada respuesta en 'max-rows' (1000 por defecto en Supabase),
+# así que en fuentes paginadas pedimos la vista en rangos de ese tamaño y en paralelo.
+# La fuente (Supabase, Postgres directo o archivos locales) se elige en modules/fuentes.py.
+PAGE_SIZE = 1000
+MAX_WORKERS = 6
 
 # --- UTILIDAD INTERNA ---
+def _digitos_a_entero(digitos, mascara):
+    """Acumula en base 10 los dígitos marcados por `mascara` (recorre columnas, no filas)."""
+    valor = np.zeros(digitos.shape[0], dtype=np.int64)
+    for j in range(digitos.shape[1]):
+        valor = np.where(mascara[:, j], valor * 10 + digitos[:, j], valor)
+    return valor
+
 def vectorizar_minutos(series):
-    """Convierte minutos formato texto/float a float decimal."""
-    mask_is_float = ~series.astype(str).str.contains(':')
-    result_minutes = pd.Series(0.0, index=series.index)
-    result_minutes.loc[mask_is_float] = pd.to_numeric(series.loc[mask_is_float], errors='coerce').fillna(0.0)
-    m_s_part = series.loc[~mask_is_float].astype(str).str.split(':').str[:2].str.join(':')
+    """
+    Convierte minutos 'MM:SS' (o ya numéricos) a float decimal sin pasar por timedelta:
+    el texto se ve como matriz de bytes y los dígitos se acumulan con numpy.
+    """
+    if pd.api.types.is_numeric_dtype(series):
+        return pd.to_numeric(series, errors='coerce').fillna(0.0).astype(float)
+
+    texto = series.astype(str)
     try:
-        duration = pd.to_timedelta('00:' + m_s_part)
-        result_minutes.loc[~mask_is_float] = duration.dt.total_seconds() / 60.0
-    except:
-        result_minutes.loc[~mask_is_float] = 0.0
-    return result_minutes.fillna(0.0)
+        crudo = texto.to_numpy(dtype='S')
+    except UnicodeEncodeError:
+        crudo = texto.str.encode('ascii', 'replace').to_numpy(dtype='S')
+    n, ancho = len(crudo), max(crudo.dtype.itemsize, 1)
+    bytes_ = np.frombuffer(crudo.tobytes(), dtype=np.uint8).reshape(n, ancho) if n else np.zeros((0, ancho), np.uint8)
 
-# --- CONEXIÓN SUPABASE ---
-@st.cache_resource
-def get_supabase_client() -> Client:
+    es_digito = (bytes_ >= 48) & (bytes_ <= 57)
+    digitos = bytes_.astype(np.int64) - 48
+    es_sep = bytes_ == ord(':')
+    pos = np.arange(ancho)[None, :]
+
+    tiene_sep = es_sep.any(axis=1)
+    p1 = np.where(tiene_sep, es_sep.argmax(axis=1), ancho)[:, None]
+    resto_sep = es_sep & (pos > p1)
+    p2 = np.where(resto_sep.any(axis=1), resto_sep.argmax(axis=1), ancho)[:, None]
+
+    en_minutos = pos < p1
+    en_segundos = (pos > p1) & (pos < p2) & (bytes_ != 0)
+    validos = (tiene_sep & (p1[:, 0] > 0)
+               & (es_digito | ~en_minutos).all(axis=1)
+               & (es_digito | ~en_segundos).all(axis=1))
+
+    resultado = _digitos_a_entero(digitos, en_minutos) + _digitos_a_entero(digitos, en_segundos) / 60.0
+    resultado = np.where(validos, resultado, 0.0)
+
+    # Sin ':' el valor ya viene en minutos decimales ('12.5')
+    sin_sep = ~tiene_sep
+    if sin_sep.any():
+        resultado[sin_sep] = pd.to_numeric(texto.to_numpy()[sin_sep], errors='coerce')
+    return pd.Series(np.nan_to_num(resultado, nan=0.0), index=series.index)
+
+# --- MANIFIESTO DE COLUMNAS POR VISTA ---
+TABLA_MASTER = "vista_analitica_master"
+TABLA_EQUIPOS = "vista_equipos_master"
+TABLA_PLAYERS = "players"
+TABLA_ROSTERS = "rosters"
+TABLA_CATALOGO = "equipos"
+# Llave primaria de cada tabla: el orden estable para descargarla completa por rangos
+LLAVES_TABLAS = {
+    TABLA_MASTER: ('id_abe', 'id_player'),
+    TABLA_EQUIPOS: ('id_abe', 'equipo_nombre'),
+    TABLA_PLAYERS: ('player_id',),
+    TABLA_ROSTERS: ('player_id', 'equipo_id', 'effective_start_date'),
+    TABLA_CATALOGO: ('equipo_id',),
+}
+
+_MANIFIESTO = {}
+
+def declarar_columnas(tabla, columnas):
+    """Registra las columnas que una vista necesita de `tabla`. Los loaders piden solo la unión."""
+    _MANIFIESTO.setdefault(tabla, set()).update(columnas)
+    return list(columnas)
+
+def columnas_para(tabla, *obligatorias):
+    """Unión ordenada (tupla hashable para el caché) de lo declarado para `tabla`. None = todas."""
+    cols = _MANIFIESTO.get(tabla)
+    return tuple(sorted(cols.union(obligatorias))) if cols else None
+
+def columnas_master():
+    """
+    Proyección de la vista maestra que comparten main.py y los loaders derivados (misma llave de caché).
+    Siempre lleva `updated_at`: es la marca de agua de las correcciones a juegos viejos (si la vista
+    no la tiene, la descarga cae a select('*') y se proyecta lo que exista).
+    """
+    return columnas_para(TABLA_MASTER, 'id_abe', 'id_player', 'Fecha', COL_ACTUALIZACION)
+
+def _proyectar(df, columnas):
+    """Deja solo las columnas pedidas que existan (tras un fallback a select('*'))."""
+    if not columnas or df.empty: return df
+    return df[[c for c in columnas if c in df.columns]]
+
+def _descargar_tabla(tabla, columnas=None, limite=None):
+    """Descarga una tabla chica proyectando columnas; si alguna no existe, pide todas y proyecta."""
+    fuente = fuente_datos()
     try:
-        url = st.secrets["supabase_config"]["url"]
-        key = st.secrets["supabase_config"]["anon_key"]
-        return create_client(url, key)
-    except Exception as e:
-        st.error(f"Error Supabase Client: {e}")
-        st.stop()
+        df = fuente.leer(tabla, columnas, limite=limite)
+    except ColumnaInexistente:
+        df = fuente.leer(tabla, limite=limite)
+    return _proyectar(df, columnas)
 
-# --- CARGA 1: JUGADORES Y ESTADÍSTICAS (VISTA MAESTRA) ---
-@st.cache_data(ttl=600)
-def cargar_base_datos():
-    supabase = get_supabase_client()
+# --- HILOS CON CONTEXTO DE STREAMLIT ---
+def _pool_con_contexto(max_workers):
+    """ThreadPoolExecutor cuyos hilos heredan el contexto de la sesión (st.error, st.progress, caché)."""
+    ctx = get_script_run_ctx()
+    return ThreadPoolExecutor(max_workers=max_workers, initializer=lambda: add_script_run_ctx(ctx=ctx))
+
+# --- DESCARGA PARALELA POR RANGOS ---
+def _contar_filas(tabla, filtros=None):
+    """Cuenta las filas de una tabla/vista sin descargarlas."""
+    return fuente_datos().contar(tabla, filtros)
+
+def _descargar_rango(tabla, columnas, orden, inicio, fin, filtros=None):
+    """Descarga las filas [inicio, fin] con un orden estable, como DataFrame."""
+    return fuente_datos().leer(tabla, columnas, orden, filtros, inicio, fin)
+
+def descargar_tabla_paralela(tabla, columnas=None, orden=("id_abe",), page_size=PAGE_SIZE,
+                             max_workers=MAX_WORKERS, on_progress=None, filtros=None):
+    """
+    Descarga una tabla completa en rangos de `page_size` filas usando un pool acotado de hilos.
+    Los bloques (DataFrames) se reensamblan en orden en un solo frame. `on_progress(hechos, total)` se llama desde los hilos
+    del pool (con el contexto de Streamlit adjunto), así que puede actualizar un st.progress
+    creado fuera de una función cacheada sin romper el replay del caché.
+    Si la fuente no es paginada (Postgres directo, archivos locales) basta una sola lectura.
+    """
+    fuente = fuente_datos()
+    if not fuente.paginada:
+        df = fuente.leer(tabla, columnas, orden, filtros)
+        if on_progress is not None: on_progress(1, 1)
+        return df
+
+    total_filas = _contar_filas(tabla, filtros)
+    if total_filas == 0:
+        return pd.DataFrame()
+
+    rangos = [(ini, ini + page_size - 1) for ini in range(0, total_filas, page_size)]
+    lock = threading.Lock()
+    avance = {'hechos': 0}
+
+    def _tarea(ini, fin):
+        bloque = _descargar_rango(tabla, columnas, orden, ini, fin, filtros)
+        if on_progress is not None:
+            with lock:
+                avance['hechos'] += 1
+                on_progress(avance['hechos'], len(rangos))
+        return bloque
+
+    with _pool_con_contexto(min(max_workers, len(rangos))) as pool:
+        bloques = list(pool.map(lambda r: _tarea(*r), rangos))
+
+    # Si entraron filas entre el conteo y la descarga, seguimos pidiendo la cola
+    siguiente = len(rangos) * page_size
+    while len(bloques[-1]) == page_size:
+        bloques.append(_descargar_rango(tabla, columnas, orden, siguiente, siguiente + page_size - 1, filtros))
+        siguiente += page_size
+
+    return pd.concat(bloques, ignore_index=True)
+
+# --- SANITIZACIÓN DE LA VISTA MAESTRA ---
+# Mapa único de tipos. Lo que no aparece aquí y empieza con s / Tm_ / Opp_ es un conteo numérico.
+ESQUEMA_MASTER = {
+    'sMinutes': 'minutos', 'Tm_MIN': 'minutos',
+    'Fecha': 'fecha',
+    'Opp_Name': 'texto', 'Nombre': 'texto', 'equipo_nombre': 'texto', 'Categoria': 'texto',
+}
+PREFIJOS_NUMERICOS = ('s', 'Tm_', 'Opp_')
+FORMATO_FECHA = 'ISO8601'  # Supabase entrega fechas ISO: evita que pandas adivine el formato
+
+def tipo_columna(col):
+    return ESQUEMA_MASTER.get(col, 'numero' if col.startswith(PREFIJOS_NUMERICOS) else None)
+
+def _coercion_numerica_en_bloque(df, columnas):
+    """Convierte todas las columnas numéricas en una sola pasada; si hay texto basura, cae a to_numeric."""
+    bloque = df[columnas]
     try:
-        # Descargar TODO (Límite alto)
-        response = (
-            supabase.table("vista_analitica_master")
-            .select("*")
-            .limit(100000) 
-            .execute()
+        valores = bloque.to_numpy(dtype='float64', na_value=np.nan)
+    except (ValueError, TypeError):
+        valores = bloque.apply(pd.to_numeric, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    np.nan_to_num(valores, copy=False, nan=0.0)
+    return pd.DataFrame(valores, index=df.index, columns=columnas)
+
+def sanitizar_master(df_master):
+    """Limpia minutos, fechas y numéricos de filas crudas de vista_analitica_master según ESQUEMA_MASTER."""
+    tipos = {c: tipo_columna(c) for c in df_master.columns}
+    orden_original = list(df_master.columns)
+
+    # Minutos ('MM:SS' -> decimal)
+    for col in [c for c, t in tipos.items() if t == 'minutos']:
+        df_master[col] = vectorizar_minutos(df_master[col])
+
+    # Fechas
+    if 'Fecha' in df_master.columns:
+        df_master['Fecha'] = pd.to_datetime(df_master['Fecha'], format=FORMATO_FECHA, errors='coerce')
+    else:
+         df_master['Fecha'] = datetime.now()
+         orden_original.append('Fecha')
+
+    # Conteos (EXCLUYENDO Opp_Name y demás textos): un solo bloque
+    cols_numericas = [c for c, t in tipos.items() if t == 'numero']
+    if cols_numericas:
+        df_numerico = _coercion_numerica_en_bloque(df_master, cols_numericas)
+        df_master = pd.concat([df_master.drop(columns=cols_numericas), df_numerico], axis=1)[orden_original]
+
+    # Limpieza específica para Opp_Name (Asegurar que sea Texto)
+    if 'Opp_Name' in df_master.columns:
+        df_master['Opp_Name'] = df_master['Opp_Name'].astype(str).replace(['nan', 'None', '0', '0.0'], '-')
+
+    return df_master
+
+# --- COMPACTACIÓN DE TIPOS ---
+# Textos repetidos -> category. Conteos de box score (nunca pasan de unos cientos) -> int16;
+# float32 solo donde hay fracciones (minutos). int16 y no int8 para que 2*FG, 3*3PM, etc. no desborden.
+COLS_CATEGORICAS = ['Nombre', 'equipo_nombre', 'Categoria', 'Opp_Name']
+
+def _compactar_numerica(serie):
+    valores = serie.to_numpy()
+    if valores.size == 0 or valores.dtype == bool or not np.issubdtype(valores.dtype, np.number):
+        return serie
+    if np.issubdtype(valores.dtype, np.floating) and not np.all(np.mod(valores, 1) == 0):
+        return serie.astype(np.float32)
+    minimo, maximo = valores.min(), valores.max()
+    for tipo in (np.int16, np.int32):
+        info = np.iinfo(tipo)
+        if info.min <= minimo and maximo <= info.max:
+            return serie.astype(tipo)
+    return serie
+
+def compactar_tipos(df_master):
+    """Convierte textos de baja cardinalidad a category y baja los conteos a int16/float32."""
+    for col in COLS_CATEGORICAS:
+        if col in df_master.columns:
+            df_master[col] = df_master[col].astype('category')
+
+    cols_stats = [c for c in df_master.columns if tipo_columna(c) in ('numero', 'minutos')]
+    for col in cols_stats:
+        df_master[col] = _compactar_numerica(df_master[col])
+    return df_master
+
+def reporte_memoria(df_antes_bytes, *dfs_despues):
+    """Texto con el tamaño antes/después de compactar (para el log del servidor)."""
+    despues = sum(df.memory_usage(deep=True).sum() for df in dfs_despues)
+    factor = df_antes_bytes / despues if despues else 0
+    return f"Memoria vista maestra: {df_antes_bytes / 1e6:.1f} MB -> {despues / 1e6:.1f} MB ({factor:.1f}x)"
+
+# --- MODELO ESTRELLA: HECHOS JUGADOR-JUEGO Y EQUIPO-JUEGO ---
+# La vista maestra repite ~40 columnas Tm_*/Opp_* en cada renglón de jugador. En memoria (y en
+# snapshots / caché compartido) se guardan normalizadas: una tabla de hechos por jugador-juego
+# y otra por equipo-juego; cada jugador apunta a su fila de equipo con un entero (`fila_equipo`).
+LLAVE_EQUIPO = ['id_abe', 'equipo_nombre']
+COLS_JUEGO_EQUIPO = ['id_abe', 'equipo_nombre', 'Categoria', 'Fecha', 'Opp_Name']
+COL_FILA_EQUIPO = 'fila_equipo'
+ATTR_ENLACE = 'enlace_equipos'  # Marca en .attrs que comparten unos hechos enlazados juntos (sobrevive filtros y snapshots)
+
+def es_columna_equipo(col):
+    """Columnas que son del equipo en ese juego (iguales para todos sus jugadores)."""
+    return col.startswith(('Tm_', 'Opp_'))
+
+def derivar_tabla_equipos(df_master):
+    """
+    Una fila por juego x equipo a partir de la vista maestra: los Tm_*/Opp_* ya vienen
+    repetidos en cada renglón de jugador, así que basta quedarse con el primero.
+    """
+    if df_master.empty or not set(LLAVE_EQUIPO) <= set(df_master.columns):
+        return pd.DataFrame()
+    cols = [c for c in df_master.columns if c in COLS_JUEGO_EQUIPO or es_columna_equipo(c)]
+    df_equipos = df_master.loc[~df_master.duplicated(LLAVE_EQUIPO), cols]
+    return df_equipos.sort_values(LLAVE_EQUIPO, ignore_index=True)
+
+def _filas_equipo(df_jugadores, df_equipos):
+    """Número de fila del equipo-juego de cada jugador-juego (-1 si no existe), por llave."""
+    llaves = df_equipos[LLAVE_EQUIPO].reset_index(drop=True)
+    llaves[COL_FILA_EQUIPO] = np.arange(len(llaves), dtype=np.int32)
+    filas = df_jugadores[LLAVE_EQUIPO].merge(llaves, on=LLAVE_EQUIPO, how='left', validate='many_to_one')[COL_FILA_EQUIPO]
+    return filas.fillna(-1).astype(np.int32).to_numpy()
+
+def _enlazar(df_jugadores, df_equipos):
+    """Pone en cada jugador-juego el número de fila de su equipo-juego y marca a ambos con la misma ATTR_ENLACE."""
+    df = df_jugadores.assign(**{COL_FILA_EQUIPO: _filas_equipo(df_jugadores, df_equipos)})
+    df.attrs[ATTR_ENLACE] = df_equipos.attrs[ATTR_ENLACE] = uuid.uuid4().hex
+    return df
+
+def _mismo_enlace(df_jugadores, df_equipos, filas):
+    """¿Las posiciones `fila_equipo` sirven para `df_equipos`? (misma marca y dentro de rango)"""
+    marca_jugadores, marca_equipos = df_jugadores.attrs.get(ATTR_ENLACE), df_equipos.attrs.get(ATTR_ENLACE)
+    if marca_jugadores is not None and marca_equipos is not None and marca_jugadores != marca_equipos:
+        return False
+    return not len(filas) or int(filas.max()) < len(df_equipos)
+
+def separar_hechos(df_master):
+    """Vista maestra (ancha) -> (hechos jugador-juego, hechos equipo-juego)."""
+    if df_master.empty or not set(LLAVE_EQUIPO) <= set(df_master.columns):
+        return df_master, pd.DataFrame()
+    df_equipos = derivar_tabla_equipos(df_master)
+    cols_jugador = [c for c in df_master.columns if not es_columna_equipo(c) and c != COL_FILA_EQUIPO]
+    return _enlazar(df_master[cols_jugador], df_equipos), df_equipos
+
+def unir_equipo(df_jugadores, df_equipos, orden=None):
+    """
+    Agrega a unos jugador-juego (ya filtrados) las columnas de su equipo-juego: un `take` por el
+    entero `fila_equipo`, sin join por llaves. `orden` reacomoda las columnas como la vista ancha.
+    """
+    if df_jugadores.empty or df_equipos.empty or COL_FILA_EQUIPO not in df_jugadores.columns:
+        return df_jugadores
+    cols_equipo = [c for c in df_equipos.columns if c not in df_jugadores.columns]
+    filas = df_jugadores[COL_FILA_EQUIPO].to_numpy()
+    if not _mismo_enlace(df_jugadores, df_equipos, filas):
+        # Hechos de publicaciones distintas: las posiciones no valen, se vuelve a enlazar por llave
+        filas = _filas_equipo(df_jugadores, df_equipos)
+    df_equipo = df_equipos[cols_equipo].take(np.maximum(filas, 0))
+    df_equipo.index = df_jugadores.index
+    if (filas < 0).any():  # Sin equipo-juego: vacío, no los datos de la fila 0
+        df_equipo = df_equipo.where(pd.Series(filas >= 0, index=df_equipo.index), axis=0)
+    df = pd.concat([df_jugadores.drop(columns=COL_FILA_EQUIPO), df_equipo], axis=1)
+    if orden:
+        df = df[[c for c in orden if c in df.columns] + [c for c in df.columns if c not in orden]]
+    return df
+
+# --- SINCRONIZACIÓN INCREMENTAL (MARCA DE AGUA) ---
+LLAVE_MASTER = ['id_abe', 'id_player']
+RESYNC_COMPLETO_HORAS = 24        # Recarga completa periódica para reflejar borrados
+SNAPSHOT_MASTER = "master"
+
+@st.cache_resource
+def _estado_master(columnas=None):
+    """
+    Estado del proceso por proyección de columnas: últimos hechos (jugador y equipo) y su marca
+    de agua (sobrevive al TTL del almacén compartido). `hechos` es la tupla publicada: si no hubo
+    cambios se regresa ese mismo objeto, así el almacén no sube de versión por datos iguales.
+    """
+    return {'df': None, 'equipos': None, 'hechos': None, 'watermark': None, 'ultima_completa': None,
+            'lock': threading.Lock()}
+
+def _calcular_watermark(df):
+    """Último id_abe visto (y último updated_at si existe)."""
+    if df.empty or 'id_abe' not in df.columns:
+        return None
+    wm = {'id_abe': df['id_abe'].max()}
+    if COL_ACTUALIZACION in df.columns:
+        wm[COL_ACTUALIZACION] = df[COL_ACTUALIZACION].max()
+    return wm
+
+def _filtros_delta(wm):
+    """Filas del último juego visto en adelante (se re-pide por si quedó a medias) o actualizadas después."""
+    desde_juego = ("gte", "id_abe", int(wm['id_abe']))
+    if wm.get(COL_ACTUALIZACION) is not None and pd.notna(wm[COL_ACTUALIZACION]):
+        return [("or", [desde_juego, ("gt", COL_ACTUALIZACION, wm[COL_ACTUALIZACION])])]
+    return [desde_juego]
+
+def _fusionar(df_base, df_delta, llave):
+    """Une filas nuevas/corregidas al frame existente; gana la versión más reciente de cada llave."""
+    df = pd.concat([df_base, df_delta], ignore_index=True)
+    df = df.drop_duplicates(subset=llave, keep='last')
+    # concat de categorías distintas regresa object: se vuelve a compactar
+    return compactar_tipos(df.sort_values(llave, ignore_index=True))
+
+def _fusionar_delta(hechos_base, hechos_delta):
+    """Fusiona los hechos de un delta (jugador y equipo por separado) y vuelve a enlazar."""
+    (jug_base, eq_base), (jug_delta, eq_delta) = hechos_base, hechos_delta
+    if jug_delta.empty:
+        return hechos_base
+    df_equipos = _fusionar(eq_base, eq_delta, LLAVE_EQUIPO)
+    df_jugadores = _fusionar(jug_base.drop(columns=COL_FILA_EQUIPO), jug_delta.drop(columns=COL_FILA_EQUIPO), LLAVE_MASTER)
+    return _enlazar(df_jugadores, df_equipos), df_equipos
+
+def _mismos_hechos(hechos, hechos_base):
+    """¿La fusión dejó los hechos igual? El delta siempre re-pide el último juego, aunque no haya cambiado."""
+    return all(len(df) == len(base) and df.reset_index(drop=True).equals(base.reset_index(drop=True))
+               for df, base in zip(hechos, hechos_base))
+
+def _nombre_snapshot(columnas):
+    if not columnas: return SNAPSHOT_MASTER
+    return f"{SNAPSHOT_MASTER}_{hashlib.sha1(','.join(columnas).encode()).hexdigest()[:10]}"
+
+def _descargar_master(columnas, **kwargs):
+    """Descarga (por rangos), sanitiza y normaliza la vista maestra: (hechos jugador, hechos equipo)."""
+    try:
+        df_crudo = descargar_tabla_paralela(TABLA_MASTER, columnas, orden=LLAVE_MASTER, **kwargs)
+    except ColumnaInexistente:
+        df_crudo = descargar_tabla_paralela(TABLA_MASTER, None, orden=LLAVE_MASTER, **kwargs)
+    if df_crudo.empty: return pd.DataFrame(), pd.DataFrame()
+
+    df_master = sanitizar_master(_proyectar(df_crudo, columnas))
+    bytes_antes = df_master.memory_usage(deep=True).sum()
+    hechos = separar_hechos(compactar_tipos(df_master))
+    if not kwargs.get('filtros'):
+        log.info(reporte_memoria(bytes_antes, *hechos))
+    return hechos
+
+def _sembrar_desde_snapshot(estado, columnas):
+    """Arranque en caliente: toma el último snapshot en disco (jugadores + equipos) como punto de partida."""
+    df_snap, manifiesto = leer_snapshot(_nombre_snapshot(columnas))
+    df_equipos, _ = leer_snapshot(f"{_nombre_snapshot(columnas)}_equipos")
+    if df_snap is None or df_equipos is None or COL_FILA_EQUIPO not in df_snap.columns:
+        return
+    estado['df'], estado['equipos'] = df_snap, df_equipos
+    estado['hechos'] = (df_snap, df_equipos)
+    estado['watermark'] = manifiesto.get('watermark') or _calcular_watermark(df_snap)
+    estado['ultima_completa'] = datetime.fromisoformat(manifiesto.get('ultima_completa', manifiesto['guardado']))
+
+def sincronizar_master(columnas=None, on_progress=None):
+    """
+    Devuelve la vista maestra sanitizada y normalizada: (hechos jugador-juego, hechos equipo-juego).
+    La primera vez (o cada RESYNC_COMPLETO_HORAS) descarga todo; después solo pide las filas
+    posteriores a la marca de agua y las fusiona.
+    Si la fuente no responde, sirve el último dataset bueno (memoria o snapshot en disco).
+    """
+    estado = _estado_master(columnas)
+    with estado['lock']:
+        if estado['df'] is None:
+            _sembrar_desde_snapshot(estado, columnas)
+
+        ahora = datetime.now()
+        completa = (
+            estado['df'] is None or estado['watermark'] is None
+            or (ahora - estado['ultima_completa']).total_seconds() > RESYNC_COMPLETO_HORAS * 3600
         )
-        
-        if not response.data: return pd.DataFrame()
-        
-        df_master = pd.DataFrame(response.data)
-
-        # Limpieza de Minutos
-        if 'sMinutes' in df_master.columns:
-             if df_master['sMinutes'].dtype == object or df_master['sMinutes'].dtype == str:
-                 df_master['sMinutes'] = vectorizar_minutos(df_master['sMinutes'])
-             else:
-                 df_master['sMinutes'] = pd.to_numeric(df_master['sMinutes'], errors='coerce').fillna(0)
-
-        if 'Tm_MIN' in df_master.columns:
-             if df_master['Tm_MIN'].dtype == object:
-                 df_master['Tm_MIN'] = vectorizar_minutos(df_master['Tm_MIN'])
-             else:
-                 df_master['Tm_MIN'] = pd.to_numeric(df_master['Tm_MIN'], errors='coerce').fillna(0)
-
-        # Fechas
-        if 'Fecha' in df_master.columns:
-            df_master['Fecha'] = pd.to_datetime(df_master['Fecha'], errors='coerce')
-        else:
-             df_master['Fecha'] = datetime.now()
-
-        # --- CORRECCIÓN AQUÍ ---
-        # Sanitización Numérica (EXCLUYENDO Opp_Name)
-        cols_numericas = [c for c in df_master.columns if c.startswith('s') or c.startswith('Tm_') or c.startswith('Opp_')]
-        
-        for col in cols_numericas:
-             # Agregamos 'Opp_Name' a las excepciones para que NO lo convierta a número
-             if col not in ['sMinutes', 'Tm_MIN', 'Opp_Name']:
-                df_master[col] = pd.to_numeric(df_master[col], errors='coerce').fillna(0)
 
-        # Limpieza específica para Opp_Name (Asegurar que sea Texto)
-        if 'Opp_Name' in df_master.columns:
-            df_master['Opp_Name'] = df_master['Opp_Name'].astype(str).replace(['nan', 'None', '0', '0.0'], '-')
+        try:
+            if completa:
+                hechos = _descargar_master(columnas, on_progress=on_progress)
+                estado['ultima_completa'] = ahora
+                hubo_cambios = True
+            else:
+                hechos_delta = _descargar_master(columnas, on_progress=on_progress,
+                                                 filtros=_filtros_delta(estado['watermark']))
+                hechos = _fusionar_delta(estado['hechos'], hechos_delta)
+                hubo_cambios = not _mismos_hechos(hechos, estado['hechos'])
+        except Exception as e:
+            if estado['df'] is None:
+                raise
+            st.warning(f"⚠️ La fuente de datos no respondió, mostrando el último dataset disponible: {e}")
+            return estado['hechos']
+
+        if not hubo_cambios:
+            return estado['hechos']
+        estado['df'], estado['equipos'] = hechos
+        estado['hechos'] = hechos
+        estado['watermark'] = _calcular_watermark(estado['df'])
 
-        return df_master
+        if not estado['df'].empty:
+            try:
+                guardar_snapshot(f"{_nombre_snapshot(columnas)}_equipos", estado['equipos'])
+                guardar_snapshot(_nombre_snapshot(columnas), estado['df'], estado['watermark'],
+                                 extra={'ultima_completa': estado['ultima_completa']})
+            except Exception as e:
+                log.warning(f"No se pudo guardar el snapshot: {e}")
+        return hechos
+
+# --- CARGA 1: JUGADORES Y ESTADÍSTICAS (VISTA MAESTRA) ---
+# Los loaders publican en el almacén compartido (modules/almacen.py): todas las sesiones reciben
+# el mismo frame, sin la copia por rerun de st.cache_data. Son de solo lectura para las vistas.
+@compartido(ttl=600)
+def cargar_base_datos(columnas=None, _on_progress=None):
+    """
+    Carga la vista maestra (solo `columnas`, ver columnas_para) como (df_jugadores, df_equipos):
+    hechos jugador-juego y equipo-juego; ver unir_equipo / con_datos_de_equipo para juntarlos.
+    Al expirar el TTL solo se sincronizan los juegos nuevos. `_on_progress` no entra en la llave.
+    """
+    try:
+        return sincronizar_master(columnas, on_progress=_on_progress)
 
     except Exception as e:
         st.error(f"⚠️ Error cargando datos de Jugadores: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame(), pd.DataFrame()
+
+def con_datos_de_equipo(df_jugadores, columnas):
+    """Jugador-juego (ya filtrados) + columnas Tm_*/Opp_* de su equipo, con el orden de la vista ancha."""
+    return unir_equipo(df_jugadores, cargar_base_datos(columnas)[1], orden=columnas)
 
 # --- CARGA 2: EQUIPOS (CARRIL B - SIN DUPLICADOS) ---
-@st.cache_data(ttl=600)
-def cargar_datos_equipos_only():
-    """Carga datos optimizados solo para la tabla de posiciones."""
-    supabase = get_supabase_client()
+def cargar_datos_equipos_only(columnas=None, origen='master'):
+    """
+    Carga datos optimizados solo para la tabla de posiciones (una fila por juego x equipo).
+    origen='master': son los hechos equipo-juego de la vista maestra ya cacheada, sin otra
+    descarga; `columnas` es la proyección del master (ver columnas_master).
+    origen='vista': descarga vista_equipos_master aparte; `columnas` es de esa vista.
+    """
+    if origen == 'master':
+        return cargar_base_datos(columnas)[1]
+    return _cargar_vista_equipos(columnas)
+
+@compartido(ttl=600)
+def _cargar_vista_equipos(columnas=None):
     try:
-        response = supabase.table("vista_equipos_master").select("*").limit(10000).execute()
-        if not response.data: return pd.DataFrame()
-        
-        df = pd.DataFrame(response.data)
+        df = _descargar_tabla(TABLA_EQUIPOS, columnas, limite=10000)
+        if df.empty: return pd.DataFrame()
         
         # LIMPIEZA DE DUPLICADOS (Vital para evitar 73 wins)
         if not df.empty and 'id_abe' in df.columns and 'equipo_nombre' in df.columns:
-            df = df.drop_duplicates(subset=['id_abe', 'equipo_nombre']) 
-        
+            df = df.drop_duplicates(subset=LLAVE_EQUIPO) 
         # Tipos
         if 'Fecha' in df.columns:
             df['Fecha'] = pd.to_datetime(df['Fecha'], errors='coerce')
@@ -117,55 +526,166 @@ def cargar_datos_equipos_only():
         st.error(f"Error cargando vista equipos: {e}")
         return pd.DataFrame()
     
+# --- PARTICIONES POR CATEGORÍA (ALIAS APLICADOS AL CARGAR) ---
+# --- LIMPIEZA DE NOMBRES (Alias) ---
+ALIAS_EQUIPOS = {
+    "ANAHUAC QUERETARO": "Anáhuac QRO", "ANAHUAC XALAPA": "Anáhuac XAL",
+    "AUTONOMA DE CHIHUAHUA": "UACH", "CETYS MEXICALI": "CETYS",
+    "CEU MONTERREY": "CEU", "INTERAMERICANA": "Inter",
+    "TEC MTY GUADALAJARA": "Tec GDL", "TEC MTY HIDALGO": "Tec HGO",
+    "TEC MTY MONTERREY": "Tec MTY", "TEC MTY PUEBLA": "Tec PUE",
+    "TEC MTY SANTA FE": "Tec CSF", "TEC MTY TOLUCA": "Tec TOL",
+    "UANE": "UANE", "UANL": "UANL", "UDLAP": "UDLAP",
+    "UMAD": "UMAD", "UNIVERSIDAD MONTRER": "Montrer",
+    "UP MEXICO": "UP MX", "UPAEP": "UPAEP",
+    "ANAHUAC NORTE": "Anáhuac NTE", "CETYS TIJUANA": "CETYS",
+    "MODELO MERIDA": "Modelo", "TEC MTY AGUASCALIENTES": "Tec AGS",
+    "TEC MTY CEM": "Tec CEM", "TEC MTY QUERETARO": "Tec QRO",
+    "UVAQ MORELIA": "UVAQ"
+}
+
+def alias_sin_choques(nombres):
+    """Alias de cada nombre; si dos equipos de la misma partición caerían en el mismo alias, conservan su nombre."""
+    alias = {n: ALIAS_EQUIPOS.get(n, n) for n in nombres}
+    repetidos = pd.Series(list(alias.values()), dtype=object).value_counts()
+    return {n: (a if repetidos[a] == 1 else n) for n, a in alias.items()}
+
+def _aplicar_alias(df):
+    """Relabel categórico: se renombran las categorías presentes, no fila por fila."""
+    serie = df['equipo_nombre'].astype('category').cat.remove_unused_categories()
+    return df.assign(equipo_nombre=serie.cat.rename_categories(alias_sin_choques(serie.cat.categories)))
+
+def particionar(df):
+    """{categoria: frame con alias} a partir de un frame completo."""
+    if df.empty or 'Categoria' not in df.columns: return {}
+    return {str(cat): _aplicar_alias(grupo) for cat, grupo in df.groupby('Categoria', observed=True, sort=False)}
+
+def particion_master(columnas, categoria):
+    """
+    Game logs de una categoría, con alias de equipo. Se parte una vez por versión de los datos y
+    todas las sesiones reciben el mismo frame (solo lectura): sin filtro ni copia por rerun.
+    """
+    particiones = derivado(('particiones_master', columnas), lambda: particionar(cargar_base_datos(columnas)[0]))
+    return particiones.get(categoria, pd.DataFrame())
+
+def particion_equipos(columnas, categoria):
+    """Tabla juego x equipo de una categoría, con alias (se deduplica antes con el nombre original)."""
+    particiones = derivado(('particiones_equipos', columnas), lambda: particionar(cargar_datos_equipos_only(columnas)))
+    return particiones.get(categoria, pd.DataFrame())
+
+# --- REVALIDACIÓN CONDICIONAL (TABLAS DE DIMENSIONES) ---
+@st.cache_resource
+def _estado_tabla(tabla, columnas=None):
+    """Última copia descargada de una tabla chica y su firma de frescura (vive entre reruns y sesiones)."""
+    return {'df': None, 'firma': None, 'lock': threading.Lock()}
+
+def _firma_tabla(tabla):
+    """Sonda barata de la fuente, ej. (conteo de filas, max(updated_at)) o fecha del archivo local."""
+    return fuente_datos().firma(tabla)
+
+def descargar_tabla_revalidada(tabla, columnas=None, preparar=None):
+    """
+    Descarga una tabla chica solo si cambió: primero compara su firma con la de la última copia y,
+    si coincide, reutiliza esa copia. Así, al vencer el TTL solo se paga la sonda, no la descarga.
+    Sin cambios regresa el MISMO frame (solo lectura), para que el almacén no suba de versión.
+    `preparar(df)` (limpieza de tipos) se aplica una vez, a lo recién descargado.
+    """
+    estado = _estado_tabla(tabla, columnas)
+    with estado['lock']:
+        try:
+            firma = _firma_tabla(tabla)
+        except Exception as e:
+            log.warning(f"Sonda de '{tabla}' falló, se descarga completa: {e}")
+            firma = None
+
+        if firma is None or firma != estado['firma'] or estado['df'] is None:
+            df = _descargar_tabla(tabla, columnas)
+            df = preparar(df) if preparar is not None and not df.empty else df
+            # Sin sonda no se sabe si cambió: si llegó lo mismo se conserva el objeto anterior
+            if estado['df'] is None or not df.equals(estado['df']):
+                estado['df'] = df
+            estado['firma'] = firma
+        return estado['df']
+
 # --- CARGA 3: METADATA (PLAYERS & ROSTERS) ---
+def _limpiar_players(df_players):
+    """Estatura y peso numéricos."""
+    cols_bio = ['height_cm', 'weight_kg']
+    for c in cols_bio:
+        if c in df_players.columns:
+            df_players[c] = pd.to_numeric(df_players[c], errors='coerce').fillna(0)
+    return df_players
+
+def _limpiar_rosters(df_rosters):
+    """Fechas de rosters (importante para ordenar por la más reciente)."""
+    if 'effective_start_date' in df_rosters.columns:
+        df_rosters['effective_start_date'] = pd.to_datetime(df_rosters['effective_start_date'], errors='coerce')
+    return df_rosters
+
+@st.cache_resource
+def _estado_metadata(columnas_players=None, columnas_rosters=None):
+    """Última tupla (players, rosters) publicada: se reutiliza si ninguna de las dos cambió."""
+    return {'valor': None}
+
 # Usamos un TTL más largo (ej. 1 hora) porque la estatura/peso no cambian seguido
-@st.cache_data(ttl=3600) 
-def cargar_metadata_jugadores():
+@compartido(ttl=3600)
+def cargar_metadata_jugadores(columnas_players=None, columnas_rosters=None):
     """
     Carga las tablas de dimensiones: players (bio) y rosters (equipos/posiciones).
     Retorna dos DataFrames: (df_players, df_rosters)
     """
-    supabase = get_supabase_client()
-    try:
-        # 1. Fetch tabla 'players'
-        # Asegúrate de que tu tabla en Supabase se llame "players"
-        resp_p = supabase.table("players").select("*").execute()
-        df_players = pd.DataFrame(resp_p.data) if resp_p.data else pd.DataFrame()
-
-        # 2. Fetch tabla 'rosters'
-        # Asegúrate de que tu tabla en Supabase se llame "rosters"
-        resp_r = supabase.table("rosters").select("*").execute()
-        df_rosters = pd.DataFrame(resp_r.data) if resp_r.data else pd.DataFrame()
-
-        # --- Limpieza Preventiva ---
-        
-        # Convertir numéricos en Players
-        if not df_players.empty:
-            cols_bio = ['height_cm', 'weight_kg'] 
-            for c in cols_bio:
-                if c in df_players.columns:
-                    df_players[c] = pd.to_numeric(df_players[c], errors='coerce').fillna(0)
+    # 1 y 2. Fetch de 'players' y 'rosters' en paralelo (ya limpios); si una falla, la otra sigue
+    def _tabla_aislada(tabla, columnas, preparar):
+        try:
+            return descargar_tabla_revalidada(tabla, columnas, preparar)
+        except Exception as e:
+            st.error(f"⚠️ Error cargando {tabla}: {e}")
+            return pd.DataFrame()
 
-        # Convertir fechas en Rosters (importante para ordenar por la más reciente)
-        if not df_rosters.empty:
-            if 'effective_start_date' in df_rosters.columns:
-                df_rosters['effective_start_date'] = pd.to_datetime(df_rosters['effective_start_date'], errors='coerce')
+    with _pool_con_contexto(2) as pool:
+        fut_players = pool.submit(_tabla_aislada, TABLA_PLAYERS, columnas_players, _limpiar_players)
+        fut_rosters = pool.submit(_tabla_aislada, TABLA_ROSTERS, columnas_rosters, _limpiar_rosters)
+        df_players, df_rosters = fut_players.result(), fut_rosters.result()
 
-        return df_players, df_rosters
-
-    except Exception as e:
-        st.error(f"⚠️ Error cargando Metadata (Players/Rosters): {e}")
-        # Retornar DFs vacíos para no romper la app
-        return pd.DataFrame(), pd.DataFrame()
+    # Misma tupla si ninguna tabla cambió (el almacén compara por identidad)
+    estado = _estado_metadata(columnas_players, columnas_rosters)
+    anterior = estado['valor']
+    if anterior is None or anterior[0] is not df_players or anterior[1] is not df_rosters:
+        estado['valor'] = (df_players, df_rosters)
+    return estado['valor']
     
-@st.cache_data(ttl=3600)
+@compartido(ttl=3600)
 def cargar_catalogo_equipos():
     """Carga solo el catálogo de equipos (ID y Nombre) para cruces."""
-    supabase = get_supabase_client()
     try:
         # Pedimos explícitamente la tabla 'equipos'
-        response = supabase.table("equipos").select("equipo_id, nombre").execute()
-        return pd.DataFrame(response.data) if response.data else pd.DataFrame()
+        return descargar_tabla_revalidada(TABLA_CATALOGO, ['equipo_id', 'nombre'])
     except Exception as e:
         st.error(f"Error cargando catálogo equipos: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        return pd.DataFrame()
+
+# --- CARGA CONCURRENTE DE ARRANQUE ---
+def cargar_datos_iniciales(columnas_master=None, columnas_players=None, columnas_rosters=None, on_progress=None):
+    """
+    Lanza en paralelo stats, metadata (players + rosters) y catálogo de equipos.
+    Cada fuente va aislada: si una truena se regresa vacía y su error queda en `errores`,
+    sin bloquear a las demás. El arranque en frío tarda lo que la fuente más lenta.
+    Retorna (datos, errores) con llaves 'master', 'metadata' y 'catalogo'.
+    """
+    tareas = {
+        'master': lambda: cargar_base_datos(columnas_master, _on_progress=on_progress),
+        'metadata': lambda: cargar_metadata_jugadores(columnas_players, columnas_rosters),
+        'catalogo': cargar_catalogo_equipos,
+    }
+    vacios = {'master': (pd.DataFrame(), pd.DataFrame()), 'metadata': (pd.DataFrame(), pd.DataFrame()), 'catalogo': pd.DataFrame()}
+
+    datos, errores = {}, {}
+    with _pool_con_contexto(len(tareas)) as pool:
+        futuros = {nombre: pool.submit(tarea) for nombre, tarea in tareas.items()}
+        for nombre, futuro in futuros.items():
+            try:
+                datos[nombre] = futuro.result()
+            except Exception as e:
+                datos[nombre] = vacios[nombre]
+                errores[nombre] = e
+    return datos, errores
@@ -0,0 +1,347 @@
+# modules/fuentes.py
+"""
+Fuentes de datos intercambiables detrás de los loaders de data_loader.py.
+- 'supabase' (por defecto): API REST de Supabase (PostgREST), en rangos y con respuesta CSV.
+- 'postgres': conexión directa con SQLAlchemy (ABE_DATABASE_URL o st.secrets["postgres"]["url"]).
+- 'local': archivos <tabla>.parquet o <tabla>.csv en una carpeta (ABE_FUENTE_LOCAL): fixtures para
+  CI, perfilado offline o tablas calientes fuera de la API.
+Se elige con ABE_FUENTE (o st.secrets["fuente"]["tipo"]). Todas entregan las filas crudas, como
+las da la tabla; la sanitización sigue en data_loader.
+Fixtures locales a partir de la fuente configurada:
+    python -m modules.fuentes --exportar <carpeta> [tabla ...]
+"""
+import io
+import os
+import abc
+import sys
+import logging
+import operator
+import threading
+import numpy as np
+import pandas as pd
+import streamlit as st
+from supabase import create_client, Client
+
+try:
+    import sqlalchemy as sa  # Solo lo usa la fuente 'postgres'
+except ImportError:
+    sa = None
+
+log = logging.getLogger(__name__)
+
+# --- CONFIGURACIÓN ---
+VARIABLE_FUENTE = "ABE_FUENTE"
+VARIABLE_URL = "ABE_DATABASE_URL"
+VARIABLE_CARPETA = "ABE_FUENTE_LOCAL"
+COL_ACTUALIZACION = 'updated_at'  # Opcional: si la tabla la expone, sirve de sonda y de marca de agua
+# Formato de las respuestas REST: 'csv' viaja columnar (y con gzip, que httpx negocia solo) y se
+# decodifica directo a columnas tipadas; 'json' (lista de dicts por fila) queda como respaldo.
+FORMATO_DESCARGA = 'csv'
+
+def _config(variable, *ruta_secreto):
+    """Variable de entorno y, si no está, st.secrets[ruta...]; None si ninguna existe."""
+    valor = os.environ.get(variable)
+    if valor: return valor
+    try:
+        valor = st.secrets
+        for parte in ruta_secreto:
+            valor = valor[parte]
+        return valor
+    except Exception:
+        return None
+
+def url_postgres():
+    return _config(VARIABLE_URL, "postgres", "url")
+
+@st.cache_resource
+def motor_postgres(url):
+    if sa is None:
+        raise RuntimeError("La fuente 'postgres' requiere sqlalchemy (ver requirements.txt)")
+    return sa.create_engine(url, pool_pre_ping=True)
+
+class ColumnaInexistente(Exception):
+    """Se proyectó una columna que la tabla no tiene (quien llama reintenta pidiendo todas)."""
+
+# --- CONTRATO ---
+class Fuente(abc.ABC):
+    """
+    Lo que los loaders necesitan de una fuente. `filtros` es una lista (AND) de (op, columna, valor)
+    con op en 'eq', 'gt', 'gte', 'lt', 'lte', o ("or", [filtro, ...]).
+    Una fuente a la que le falte algún método truena al construirse, no a media carga.
+    """
+    nombre = None
+    paginada = False  # True: cada respuesta trae a lo más PAGE_SIZE filas y hay que pedir por rangos
+
+    @abc.abstractmethod
+    def contar(self, tabla, filtros=None):
+        """Número de filas de `tabla` que cumplen `filtros`."""
+
+    @abc.abstractmethod
+    def leer(self, tabla, columnas=None, orden=(), filtros=None, inicio=None, fin=None, limite=None):
+        """Filas [inicio, fin] (inclusivo) de `tabla` en `orden`; ColumnaInexistente si falta alguna de `columnas`."""
+
+    @abc.abstractmethod
+    def firma(self, tabla):
+        """Sonda barata que cambia cuando cambia la tabla (para revalidar sin descargarla)."""
+
+# --- SUPABASE (REST) ---
+@st.cache_resource
+def get_supabase_client() -> Client:
+    try:
+        url = st.secrets["supabase_config"]["url"]
+        key = st.secrets["supabase_config"]["anon_key"]
+        return create_client(url, key)
+    except Exception as e:
+        st.error(f"Error Supabase Client: {e}")
+        st.stop()
+
+_CSV_BOOLEANOS = {'true_values': ['t', 'true'], 'false_values': ['f', 'false']}
+_csv_no_disponible = threading.Event()  # Si el servidor rechaza el formato CSV, no se vuelve a intentar
+# Respuestas de PostgREST que significan "no sirvo text/csv" (Accept o Content-Type no soportado)
+_CODIGOS_FORMATO_RECHAZADO = {'406', '415', 'PGRST107'}
+
+def decodificar_respuesta(data):
+    """Respuesta PostgREST -> DataFrame. CSV (texto) se parsea por columnas; JSON llega como lista de dicts."""
+    if isinstance(data, str):
+        return pd.read_csv(io.StringIO(data), **_CSV_BOOLEANOS)
+    return pd.DataFrame(data) if data else pd.DataFrame()
+
+def _es_columna_inexistente(e):
+    """PostgREST responde 42703 si se proyecta una columna que la tabla no tiene."""
+    return getattr(e, 'code', None) == '42703'
+
+def _formato_rechazado(e):
+    """¿El servidor rechazó el formato CSV (y no fue un error pasajero: timeout, 5xx, conexión)?"""
+    if isinstance(e, pd.errors.ParserError): return True  # Respondió, pero el cuerpo no es CSV
+    mensaje = (getattr(e, 'message', None) or '').lower()
+    return str(getattr(e, 'code', None)) in _CODIGOS_FORMATO_RECHAZADO or 'media type' in mensaje
+
+def _ejecutar(construir_query):
+    """
+    Ejecuta la consulta que arma `construir_query()` pidiendo CSV. Solo si el servidor rechaza el
+    formato se repite en JSON (y ya no se pide CSV en el proceso); cualquier otro error (columna
+    inexistente, timeout, 5xx) sale tal cual para esta llamada. Se pasa un constructor porque
+    .csv() modifica la query.
+    """
+    if FORMATO_DESCARGA == 'csv' and not _csv_no_disponible.is_set():
+        try:
+            return decodificar_respuesta(construir_query().csv().execute().data)
+        except Exception as e:
+            if not _formato_rechazado(e): raise
+            _csv_no_disponible.set()
+            log.warning(f"El servidor no sirve CSV, se usa JSON: {e}")
+    return decodificar_respuesta(construir_query().execute().data)
+
+def _valor_postgrest(valor):
+    return str(valor) if isinstance(valor, (int, np.integer)) else f'"{valor}"'
+
+def _aplicar_filtros(query, filtros):
+    """Traduce los filtros del contrato a métodos PostgREST (un 'or' va como or_('a.gte.1,b.gt."x"'))."""
+    for op, *args in (filtros or ()):
+        if op == 'or':
+            query = query.or_(",".join(f"{col}.{o}.{_valor_postgrest(v)}" for o, col, v in args[0]))
+        else:
+            query = getattr(query, op)(*args)
+    return query
+
+class FuenteSupabase(Fuente):
+    nombre = 'supabase'
+    paginada = True
+
+    def contar(self, tabla, filtros=None):
+        query = get_supabase_client().table(tabla).select("*", count="exact", head=True)
+        return _aplicar_filtros(query, filtros).execute().count or 0
+
+    def leer(self, tabla, columnas=None, orden=(), filtros=None, inicio=None, fin=None, limite=None):
+        supabase = get_supabase_client()
+
+        def _query():
+            query = _aplicar_filtros(supabase.table(tabla).select(",".join(columnas) if columnas else "*"), filtros)
+            for col in orden:
+                query = query.order(col)
+            if inicio is not None:
+                query = query.range(inicio, fin)
+            return query.limit(limite) if limite else query
+        try:
+            return _ejecutar(_query)
+        except Exception as e:
+            if _es_columna_inexistente(e): raise ColumnaInexistente(str(e)) from e
+            raise
+
+    def firma(self, tabla):
+        """(conteo de filas, max(updated_at)). Si la tabla no tiene updated_at, solo el conteo."""
+        conteo = self.contar(tabla)
+        try:
+            data = (get_supabase_client().table(tabla).select(COL_ACTUALIZACION)
+                    .order(COL_ACTUALIZACION, desc=True, nullsfirst=False).limit(1).execute().data)
+            ultima = data[0][COL_ACTUALIZACION] if data else None
+        except Exception as e:
+            if not _es_columna_inexistente(e): raise
+            ultima = None
+        return (conteo, ultima)
+
+# --- POSTGRES DIRECTO ---
+_OPERADORES_SQL = {'eq': '=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+def _q(col):
+    return f'"{col}"'
+
+def _sql_filtros(filtros, parametros):
+    """Filtros del contrato -> condición SQL con parámetros enlazados (se agregan a `parametros`)."""
+    condiciones = []
+    for op, *args in (filtros or ()):
+        if op == 'or':
+            condiciones.append("(" + " OR ".join(_sql_filtros([f], parametros) for f in args[0]) + ")")
+        else:
+            col, valor = args
+            nombre = f"p{len(parametros)}"
+            parametros[nombre] = valor.item() if hasattr(valor, 'item') else valor
+            condiciones.append(f"{_q(col)} {_OPERADORES_SQL[op]} :{nombre}")
+    return " AND ".join(condiciones)
+
+def _sql_columna_inexistente(e):
+    """42703 en Postgres; sqlite (verificación local) no trae código, solo el mensaje."""
+    origen = getattr(e, 'orig', None)
+    return getattr(origen, 'pgcode', None) == '42703' or 'no such column' in str(origen)
+
+class FuentePostgres(Fuente):
+    nombre = 'postgres'
+
+    def __init__(self, url):
+        self.motor = motor_postgres(url)
+
+    def _consultar(self, sql, parametros):
+        try:
+            with self.motor.connect() as conexion:
+                return pd.read_sql(sa.text(sql), conexion, params=parametros)
+        except sa.exc.DBAPIError as e:
+            if _sql_columna_inexistente(e): raise ColumnaInexistente(str(e.orig)) from e
+            raise
+
+    def contar(self, tabla, filtros=None):
+        parametros = {}
+        condicion = _sql_filtros(filtros, parametros)
+        sql = f"SELECT COUNT(*) AS n FROM {_q(tabla)}" + (f" WHERE {condicion}" if condicion else "")
+        return int(self._consultar(sql, parametros)['n'].iloc[0])
+
+    def leer(self, tabla, columnas=None, orden=(), filtros=None, inicio=None, fin=None, limite=None):
+        parametros = {}
+        condicion = _sql_filtros(filtros, parametros)
+        sql = f"SELECT {', '.join(map(_q, columnas)) if columnas else '*'} FROM {_q(tabla)}"
+        if condicion: sql += f" WHERE {condicion}"
+        if orden: sql += " ORDER BY " + ", ".join(map(_q, orden))
+        if inicio is not None:
+            limite = min(limite, fin - inicio + 1) if limite else fin - inicio + 1
+        if limite: sql += f" LIMIT {int(limite)}"
+        if inicio: sql += f" OFFSET {int(inicio)}"
+        return self._consultar(sql, parametros)
+
+    def firma(self, tabla):
+        try:
+            fila = self._consultar(f"SELECT COUNT(*) AS n, MAX({_q(COL_ACTUALIZACION)}) AS ultima FROM {_q(tabla)}", {}).iloc[0]
+            return (int(fila['n']), fila['ultima'])
+        except ColumnaInexistente:
+            return (self.contar(tabla), None)
+
+# --- ARCHIVOS LOCALES ---
+_OPERADORES_LOCAL = {'eq': operator.eq, 'gt': operator.gt, 'gte': operator.ge, 'lt': operator.lt, 'lte': operator.le}
+
+def _mascara(df, filtros):
+    mascara = np.ones(len(df), dtype=bool)
+    for op, *args in (filtros or ()):
+        if op == 'or':
+            mascara &= np.logical_or.reduce([_mascara(df, [f]) for f in args[0]])
+        else:
+            col, valor = args
+            mascara &= _OPERADORES_LOCAL[op](df[col], valor).fillna(False).to_numpy(dtype=bool)
+    return mascara
+
+class FuenteLocal(Fuente):
+    nombre = 'local'
+
+    def __init__(self, carpeta):
+        self.carpeta = carpeta
+
+    def _ruta(self, tabla):
+        for extension in ('parquet', 'csv'):
+            ruta = os.path.join(self.carpeta, f"{tabla}.{extension}")
+            if os.path.exists(ruta): return ruta
+        raise FileNotFoundError(f"No hay {tabla}.parquet ni {tabla}.csv en '{self.carpeta}'")
+
+    def _tabla(self, tabla, filtros):
+        ruta = self._ruta(tabla)
+        df = pd.read_parquet(ruta) if ruta.endswith('.parquet') else pd.read_csv(ruta, **_CSV_BOOLEANOS)
+        return df[_mascara(df, filtros)] if filtros else df
+
+    def contar(self, tabla, filtros=None):
+        return len(self._tabla(tabla, filtros))
+
+    def leer(self, tabla, columnas=None, orden=(), filtros=None, inicio=None, fin=None, limite=None):
+        df = self._tabla(tabla, filtros)
+        faltantes = [c for c in (columnas or ()) if c not in df.columns]
+        if faltantes:
+            raise ColumnaInexistente(f"'{tabla}' no tiene {faltantes}")
+        if orden:
+            df = df.sort_values(list(orden), kind='stable')
+        if inicio is not None:
+            df = df.iloc[inicio:fin + 1]
+        if limite:
+            df = df.head(limite)
+        return (df[list(columnas)] if columnas else df).reset_index(drop=True)
+
+    def firma(self, tabla):
+        """Fecha de modificación y tamaño del archivo: no hace falta leerlo."""
+        info = os.stat(self._ruta(tabla))
+        return (info.st_mtime_ns, info.st_size)
+
+# --- SELECCIÓN ---
+FUENTES = {'supabase': FuenteSupabase, 'postgres': FuentePostgres, 'local': FuenteLocal}
+
+def tipo_configurado():
+    return (_config(VARIABLE_FUENTE, "fuente", "tipo") or 'supabase').lower()
+
+@st.cache_resource
+def _crear_fuente(tipo, destino):
+    if tipo not in FUENTES:
+        raise ValueError(f"Fuente de datos desconocida '{tipo}' (opciones: {', '.join(FUENTES)})")
+    return FUENTES[tipo](destino) if destino else FUENTES[tipo]()
+
+def fuente_datos():
+    """La fuente configurada (una instancia por proceso y configuración)."""
+    tipo = tipo_configurado()
+    destino = None
+    if tipo == 'postgres':
+        destino = url_postgres()
+        if not destino: raise ValueError(f"La fuente 'postgres' requiere {VARIABLE_URL} o st.secrets['postgres']['url']")
+    elif tipo == 'local':
+        destino = _config(VARIABLE_CARPETA, "fuente", "carpeta")
+        if not destino: raise ValueError(f"La fuente 'local' requiere {VARIABLE_CARPETA} o st.secrets['fuente']['carpeta']")
+    return _crear_fuente(tipo, destino)
+
+# --- EXPORTACIÓN DE FIXTURES ---
+def exportar(carpeta, tablas=None):
+    """Copia cada tabla cruda de la fuente configurada a <carpeta>/<tabla>.parquet (csv si parquet no puede)."""
+    from modules.data_loader import descargar_tabla_paralela, LLAVES_TABLAS
+    os.makedirs(carpeta, exist_ok=True)
+    for tabla in tablas or list(LLAVES_TABLAS):
+        if tabla not in LLAVES_TABLAS:
+            raise ValueError(f"'{tabla}' no tiene llave declarada en LLAVES_TABLAS: sin orden estable los rangos se enciman")
+        # Los rangos de PostgREST solo son estables con ORDER BY sobre una llave única
+        df = descargar_tabla_paralela(tabla, orden=LLAVES_TABLAS[tabla])
+        ruta = os.path.join(carpeta, f"{tabla}.parquet")
+        try:
+            df.to_parquet(ruta, index=False)
+        except Exception as e:
+            log.warning(f"{tabla} no cabe en parquet ({e}), se guarda como csv")
+            ruta = os.path.join(carpeta, f"{tabla}.csv")
+            df.to_csv(ruta, index=False)
+        log.info(f"{tabla}: {len(df):,} filas -> {ruta}")
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if '--exportar' not in args or len(args) < args.index('--exportar') + 2:
+        print(__doc__)
+        sys.exit(0)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    i = args.index('--exportar')
+    exportar(args[i + 1], args[i + 2:] or None)
@@ -0,0 +1,239 @@
+# modules/ingesta.py
+"""
+Ingesta masiva de box scores (una fila por jugador-juego) a Postgres.
+Lee archivos CSV / JSON (lista de registros) / JSONL, los valida contra el esquema de la vista
+maestra (llaves, fechas, minutos y conteos, ver ESQUEMA_MASTER) y los carga por lotes: COPY a una
+tabla temporal y upsert por (id_abe, id_player), una transacción por lote.
+Uso:
+    python -m modules.ingesta archivos... [--tabla boxscores] [--url postgresql://...] [--lote 50000] [--simulacro]
+Con --simulacro valida y arma los lotes sin conectarse (mide solo el lado cliente).
+Contra un Postgres real (COPY usa psycopg2):
+    ABE_TEST_DATABASE_URL=postgresql+psycopg2://... python -m pytest tests/test_ingesta.py
+    ABE_DATABASE_URL=postgresql+psycopg2://... python -m modules.benchmarks ingesta
+"""
+import io
+import re
+import sys
+import time
+import logging
+import argparse
+import json
+import numpy as np
+import pandas as pd
+import pyarrow.json as pa_json
+from modules.fuentes import url_postgres, motor_postgres, COL_ACTUALIZACION
+from modules.data_loader import tipo_columna, LLAVE_MASTER, FORMATO_FECHA
+
+log = logging.getLogger(__name__)
+
+# --- CONFIGURACIÓN ---
+TABLA_DESTINO = "boxscores"  # Tabla base que alimenta vista_analitica_master (requiere UNIQUE (id_abe, id_player))
+TAMANO_LOTE = 50000
+COLS_OBLIGATORIAS = LLAVE_MASTER + ['Fecha', 'equipo_nombre', 'Categoria']
+# Mismas reglas que vectorizar_minutos: 'MM:SS' o minutos decimales
+PATRON_MINUTOS = re.compile(r'^\d+:\d*(:.*)?$|^-?\d*\.?\d+$')
+
+# --- LECTURA ---
+def leer_archivo(ruta):
+    """Archivo de box scores -> DataFrame crudo (como lo entregaría la vista). Los parsers columnares ya tipan los conteos."""
+    if ruta.endswith('.csv'):
+        return pd.read_csv(ruta, true_values=['t', 'true'], false_values=['f', 'false'], low_memory=False)
+    if ruta.endswith('.jsonl'):
+        return pa_json.read_json(ruta).to_pandas()
+    if ruta.endswith('.json'):
+        with open(ruta, encoding='utf-8') as archivo:
+            return pd.DataFrame.from_records(json.load(archivo))
+    raise ValueError(f"Formato no soportado: {ruta} (csv, json o jsonl)")
+
+# --- VALIDACIÓN ---
+_BOOLEANOS = {'t': 1, 'true': 1, 'f': 0, 'false': 0}
+
+def _presentes(serie):
+    """No nulos y, si es texto, no vacíos."""
+    if serie.dtype != object: return serie.notna()
+    return serie.notna() & (serie.astype(str).str.strip() != '')
+
+def _como_numero(serie):
+    """Columna -> número. Lo normal es que ya venga numérica; si trae texto se convierte (booleanos 't'/'true' = 1/0)."""
+    if pd.api.types.is_bool_dtype(serie) or pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+    texto = serie.astype(str).str.strip().str.lower()
+    return pd.to_numeric(texto.map(_BOOLEANOS).fillna(texto.where(serie.notna())), errors='coerce')
+
+def validar(df, origen):
+    """
+    Regresa (filas válidas ya tipadas, lista de errores). Una fila se rechaza si le falta una llave,
+    la fecha no es ISO o algún minuto/conteo trae texto que la app convertiría en 0 en silencio.
+    """
+    errores = []
+    faltantes = [c for c in COLS_OBLIGATORIAS if c not in df.columns]
+    if faltantes:
+        return df.iloc[0:0], [f"{origen}: faltan columnas {faltantes}"]
+
+    df = df.copy()
+    invalida = np.zeros(len(df), dtype=bool)
+
+    def marcar(mascara, motivo):
+        nonlocal invalida
+        mascara = np.asarray(mascara, dtype=bool)
+        nuevas = mascara & ~invalida
+        if nuevas.any():
+            registros = ", ".join(str(i + 1) for i in np.flatnonzero(nuevas)[:5])
+            errores.append(f"{origen}: {int(nuevas.sum())} registros con {motivo} (ej. registros {registros})")
+        invalida |= mascara
+
+    for col in COLS_OBLIGATORIAS:
+        marcar(~_presentes(df[col]), f"'{col}' vacío")
+    for col in LLAVE_MASTER:
+        numero = _como_numero(df[col])
+        marcar(numero.isna() | (numero % 1 != 0), f"'{col}' no entero")
+        df[col] = numero.round().astype('Int64')
+
+    fechas = pd.to_datetime(df['Fecha'], format=FORMATO_FECHA, errors='coerce')
+    marcar(fechas.isna(), "'Fecha' no ISO")
+
+    for col in [c for c in df.columns if c not in LLAVE_MASTER]:
+        tipo = tipo_columna(col)
+        if tipo == 'minutos' and df[col].dtype == object:
+            texto = df[col].astype(str).str.strip()
+            marcar(_presentes(df[col]) & ~texto.str.match(PATRON_MINUTOS), f"minutos inválidos en '{col}'")
+        elif tipo == 'numero':
+            numero = _como_numero(df[col])
+            marcar(_presentes(df[col]) & numero.isna(), f"texto en la columna numérica '{col}'")
+            # COPY a una columna entera no acepta '12.0'
+            enteros = (numero.dropna() % 1 == 0).all()
+            df[col] = numero.round().astype('Int64') if enteros else numero
+
+    return df[~invalida], errores
+
+def _preparar(rutas):
+    """Lee y valida todos los archivos; si una llave se repite, gana la última aparición (como _fusionar)."""
+    frames, errores, leidas, rechazadas = [], [], 0, 0
+    for ruta in rutas:
+        try:
+            df = leer_archivo(ruta)
+        except Exception as e:
+            errores.append(f"{ruta}: no se pudo leer ({e})")
+            continue
+        leidas += len(df)
+        validas, errores_archivo = validar(df, ruta)
+        rechazadas += len(df) - len(validas)
+        frames.append(validas)
+        errores.extend(errores_archivo)
+    conteos = {'leidas': leidas, 'rechazadas': rechazadas}
+    if not frames:
+        return pd.DataFrame(), errores, conteos
+    df = pd.concat(frames, ignore_index=True)
+    return df.drop_duplicates(LLAVE_MASTER, keep='last', ignore_index=True), errores, conteos
+
+# --- CARGA (COPY + UPSERT) ---
+def _q(col):
+    return f'"{col}"'
+
+def _como_csv(df):
+    """Lote -> CSV sin encabezado para COPY (campo vacío = NULL)."""
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, na_rep='')
+    buffer.seek(0)
+    return buffer
+
+def _tipo_sql(col, serie):
+    if tipo_columna(col) == 'fecha': return "date"
+    if pd.api.types.is_bool_dtype(serie): return "boolean"
+    if pd.api.types.is_integer_dtype(serie): return "bigint"
+    if pd.api.types.is_float_dtype(serie): return "double precision"
+    return "text"
+
+def sql_crear_tabla(tabla, df):
+    """DDL de una tabla destino con la forma de un lote ya validado, con UNIQUE (id_abe, id_player) y updated_at."""
+    columnas = [f"{_q(c)} {_tipo_sql(c, df[c])}" for c in df.columns if c != COL_ACTUALIZACION]
+    return (f"CREATE TABLE {_q(tabla)} ({', '.join(columnas)}, "
+            f"{_q(COL_ACTUALIZACION)} timestamptz NOT NULL DEFAULT now(), "
+            f"UNIQUE ({', '.join(map(_q, LLAVE_MASTER))}))")
+
+def _columnas_destino(cursor, tabla):
+    cursor.execute(f"SELECT * FROM {_q(tabla)} LIMIT 0")
+    return [d[0] for d in cursor.description]
+
+def _sql_upsert(tabla, columnas, con_actualizacion):
+    lista = ", ".join(map(_q, columnas))
+    cambios = [f"{_q(c)} = EXCLUDED.{_q(c)}" for c in columnas if c not in LLAVE_MASTER]
+    if con_actualizacion:
+        cambios.append(f"{_q(COL_ACTUALIZACION)} = now()")  # La sincronización incremental la ve como corregida
+    accion = f"DO UPDATE SET {', '.join(cambios)}" if cambios else "DO NOTHING"
+    return (f"INSERT INTO {_q(tabla)} ({lista}) SELECT {lista} FROM _ingesta "
+            f"ON CONFLICT ({', '.join(map(_q, LLAVE_MASTER))}) {accion}")
+
+def cargar_lote(conexion, tabla, df, columnas, con_actualizacion):
+    """Un lote en una transacción: tabla temporal con la forma del destino, COPY y upsert."""
+    with conexion.cursor() as cursor:
+        cursor.execute(f"CREATE TEMP TABLE _ingesta (LIKE {_q(tabla)} INCLUDING DEFAULTS) ON COMMIT DROP")
+        cursor.copy_expert(f"COPY _ingesta ({', '.join(map(_q, columnas))}) FROM STDIN WITH (FORMAT csv)",
+                           _como_csv(df[columnas]))
+        cursor.execute(_sql_upsert(tabla, columnas, con_actualizacion))
+        afectadas = cursor.rowcount
+    conexion.commit()
+    return afectadas
+
+def ingestar(rutas, url=None, tabla=TABLA_DESTINO, lote=TAMANO_LOTE, simulacro=False):
+    """Valida y carga `rutas`. Regresa métricas (filas, rechazos, segundos por fase)."""
+    inicio = time.perf_counter()
+    df, errores, conteos = _preparar(rutas)
+    t_validacion = time.perf_counter() - inicio
+    for error in errores:
+        log.warning(error)
+
+    metricas = {**conteos, 'validas': len(df), 'cargadas': 0, 'lotes': 0, 't_validacion': t_validacion, 't_carga': 0.0}
+    if df.empty:
+        return metricas
+
+    inicio = time.perf_counter()
+    if simulacro:
+        for i in range(0, len(df), lote):
+            _como_csv(df.iloc[i:i + lote])
+            metricas['lotes'] += 1
+    else:
+        conexion = motor_postgres(url or url_postgres()).raw_connection()
+        try:
+            with conexion.cursor() as cursor:
+                destino = _columnas_destino(cursor, tabla)
+            conexion.rollback()
+            columnas = [c for c in df.columns if c in destino]
+            ignoradas = [c for c in df.columns if c not in destino]
+            if ignoradas:
+                log.warning(f"Columnas que '{tabla}' no tiene, se ignoran: {ignoradas}")
+            con_actualizacion = COL_ACTUALIZACION in destino and COL_ACTUALIZACION not in columnas
+            for i in range(0, len(df), lote):
+                metricas['cargadas'] += cargar_lote(conexion, tabla, df.iloc[i:i + lote], columnas, con_actualizacion)
+                metricas['lotes'] += 1
+        except Exception:
+            conexion.rollback()
+            raise
+        finally:
+            conexion.close()
+    metricas['t_carga'] = time.perf_counter() - inicio
+    return metricas
+
+def reporte(metricas, simulacro=False):
+    """Resumen con el rendimiento de cada fase en filas/segundo."""
+    por_seg = lambda filas, t: f"{filas / t:,.0f} filas/s" if t else "-"
+    fase_carga = "serialización de lotes (simulacro)" if simulacro else "COPY + upsert"
+    return (f"Leídas {metricas['leidas']:,} | válidas {metricas['validas']:,} | rechazadas {metricas['rechazadas']:,}"
+            f" (llaves repetidas se quedan con la última) | cargadas {metricas['cargadas']:,} en {metricas['lotes']} lotes\n"
+            f"  lectura + validación : {metricas['t_validacion']:6.2f} s ({por_seg(metricas['leidas'], metricas['t_validacion'])})\n"
+            f"  {fase_carga:<20} : {metricas['t_carga']:6.2f} s ({por_seg(metricas['validas'], metricas['t_carga'])})")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Carga masiva de box scores a Postgres (COPY + upsert).")
+    parser.add_argument('archivos', nargs='+', help="CSV, JSON o JSONL con una fila por jugador-juego")
+    parser.add_argument('--tabla', default=TABLA_DESTINO)
+    parser.add_argument('--url', default=None, help="Por defecto ABE_DATABASE_URL / st.secrets['postgres']['url']")
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE)
+    parser.add_argument('--simulacro', action='store_true', help="Validar y armar lotes sin conectarse")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    if not args.simulacro and not (args.url or url_postgres()):
+        parser.error("falta --url (o ABE_DATABASE_URL)")
+    metricas = ingestar(args.archivos, args.url, args.tabla, args.lote, args.simulacro)
+    print(reporte(metricas, args.simulacro))
+    sys.exit(1 if metricas['rechazadas'] else 0)
@@ -0,0 +1,467 @@
+# modules/metricas.py
+"""
+Motor de métricas individuales (Dean Oliver y eficiencia de tiro) que comparten todas las vistas.
+Recibe columnas con los nombres de la vista maestra (sPoints, Tm_FGA, Opp_ORB...) en un DataFrame
+o un dict de arreglos, para cualquier conjunto de filas: totales de jugador-ventana (players_adv,
+perfil) o juegos sueltos (Game Log, Trends). Todo es vectorizado sobre las filas y en float64;
+una división entre 0 vale 0, como en las vistas.
+metricas_avanzadas_fusionadas calcula la misma tabla avanzada sin temporales: las entradas se
+empacan en una matriz contigua y el kernel escribe en buffers reutilizados (ufuncs en sitio), o
+fila por fila compilado con numba si está instalado.
+"""
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+try:
+    import numba  # Opcional: compila el kernel fila por fila
+except ImportError:
+    numba = None
+
+# Métricas que se reportan con 0 en lugar de NaN (ej. AST% con Tm_MIN en 0)
+COLS_LIMPIAS = ['ORtg', 'DRtg', 'Floor%', 'eFG%', 'TOV%', 'FTr', 'TS%', 'PF/40', 'PtsXShot', 'USG%',
+                'ORB%', 'DRB%', 'TRB%', 'AST%', 'BLK%', 'STL%', 'FG3r', '%Pass', '%Shoot', '%Fouled', '%TO']
+COLS_USO = ['Tm_FGA', 'Tm_FTA', 'Tm_TOV', 'Tm_MIN']
+
+# --- UTILIDADES ---
+def dividir(num, den):
+    """num / den, con 0 donde el denominador es 0."""
+    num = np.asarray(num, dtype=float)
+    den = np.asarray(den, dtype=float)
+    return np.divide(num, den, out=np.zeros(np.broadcast(num, den).shape), where=den != 0)
+
+def porcentaje(num, den):
+    return dividir(num, den) * 100
+
+def _lector(datos):
+    """DataFrame / dict -> función que entrega cada columna como arreglo float64."""
+    return lambda col: np.asarray(datos[col], dtype=float)
+
+def _como_tabla(resultado, datos):
+    indice = datos.index if isinstance(datos, pd.DataFrame) else None
+    return pd.DataFrame(resultado, index=indice)
+
+# --- TIRO Y USO (totales o juegos sueltos) ---
+def metricas_tiro(datos):
+    """FG%, 2P%, 3P%, FT%, eFG%, TS%, PtsXShot y USG% (0 si faltan los intentos o las columnas Tm_*)."""
+    c = _lector(datos)
+    fgm, fga, tpm = c('sFieldGoalsMade'), c('sFieldGoalsAttempted'), c('sThreePointersMade')
+    ftm, fta = c('sFreeThrowsMade'), c('sFreeThrowsAttempted')
+    resultado = {
+        'FG%': porcentaje(fgm, fga),
+        'eFG%': porcentaje(fgm + 0.5 * tpm, fga),
+        'TS%': porcentaje(c('sPoints'), 2 * (fga + 0.44 * fta)),
+        'PtsXShot': dividir(c('sTwoPointersMade') * 2 + tpm * 3, fga),
+        'FT%': porcentaje(ftm, fta),
+    }
+    # Como USG%: siempre presentes (Trends los grafica), en 0 si la vista no trae los intentos
+    ceros = np.zeros(len(fga))
+    resultado['2P%'] = (porcentaje(c('sTwoPointersMade'), c('sTwoPointersAttempted'))
+                        if 'sTwoPointersAttempted' in datos else ceros)
+    resultado['3P%'] = porcentaje(tpm, c('sThreePointersAttempted')) if 'sThreePointersAttempted' in datos else ceros
+
+    if all(col in datos for col in COLS_USO):
+        usg_num = (fga + 0.44 * fta + c('sTurnovers')) * (c('Tm_MIN') / 5)
+        usg_den = c('sMinutes') * (c('Tm_FGA') + 0.44 * c('Tm_FTA') + c('Tm_TOV'))
+        resultado['USG%'] = porcentaje(usg_num, usg_den)
+    else:
+        resultado['USG%'] = ceros
+    return _como_tabla(resultado, datos)
+
+# --- TABLA AVANZADA (totales por jugador-ventana) ---
+def metricas_avanzadas(totales):
+    """
+    Tabla avanzada completa: posesiones y Pace del equipo, ScPoss, PProd, TotPoss, ORtg, Floor%,
+    Stops y DRtg, porcentajes de rebote/asistencia/robo/tapón, desglose de Touches y las métricas
+    de tiro y uso. `totales` trae sumas por jugador-ventana y 'GP' (juegos).
+    """
+    c = _lector(totales)
+    minutos, gp = c('sMinutes'), c('GP')
+    pts, fgm, fga = c('sPoints'), c('sFieldGoalsMade'), c('sFieldGoalsAttempted')
+    tpm, tp2m, ftm, fta = c('sThreePointersMade'), c('sTwoPointersMade'), c('sFreeThrowsMade'), c('sFreeThrowsAttempted')
+    orb, drb, trb = c('sReboundsOffensive'), c('sReboundsDefensive'), c('sReboundsTotal')
+    ast, tov, stl, blk, pf = c('sAssists'), c('sTurnovers'), c('sSteals'), c('sBlocks'), c('sFoulsPersonal')
+    tm_fga, tm_fta, tm_tov, tm_min, tm_fg = c('Tm_FGA'), c('Tm_FTA'), c('Tm_TOV'), c('Tm_MIN'), c('Tm_FG')
+    tm_orb, tm_drb, tm_trb, tm_ast = c('Tm_ORB'), c('Tm_DRB'), c('Tm_TRB'), c('Tm_AST')
+    tm_stl, tm_blk, tm_3pm, tm_ftm, tm_pf = c('Tm_STL'), c('Tm_BLK'), c('Tm_3PM'), c('Tm_FTM'), c('Tm_PF')
+    opp_drb, opp_orb, opp_trb, opp_fga, opp_fg = c('Opp_DRB'), c('Opp_ORB'), c('Opp_TRB'), c('Opp_FGA'), c('Opp_FG')
+    opp_3pa, opp_3pm, opp_pf, opp_fta, opp_ftm = c('Opp_3PA'), c('Opp_3PM'), c('Opp_PF'), c('Opp_FTA'), c('Opp_FTM')
+    opp_tov, opp_min = c('Opp_TOV'), c('Opp_MIN')
+    r = {}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Posesiones y ritmo del equipo
+        team_orb_perc = dividir(tm_orb, tm_orb + opp_drb)
+        tm_poss = tm_fga - (team_orb_perc * (tm_fga - tm_fg) * 1.07) + tm_tov + (0.4 * tm_fta)
+        dor_perc = dividir(opp_orb, opp_orb + tm_drb)
+        opp_poss = opp_fga - (dor_perc * (opp_fga - opp_fg) * 1.07) + opp_tov + (0.4 * opp_fta)
+        tm_min_5 = tm_min / 5
+        r['Tm_Poss'], r['Opp_POSS'] = tm_poss, opp_poss
+        r['Pace'] = 40 * dividir(tm_poss + opp_poss, 2 * tm_min_5)
+
+        # Posesiones anotadas (ScPoss) y puntos producidos (PProd)
+        time_ratio = dividir(minutos, tm_min_5)
+        part_a = time_ratio * (1.14 * dividir(tm_ast - ast, tm_fg))
+        num_b = (dividir(tm_ast, tm_min) * minutos * 5) - ast
+        den_b = (dividir(tm_fg, tm_min) * minutos * 5) - fgm
+        q_ast = part_a + dividir(num_b, den_b) * (1 - time_ratio)
+        pts_from_fg = pts - ftm
+        ratio_pts_att = dividir(pts_from_fg, 2 * fga)
+        fg_part = fgm * (1 - 0.5 * (ratio_pts_att * q_ast))
+        tm_pts = (tm_fg * 2) + tm_3pm + tm_ftm
+        tm_pts_others = tm_pts - tm_ftm - pts_from_fg
+        factor_2 = dividir(tm_pts_others, 2 * (tm_fga - fga))
+        ast_part = 0.5 * (factor_2 * ast)
+        ft_rate = dividir(ftm, fta)
+        ft_part = (1 - (1 - ft_rate) ** 2) * 0.4 * fta
+        team_scoring_poss = tm_fg + (1 - (1 - dividir(tm_ftm, tm_fta)) ** 2) * tm_fta * 0.4
+        team_play_perc = dividir(team_scoring_poss, tm_fga + (tm_fta * 0.4) + tm_tov)
+        t1 = (1 - team_orb_perc) * team_play_perc
+        t2 = team_orb_perc * (1 - team_play_perc)
+        team_orb_weight = dividir(t1, t1 + t2)
+        orb_part = orb * team_orb_weight * team_play_perc
+        orb_adj = 1 - (dividir(tm_orb, team_scoring_poss) * team_orb_weight * team_play_perc)
+        r['ScPoss'] = (fg_part + ast_part + ft_part) * orb_adj + orb_part
+
+        pprod_fg_part = 2 * (fgm + 0.5 * tpm) * (1 - 0.5 * ratio_pts_att * q_ast)
+        tm_fg_others = tm_fg - fgm
+        factor_1 = 2 * dividir(tm_fg_others + (0.5 * (tm_3pm - tpm)), tm_fg_others)
+        pprod_ast_part = factor_1 * (0.5 * factor_2) * ast
+        pprod_orb_part = orb_part * dividir(tm_pts, team_scoring_poss)
+        r['PProd'] = (pprod_fg_part + pprod_ast_part + ftm) * orb_adj + pprod_orb_part
+        fgx_poss = (fga - fgm) * (1 - 1.07 * team_orb_perc)
+        ftx_poss = ((1 - ft_rate) ** 2) * 0.4 * fta
+        r['TotPoss'] = r['ScPoss'] + fgx_poss + ftx_poss + tov
+        r['ORtg'] = dividir(r['PProd'], r['TotPoss']) * 100
+        r['Floor%'] = dividir(r['ScPoss'], r['TotPoss']) * 100
+
+        # Stops y rating defensivo
+        opp_pts = (opp_fg * 2) + opp_3pm + opp_ftm
+        team_defensive_rating = 100 * dividir(opp_pts, opp_poss)
+        dfg_perc = dividir(opp_fg, opp_fga)
+        fm_wt = dividir(dfg_perc * (1 - dor_perc), dfg_perc * (1 - dor_perc) + (1 - dfg_perc) * dor_perc)
+        opp_ft_rate = dividir(opp_ftm, opp_fta)
+        stops_1 = stl + blk * fm_wt * (1 - 1.07 * dor_perc) + drb * (1 - fm_wt)
+        stops_2 = (
+            (dividir(opp_fga - opp_fg - tm_blk, tm_min) * fm_wt * (1 - 1.07 * dor_perc))
+            + dividir(opp_tov - tm_stl, tm_min)
+        ) * minutos + dividir(pf, tm_pf) * 0.4 * opp_fta * (1 - opp_ft_rate) ** 2
+        stop_perc = dividir((stops_1 + stops_2) * opp_min, tm_poss * minutos)
+        opp_scoring_poss = opp_fg + (1 - (1 - opp_ft_rate) ** 2) * opp_fta * 0.4
+        d_pts_per_scposs = dividir(opp_pts, opp_scoring_poss)
+        r['DRtg'] = team_defensive_rating + 0.2 * (100 * d_pts_per_scposs * (1 - stop_perc) - team_defensive_rating)
+
+        # Porcentajes de rebote, asistencia, tapón y robo
+        r['ORB%'] = porcentaje(orb * tm_min_5, tm_orb + opp_drb)
+        r['DRB%'] = porcentaje(drb * tm_min_5, tm_drb + opp_orb)
+        r['TRB%'] = porcentaje(trb * tm_min_5, tm_trb + opp_trb)
+        r['AST%'] = porcentaje(ast, ((minutos / tm_min_5) * tm_fg) - fgm)
+        r['BLK%'] = porcentaje(blk * tm_min_5, opp_fga - opp_3pa)
+        r['STL%'] = porcentaje(stl * tm_min_5, opp_poss)
+
+        # Touches y su desglose
+        r['FG3r'] = dividir(tpm, fga)
+        foul_ratio = dividir(tm_fta, opp_pf)
+        foul_ratio = np.where(foul_ratio == 0, 1.0, foul_ratio)
+        part_ft = dividir(fta, foul_ratio)
+        part_ast = ast / 0.17
+        touches = fga + tov + part_ft + part_ast
+        r['Touches'] = touches
+        r['Touches_Per_Game'] = dividir(touches, gp)
+        r['%Pass'] = porcentaje(part_ast, touches)
+        r['%Shoot'] = porcentaje(fga, touches)
+        r['%Fouled'] = porcentaje(part_ft, touches)
+        r['%TO'] = porcentaje(tov, touches)
+
+        # Tiro, pérdidas y uso
+        tiro = metricas_tiro(totales)
+        r['eFG%'] = tiro['eFG%'].to_numpy()
+        r['TOV%'] = porcentaje(tov, fga + (0.44 * fta) + tov)
+        r['FTr'] = dividir(ftm, fga)
+        r['TS%'] = tiro['TS%'].to_numpy()
+        r['PF/40'] = dividir(pf, minutos) * 40
+        r['PtsXShot'] = tiro['PtsXShot'].to_numpy()
+        r['USG%'] = tiro['USG%'].to_numpy()
+
+    for col in COLS_LIMPIAS:
+        r[col] = np.where(np.isnan(r[col]), 0.0, r[col])
+    return _como_tabla(r, totales)
+
+# --- KERNEL FUSIONADO (sin temporales) ---
+COLS_ENTRADA = [
+    'sMinutes', 'GP', 'sPoints', 'sFieldGoalsMade', 'sFieldGoalsAttempted', 'sThreePointersMade',
+    'sTwoPointersMade', 'sFreeThrowsMade', 'sFreeThrowsAttempted', 'sReboundsOffensive',
+    'sReboundsDefensive', 'sReboundsTotal', 'sAssists', 'sTurnovers', 'sSteals', 'sBlocks', 'sFoulsPersonal',
+    'Tm_FGA', 'Tm_FTA', 'Tm_TOV', 'Tm_MIN', 'Tm_FG', 'Tm_ORB', 'Tm_DRB', 'Tm_TRB', 'Tm_AST',
+    'Tm_STL', 'Tm_BLK', 'Tm_3PM', 'Tm_FTM', 'Tm_PF',
+    'Opp_DRB', 'Opp_ORB', 'Opp_TRB', 'Opp_FGA', 'Opp_FG', 'Opp_3PA', 'Opp_3PM', 'Opp_PF',
+    'Opp_FTA', 'Opp_FTM', 'Opp_TOV', 'Opp_MIN',
+]
+COLS_AVANZADAS = ['Tm_Poss', 'Opp_POSS', 'Pace', 'ScPoss', 'PProd', 'TotPoss', 'ORtg', 'Floor%', 'DRtg',
+                  'ORB%', 'DRB%', 'TRB%', 'AST%', 'BLK%', 'STL%', 'FG3r', 'Touches', 'Touches_Per_Game',
+                  '%Pass', '%Shoot', '%Fouled', '%TO', 'eFG%', 'TOV%', 'FTr', 'TS%', 'PF/40', 'PtsXShot', 'USG%']
+_FILAS_LIMPIAS = np.array([COLS_AVANZADAS.index(c) for c in COLS_LIMPIAS])
+_N_TEMPORALES = 32
+
+_buffers = threading.local()
+
+def _trabajo(n):
+    """Buffers de trabajo del hilo (temporales float y máscara), reutilizados entre llamadas."""
+    if getattr(_buffers, 'n', -1) < n:
+        _buffers.n = n
+        _buffers.tmp = np.empty((_N_TEMPORALES, n))
+        _buffers.mascara = np.empty(n, dtype=bool)
+    return _buffers.tmp[:, :n], _buffers.mascara[:n]
+
+def _div(dest, num, den, m):
+    """dest = num / den con 0 donde den == 0, sin reservar memoria (dest puede ser num)."""
+    np.equal(den, 0, out=m)
+    np.divide(num, den, out=dest)  # División completa (SIMD) y luego se corrigen los ceros
+    np.copyto(dest, 0.0, where=m)
+
+def _kernel_en_sitio(x, salida, tmp, m):
+    """Tabla avanzada con ufuncs en sitio: misma secuencia de operaciones que metricas_avanzadas."""
+    (minutos, gp, pts, fgm, fga, tpm, tp2m, ftm, fta, orb, drb, trb, ast, tov, stl, blk, pf,
+     tm_fga, tm_fta, tm_tov, tm_min, tm_fg, tm_orb, tm_drb, tm_trb, tm_ast, tm_stl, tm_blk, tm_3pm, tm_ftm, tm_pf,
+     opp_drb, opp_orb, opp_trb, opp_fga, opp_fg, opp_3pa, opp_3pm, opp_pf, opp_fta, opp_ftm, opp_tov, opp_min) = x
+    (tm_poss, opp_poss, pace, sc_poss, pprod, tot_poss, ortg, floor, drtg, orb_pct, drb_pct, trb_pct, ast_pct,
+     blk_pct, stl_pct, fg3r, touches, touches_pg, pct_pass, pct_shoot, pct_fouled, pct_to, efg, tov_pct, ftr, ts,
+     pf40, pps, usg) = salida
+    (a, b, c, d, orb_perc, dor_perc, tm_min_5, time_ratio, q_ast, pts_from_fg, ratio_pts_att, fg_part, tm_pts,
+     factor_2, ast_part, ft_rate, ft_part, sc_team, play_perc, orb_weight, orb_part, orb_adj, pprod_fg,
+     tm_fg_others, opp_pts, tdr, dfg_perc, fm_wt, opp_ft_rate, fac_dor, part_ft, part_ast) = tmp
+
+    # Posesiones y ritmo del equipo
+    np.add(tm_orb, opp_drb, out=a); _div(orb_perc, tm_orb, a, m)
+    np.subtract(tm_fga, tm_fg, out=a); a *= orb_perc; a *= 1.07
+    np.subtract(tm_fga, a, out=tm_poss); tm_poss += tm_tov; np.multiply(tm_fta, 0.4, out=a); tm_poss += a
+    np.add(opp_orb, tm_drb, out=a); _div(dor_perc, opp_orb, a, m)
+    np.subtract(opp_fga, opp_fg, out=a); a *= dor_perc; a *= 1.07
+    np.subtract(opp_fga, a, out=opp_poss); opp_poss += opp_tov; np.multiply(opp_fta, 0.4, out=a); opp_poss += a
+    np.divide(tm_min, 5, out=tm_min_5)
+    np.add(tm_poss, opp_poss, out=a); np.multiply(tm_min_5, 2, out=b); _div(pace, a, b, m); pace *= 40
+
+    # ScPoss
+    _div(time_ratio, minutos, tm_min_5, m)
+    np.subtract(tm_ast, ast, out=a); _div(q_ast, a, tm_fg, m); q_ast *= 1.14; q_ast *= time_ratio
+    _div(a, tm_ast, tm_min, m); a *= minutos; a *= 5; a -= ast
+    _div(b, tm_fg, tm_min, m); b *= minutos; b *= 5; b -= fgm
+    _div(c, a, b, m); np.subtract(1, time_ratio, out=a); c *= a; q_ast += c
+    np.subtract(pts, ftm, out=pts_from_fg)
+    np.multiply(fga, 2, out=a); _div(ratio_pts_att, pts_from_fg, a, m)
+    np.multiply(ratio_pts_att, q_ast, out=a); a *= 0.5; np.subtract(1, a, out=a); np.multiply(fgm, a, out=fg_part)
+    np.multiply(tm_fg, 2, out=tm_pts); tm_pts += tm_3pm; tm_pts += tm_ftm
+    np.subtract(tm_pts, tm_ftm, out=b); b -= pts_from_fg  # Puntos de campo del resto del equipo
+    np.subtract(tm_fga, fga, out=a); a *= 2; _div(factor_2, b, a, m)
+    np.multiply(factor_2, ast, out=ast_part); ast_part *= 0.5
+    _div(ft_rate, ftm, fta, m)
+    np.subtract(1, ft_rate, out=a); np.square(a, out=a); np.subtract(1, a, out=a); a *= 0.4; np.multiply(a, fta, out=ft_part)
+    _div(a, tm_ftm, tm_fta, m); np.subtract(1, a, out=a); np.square(a, out=a); np.subtract(1, a, out=a)
+    a *= tm_fta; a *= 0.4; np.add(tm_fg, a, out=sc_team)
+    np.multiply(tm_fta, 0.4, out=a); np.add(tm_fga, a, out=a); a += tm_tov; _div(play_perc, sc_team, a, m)
+    np.subtract(1, orb_perc, out=a); a *= play_perc
+    np.subtract(1, play_perc, out=b); b *= orb_perc; np.add(a, b, out=c); _div(orb_weight, a, c, m)
+    np.multiply(orb, orb_weight, out=orb_part); orb_part *= play_perc
+    _div(a, tm_orb, sc_team, m); a *= orb_weight; a *= play_perc; np.subtract(1, a, out=orb_adj)
+    np.add(fg_part, ast_part, out=sc_poss); sc_poss += ft_part; sc_poss *= orb_adj; sc_poss += orb_part
+
+    # PProd, TotPoss, ORtg y Floor%
+    np.multiply(tpm, 0.5, out=pprod_fg); pprod_fg += fgm; pprod_fg *= 2
+    np.multiply(ratio_pts_att, 0.5, out=b); b *= q_ast; np.subtract(1, b, out=b); pprod_fg *= b
+    np.subtract(tm_fg, fgm, out=tm_fg_others)
+    np.subtract(tm_3pm, tpm, out=b); b *= 0.5; b += tm_fg_others; _div(c, b, tm_fg_others, m); c *= 2
+    np.multiply(factor_2, 0.5, out=b); c *= b; c *= ast
+    _div(b, tm_pts, sc_team, m); b *= orb_part
+    np.add(pprod_fg, c, out=pprod); pprod += ftm; pprod *= orb_adj; pprod += b
+    np.subtract(fga, fgm, out=a); np.multiply(orb_perc, 1.07, out=b); np.subtract(1, b, out=b); a *= b
+    np.subtract(1, ft_rate, out=b); np.square(b, out=b); b *= 0.4; b *= fta
+    np.add(sc_poss, a, out=tot_poss); tot_poss += b; tot_poss += tov
+    _div(ortg, pprod, tot_poss, m); ortg *= 100
+    _div(floor, sc_poss, tot_poss, m); floor *= 100
+
+    # Stops y DRtg
+    np.multiply(opp_fg, 2, out=opp_pts); opp_pts += opp_3pm; opp_pts += opp_ftm
+    _div(tdr, opp_pts, opp_poss, m); tdr *= 100
+    _div(dfg_perc, opp_fg, opp_fga, m)
+    np.subtract(1, dor_perc, out=a); a *= dfg_perc
+    np.subtract(1, dfg_perc, out=b); b *= dor_perc; b += a; _div(fm_wt, a, b, m)
+    _div(opp_ft_rate, opp_ftm, opp_fta, m)
+    np.multiply(dor_perc, 1.07, out=fac_dor); np.subtract(1, fac_dor, out=fac_dor)
+    np.multiply(blk, fm_wt, out=a); a *= fac_dor; a += stl
+    np.subtract(1, fm_wt, out=b); b *= drb; a += b
+    np.subtract(opp_fga, opp_fg, out=c); c -= tm_blk; _div(b, c, tm_min, m); b *= fm_wt; b *= fac_dor
+    np.subtract(opp_tov, tm_stl, out=c); _div(d, c, tm_min, m); b += d; b *= minutos
+    _div(c, pf, tm_pf, m); c *= 0.4; c *= opp_fta
+    np.subtract(1, opp_ft_rate, out=d); np.square(d, out=d); c *= d; b += c
+    a += b; a *= opp_min; np.multiply(tm_poss, minutos, out=b); _div(c, a, b, m)  # c = Stop%
+    np.subtract(1, opp_ft_rate, out=a); np.square(a, out=a); np.subtract(1, a, out=a); a *= opp_fta; a *= 0.4; a += opp_fg
+    _div(b, opp_pts, a, m); b *= 100; np.subtract(1, c, out=a); b *= a; b -= tdr; b *= 0.2
+    np.add(tdr, b, out=drtg)
+
+    # Porcentajes de rebote, asistencia, tapón y robo
+    np.multiply(orb, tm_min_5, out=a); np.add(tm_orb, opp_drb, out=b); _div(orb_pct, a, b, m); orb_pct *= 100
+    np.multiply(drb, tm_min_5, out=a); np.add(tm_drb, opp_orb, out=b); _div(drb_pct, a, b, m); drb_pct *= 100
+    np.multiply(trb, tm_min_5, out=a); np.add(tm_trb, opp_trb, out=b); _div(trb_pct, a, b, m); trb_pct *= 100
+    np.divide(minutos, tm_min_5, out=a); a *= tm_fg; a -= fgm; _div(ast_pct, ast, a, m); ast_pct *= 100
+    np.multiply(blk, tm_min_5, out=a); np.subtract(opp_fga, opp_3pa, out=b); _div(blk_pct, a, b, m); blk_pct *= 100
+    np.multiply(stl, tm_min_5, out=a); _div(stl_pct, a, opp_poss, m); stl_pct *= 100
+
+    # Touches
+    _div(fg3r, tpm, fga, m)
+    _div(a, tm_fta, opp_pf, m); np.equal(a, 0, out=m); np.copyto(a, 1.0, where=m)
+    _div(part_ft, fta, a, m); np.divide(ast, 0.17, out=part_ast)
+    np.add(fga, tov, out=touches); touches += part_ft; touches += part_ast
+    _div(touches_pg, touches, gp, m)
+    _div(pct_pass, part_ast, touches, m); pct_pass *= 100
+    _div(pct_shoot, fga, touches, m); pct_shoot *= 100
+    _div(pct_fouled, part_ft, touches, m); pct_fouled *= 100
+    _div(pct_to, tov, touches, m); pct_to *= 100
+
+    # Tiro, pérdidas y uso
+    np.multiply(tpm, 0.5, out=a); a += fgm; _div(efg, a, fga, m); efg *= 100
+    np.multiply(fta, 0.44, out=a); a += fga; a += tov; _div(tov_pct, tov, a, m); tov_pct *= 100
+    _div(ftr, ftm, fga, m)
+    np.multiply(fta, 0.44, out=a); a += fga; a *= 2; _div(ts, pts, a, m); ts *= 100
+    _div(pf40, pf, minutos, m); pf40 *= 40
+    np.multiply(tp2m, 2, out=a); np.multiply(tpm, 3, out=b); a += b; _div(pps, a, fga, m)
+    np.multiply(fta, 0.44, out=a); a += fga; a += tov; a *= tm_min_5
+    np.multiply(tm_fta, 0.44, out=b); b += tm_fga; b += tm_tov; b *= minutos
+    _div(usg, a, b, m); usg *= 100
+
+def _dv(num, den):
+    return num / den if den != 0 else 0.0
+
+def _kernel_fila(x, salida):
+    """Versión escalar del mismo kernel (una pasada por fila, sin arreglos intermedios) para compilar con numba."""
+    for i in range(x.shape[1]):
+        (minutos, gp, pts, fgm, fga, tpm, tp2m, ftm, fta, orb, drb, trb, ast, tov, stl, blk, pf,
+         tm_fga, tm_fta, tm_tov, tm_min, tm_fg, tm_orb, tm_drb, tm_trb, tm_ast, tm_stl, tm_blk, tm_3pm, tm_ftm, tm_pf,
+         opp_drb, opp_orb, opp_trb, opp_fga, opp_fg, opp_3pa, opp_3pm, opp_pf, opp_fta, opp_ftm, opp_tov, opp_min) = (
+            x[0, i], x[1, i], x[2, i], x[3, i], x[4, i], x[5, i], x[6, i], x[7, i], x[8, i], x[9, i], x[10, i],
+            x[11, i], x[12, i], x[13, i], x[14, i], x[15, i], x[16, i], x[17, i], x[18, i], x[19, i], x[20, i],
+            x[21, i], x[22, i], x[23, i], x[24, i], x[25, i], x[26, i], x[27, i], x[28, i], x[29, i], x[30, i],
+            x[31, i], x[32, i], x[33, i], x[34, i], x[35, i], x[36, i], x[37, i], x[38, i], x[39, i], x[40, i],
+            x[41, i], x[42, i])
+
+        orb_perc = _dv(tm_orb, tm_orb + opp_drb)
+        tm_poss = tm_fga - (tm_fga - tm_fg) * orb_perc * 1.07 + tm_tov + tm_fta * 0.4
+        dor_perc = _dv(opp_orb, opp_orb + tm_drb)
+        opp_poss = opp_fga - (opp_fga - opp_fg) * dor_perc * 1.07 + opp_tov + opp_fta * 0.4
+        tm_min_5 = tm_min / 5
+        salida[0, i], salida[1, i] = tm_poss, opp_poss
+        salida[2, i] = _dv(tm_poss + opp_poss, tm_min_5 * 2) * 40
+
+        time_ratio = _dv(minutos, tm_min_5)
+        q_ast = _dv(tm_ast - ast, tm_fg) * 1.14 * time_ratio
+        num_b = _dv(tm_ast, tm_min) * minutos * 5 - ast
+        den_b = _dv(tm_fg, tm_min) * minutos * 5 - fgm
+        q_ast += _dv(num_b, den_b) * (1 - time_ratio)
+        pts_from_fg = pts - ftm
+        ratio_pts_att = _dv(pts_from_fg, fga * 2)
+        fg_part = fgm * (1 - ratio_pts_att * q_ast * 0.5)
+        tm_pts = tm_fg * 2 + tm_3pm + tm_ftm
+        factor_2 = _dv(tm_pts - tm_ftm - pts_from_fg, (tm_fga - fga) * 2)
+        ast_part = factor_2 * ast * 0.5
+        ft_rate = _dv(ftm, fta)
+        ft_part = (1 - (1 - ft_rate) * (1 - ft_rate)) * 0.4 * fta
+        r_tm_ft = 1 - _dv(tm_ftm, tm_fta)
+        sc_team = tm_fg + (1 - r_tm_ft * r_tm_ft) * tm_fta * 0.4
+        play_perc = _dv(sc_team, tm_fga + tm_fta * 0.4 + tm_tov)
+        t1 = (1 - orb_perc) * play_perc
+        t2 = (1 - play_perc) * orb_perc
+        orb_weight = _dv(t1, t1 + t2)
+        orb_part = orb * orb_weight * play_perc
+        orb_adj = 1 - _dv(tm_orb, sc_team) * orb_weight * play_perc
+        sc_poss = (fg_part + ast_part + ft_part) * orb_adj + orb_part
+        salida[3, i] = sc_poss
+
+        pprod_fg = (tpm * 0.5 + fgm) * 2 * (1 - ratio_pts_att * 0.5 * q_ast)
+        tm_fg_others = tm_fg - fgm
+        pprod_ast = _dv((tm_3pm - tpm) * 0.5 + tm_fg_others, tm_fg_others) * 2 * (factor_2 * 0.5) * ast
+        pprod = (pprod_fg + pprod_ast + ftm) * orb_adj + _dv(tm_pts, sc_team) * orb_part
+        tot_poss = (sc_poss + (fga - fgm) * (1 - orb_perc * 1.07) + (1 - ft_rate) * (1 - ft_rate) * 0.4 * fta) + tov
+        salida[4, i], salida[5, i] = pprod, tot_poss
+        salida[6, i] = _dv(pprod, tot_poss) * 100
+        salida[7, i] = _dv(sc_poss, tot_poss) * 100
+
+        opp_pts = opp_fg * 2 + opp_3pm + opp_ftm
+        tdr = _dv(opp_pts, opp_poss) * 100
+        dfg_perc = _dv(opp_fg, opp_fga)
+        num_fm = (1 - dor_perc) * dfg_perc
+        fm_wt = _dv(num_fm, (1 - dfg_perc) * dor_perc + num_fm)
+        r_opp_ft = 1 - _dv(opp_ftm, opp_fta)
+        fac_dor = 1 - dor_perc * 1.07
+        stops_1 = blk * fm_wt * fac_dor + stl + (1 - fm_wt) * drb
+        stops_2 = ((_dv(opp_fga - opp_fg - tm_blk, tm_min) * fm_wt * fac_dor + _dv(opp_tov - tm_stl, tm_min)) * minutos
+                   + _dv(pf, tm_pf) * 0.4 * opp_fta * (r_opp_ft * r_opp_ft))
+        stop_perc = _dv((stops_1 + stops_2) * opp_min, tm_poss * minutos)
+        opp_sc = (1 - r_opp_ft * r_opp_ft) * opp_fta * 0.4 + opp_fg
+        salida[8, i] = tdr + (_dv(opp_pts, opp_sc) * 100 * (1 - stop_perc) - tdr) * 0.2
+
+        salida[9, i] = _dv(orb * tm_min_5, tm_orb + opp_drb) * 100
+        salida[10, i] = _dv(drb * tm_min_5, tm_drb + opp_orb) * 100
+        salida[11, i] = _dv(trb * tm_min_5, tm_trb + opp_trb) * 100
+        salida[12, i] = _dv(ast, minutos / tm_min_5 * tm_fg - fgm) * 100
+        salida[13, i] = _dv(blk * tm_min_5, opp_fga - opp_3pa) * 100
+        salida[14, i] = _dv(stl * tm_min_5, opp_poss) * 100
+
+        salida[15, i] = _dv(tpm, fga)
+        foul_ratio = _dv(tm_fta, opp_pf)
+        if foul_ratio == 0:
+            foul_ratio = 1.0
+        part_ft = _dv(fta, foul_ratio)
+        part_ast = ast / 0.17
+        touches = fga + tov + part_ft + part_ast
+        salida[16, i] = touches
+        salida[17, i] = _dv(touches, gp)
+        salida[18, i] = _dv(part_ast, touches) * 100
+        salida[19, i] = _dv(fga, touches) * 100
+        salida[20, i] = _dv(part_ft, touches) * 100
+        salida[21, i] = _dv(tov, touches) * 100
+
+        salida[22, i] = _dv(tpm * 0.5 + fgm, fga) * 100
+        salida[23, i] = _dv(tov, fta * 0.44 + fga + tov) * 100
+        salida[24, i] = _dv(ftm, fga)
+        salida[25, i] = _dv(pts, (fta * 0.44 + fga) * 2) * 100
+        salida[26, i] = _dv(pf, minutos) * 40
+        salida[27, i] = _dv(tp2m * 2 + tpm * 3, fga)
+        salida[28, i] = _dv((fta * 0.44 + fga + tov) * tm_min_5, (tm_fta * 0.44 + tm_fga + tm_tov) * minutos) * 100
+
+if numba is not None:
+    # El caché en disco de numba escribe junto al módulo (puede ser de solo lectura en la imagen):
+    # solo se activa si NUMBA_CACHE_DIR apunta a una carpeta escribible; si no, se compila al primer uso.
+    _cache = bool(os.environ.get("NUMBA_CACHE_DIR"))
+    _dv = numba.njit(error_model='numpy', cache=_cache)(_dv)
+    _kernel_fila = numba.njit(error_model='numpy', cache=_cache)(_kernel_fila)
+
+def _empacar(totales):
+    """Columnas de entrada -> matriz float64 C-contigua (una fila por columna)."""
+    if isinstance(totales, pd.DataFrame):
+        return np.ascontiguousarray(totales[COLS_ENTRADA].to_numpy(dtype=float).T)
+    n = len(totales[COLS_ENTRADA[0]])
+    x = np.empty((len(COLS_ENTRADA), n))
+    for k, col in enumerate(COLS_ENTRADA):
+        x[k] = totales[col]
+    return x
+
+def metricas_avanzadas_fusionadas(totales, jit=None):
+    """
+    Misma tabla que metricas_avanzadas sin temporales por operación. Con `jit` (por defecto: si
+    numba está instalado) corre el kernel compilado fila por fila; si no, ufuncs en sitio sobre
+    buffers del hilo que se reutilizan entre llamadas.
+    """
+    jit = numba is not None if jit is None else jit
+    x = _empacar(totales)
+    salida = np.empty((len(COLS_AVANZADAS), x.shape[1]))
+    tmp, mascara = _trabajo(x.shape[1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if jit:
+            _kernel_fila(x, salida)
+        else:
+            _kernel_en_sitio(x, salida, tmp, mascara)
+    for k in _FILAS_LIMPIAS:
+        np.isnan(salida[k], out=mascara)
+        np.copyto(salida[k], 0.0, where=mascara)
+    indice = totales.index if isinstance(totales, pd.DataFrame) else None
+    return pd.DataFrame(salida.T, index=indice, columns=COLS_AVANZADAS)
@@ -0,0 +1,79 @@
+# modules/snapshot.py
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+import pandas as pd
+import pyarrow.feather as feather
+
+log = logging.getLogger(__name__)
+
+# Carpeta local para los snapshots (Arrow IPC sin compresión -> se puede mapear en memoria)
+SNAPSHOT_DIR = os.environ.get("ABE_SNAPSHOT_DIR", "data_cache")
+
+def _rutas(nombre, directorio=None):
+    base = os.path.join(directorio or SNAPSHOT_DIR, nombre)
+    return f"{base}.arrow", f"{base}.json"
+
+def _a_json(valor):
+    """Convierte escalares numpy/pandas a tipos serializables."""
+    if hasattr(valor, 'item'): return valor.item()
+    if isinstance(valor, (pd.Timestamp, datetime)): return valor.isoformat()
+    return valor
+
+def hash_esquema(df):
+    """Huella corta de columnas + dtypes para detectar snapshots viejos o incompatibles."""
+    firma = "|".join(f"{c}:{t}" for c, t in df.dtypes.astype(str).items())
+    return hashlib.sha1(firma.encode()).hexdigest()[:16]
+
+def guardar_snapshot(nombre, df, watermark=None, extra=None, directorio=None):
+    """Escribe el frame + manifiesto de forma atómica (archivo temporal + os.replace)."""
+    os.makedirs(directorio or SNAPSHOT_DIR, exist_ok=True)
+    ruta_datos, ruta_manifiesto = _rutas(nombre, directorio)
+
+    # Temporal único por proceso: varias réplicas pueden escribir el mismo snapshot
+    tmp_datos = f"{ruta_datos}.{os.getpid()}.tmp"
+    feather.write_feather(df.reset_index(drop=True), tmp_datos, compression='uncompressed')
+    os.replace(tmp_datos, ruta_datos)
+
+    manifiesto = {
+        'filas': len(df),
+        'esquema': hash_esquema(df),
+        'watermark': {k: _a_json(v) for k, v in (watermark or {}).items()},
+        'guardado': datetime.now().isoformat(),
+        **{k: _a_json(v) for k, v in (extra or {}).items()},
+    }
+    tmp_manifiesto = f"{ruta_manifiesto}.{os.getpid()}.tmp"
+    with open(tmp_manifiesto, 'w') as f:
+        json.dump(manifiesto, f)
+    os.replace(tmp_manifiesto, ruta_manifiesto)
+
+def leer_manifiesto(nombre, directorio=None):
+    """Solo el manifiesto (barato: sirve para ver si hay una versión más nueva sin leer datos)."""
+    _, ruta_manifiesto = _rutas(nombre, directorio)
+    try:
+        with open(ruta_manifiesto) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def leer_snapshot(nombre, directorio=None, sin_copia=False):
+    """
+    Lee un snapshot mapeado en memoria. Retorna (df, manifiesto) o (None, None) si no existe
+    o no cuadra con su manifiesto. Con `sin_copia` las columnas numéricas sin nulos apuntan al
+    archivo mapeado (split_blocks), así varios procesos comparten las mismas páginas.
+    """
+    ruta_datos, ruta_manifiesto = _rutas(nombre, directorio)
+    if not (os.path.exists(ruta_datos) and os.path.exists(ruta_manifiesto)):
+        return None, None
+    try:
+        with open(ruta_manifiesto) as f:
+            manifiesto = json.load(f)
+        df = feather.read_table(ruta_datos, memory_map=True).to_pandas(split_blocks=sin_copia)
+        if len(df) != manifiesto.get('filas') or hash_esquema(df) != manifiesto.get('esquema'):
+            return None, None
+        return df, manifiesto
+    except Exception as e:
+        log.warning(f"Snapshot '{nombre}' ilegible: {e}")
+        return None, None
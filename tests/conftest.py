@@ -0,0 +1,43 @@
+# tests/conftest.py
+import os
+import pandas as pd
+import pytest
+from modules import data_loader, snapshot
+from modules.agregaciones import _master_consistente
+from modules.fuentes import COL_ACTUALIZACION
+
+
+@pytest.fixture
+def master_crudo():
+    """Vista maestra cruda y consistente (un renglón por jugador-juego) con `updated_at`."""
+    df = _master_consistente(2000)
+    df[COL_ACTUALIZACION] = pd.Timestamp('2025-06-01', tz='UTC')
+    return df
+
+
+@pytest.fixture
+def fuente_local(tmp_path, monkeypatch):
+    """Fuente 'local' en una carpeta temporal, con snapshots y estado de sincronización aislados."""
+    carpeta = tmp_path / 'fuente'
+    carpeta.mkdir()
+    monkeypatch.setenv('ABE_FUENTE', 'local')
+    monkeypatch.setenv('ABE_FUENTE_LOCAL', str(carpeta))
+    monkeypatch.setattr(snapshot, 'SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+    data_loader._estado_master.clear()
+    yield carpeta
+    data_loader._estado_master.clear()
+
+
+@pytest.fixture(autouse=True)
+def manifiesto_limpio(monkeypatch):
+    """Cada prueba declara sus propias columnas (el manifiesto es global del proceso)."""
+    monkeypatch.setattr(data_loader, '_MANIFIESTO', {})
+
+
+@pytest.fixture
+def url_postgres_prueba():
+    """Postgres desechable para pruebas de integración (ABE_TEST_DATABASE_URL); sin él se omiten."""
+    url = os.environ.get('ABE_TEST_DATABASE_URL')
+    if not url:
+        pytest.skip("sin ABE_TEST_DATABASE_URL")
+    return url
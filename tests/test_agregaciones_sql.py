@@ -0,0 +1,56 @@
+# tests/test_agregaciones_sql.py
+"""Camino SQL (pushdown) contra el camino pandas, sobre SQLite sembrado con un master sintético."""
+import pandas as pd
+import pytest
+from modules import agregaciones as ag
+from modules.data_loader import TABLA_MASTER, LLAVE_MASTER, sanitizar_master, compactar_tipos, separar_hechos, particionar, unir_equipo
+
+sa = pytest.importorskip('sqlalchemy')
+VENTANAS = [1, 3, None]
+
+
+@pytest.fixture(scope='module')
+def base(tmp_path_factory):
+    """(motor SQLite, particiones de jugadores, particiones de equipos) con los mismos datos."""
+    motor = sa.create_engine(f"sqlite:///{tmp_path_factory.mktemp('sql') / 'abe.db'}")
+    ag._master_consistente(3000).to_sql(TABLA_MASTER, motor, index=False)
+    crudo = pd.read_sql(sa.text(f'SELECT * FROM "{TABLA_MASTER}"'), motor)
+    df_jug, df_eq = separar_hechos(compactar_tipos(sanitizar_master(crudo)).sort_values(LLAVE_MASTER, ignore_index=True))
+    yield motor, particionar(df_jug), particionar(df_eq), df_eq
+    motor.dispose()
+
+
+def _casos(base):
+    _, part_jug, _, _ = base
+    for categoria, df_cat in part_jug.items():
+        for equipo in (None, sorted(df_cat['equipo_nombre'].unique())[0]):
+            yield categoria, equipo, df_cat if equipo is None else df_cat[df_cat['equipo_nombre'] == equipo]
+
+
+@pytest.mark.parametrize('ventana', VENTANAS)
+def test_promedios_sql_igual_a_pandas(base, ventana):
+    motor = base[0]
+    for categoria, equipo, df_view in _casos(base):
+        esperado = ag.promedios_por_jugador(ag.ultimos_juegos_jugador(df_view, ventana))
+        obtenido = ag._jugadores_sql(ag.AGG_PROMEDIOS, categoria, equipo, ventana, motor)
+        assert len(esperado) > 0
+        assert ag._diferencias(esperado, obtenido, ag.LLAVES_JUGADOR) == [], (categoria, equipo)
+
+
+@pytest.mark.parametrize('ventana', VENTANAS)
+def test_totales_sql_igual_a_pandas(base, ventana):
+    motor, df_eq = base[0], base[3]
+    for categoria, equipo, df_view in _casos(base):
+        esperado = ag.totales_por_jugador(unir_equipo(ag.ultimos_juegos_jugador(df_view, ventana), df_eq))
+        obtenido = ag._jugadores_sql(ag.AGG_TOTALES, categoria, equipo, ventana, motor)
+        assert ag._diferencias(esperado, obtenido, ag.LLAVES_JUGADOR) == [], (categoria, equipo)
+
+
+@pytest.mark.parametrize('ventana', [1, 3, 10])
+def test_four_factors_sql_igual_a_pandas(base, ventana):
+    motor, _, part_eq, _ = base
+    for categoria, df_teams in part_eq.items():
+        esperado = ag.four_factors_por_equipo(df_teams, ventana)
+        obtenido = ag.four_factors_por_equipo_sql(categoria, ventana, motor)
+        assert len(esperado) > 0
+        assert ag._diferencias(esperado, obtenido, ['equipo_nombre']) == [], categoria
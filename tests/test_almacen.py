@@ -0,0 +1,23 @@
+# tests/test_almacen.py
+from datetime import datetime, timedelta
+import pytest
+from modules import almacen
+
+
+@pytest.fixture
+def almacen_vacio():
+    almacen.limpiar()
+    yield almacen._almacen()
+    almacen.limpiar()
+
+
+def test_antiguedad_por_funcion(almacen_vacio):
+    almacen.publicar(('cargar_base_datos', (), ()), object())
+    almacen.publicar(('cargar_catalogo_equipos', (), ()), object())
+    almacen_vacio['entradas'][('cargar_catalogo_equipos', (), ())]['actualizado'] = datetime.now() - timedelta(hours=2)
+
+    global_, _ = almacen.antiguedad()
+    master, refrescando = almacen.antiguedad('cargar_base_datos')
+    assert global_ > 7000
+    assert master < 60 and not refrescando
+    assert almacen.antiguedad('no_existe') == (None, False)
@@ -0,0 +1,28 @@
+# tests/test_cubo_equipos.py
+"""CuboEquipos (equipos x ventanas) contra four_factors_por_equipo en cada ventana."""
+import pandas as pd
+import pytest
+from modules import agregaciones as ag
+from modules.data_loader import sanitizar_master, compactar_tipos, separar_hechos
+
+
+@pytest.fixture(scope='module')
+def juegos_equipo():
+    """Equipo-juego de una categoría (varios juegos por fecha: ambos caminos desempatan por id_abe)."""
+    crudo = ag._master_consistente(3000)
+    _, df_eq = separar_hechos(compactar_tipos(sanitizar_master(crudo)).sort_values(['id_abe', 'id_player'], ignore_index=True))
+    return df_eq[df_eq['Categoria'] == 'Femenil D1']
+
+
+def test_cubo_igual_a_groupby_por_ventana(juegos_equipo):
+    cubo = ag.CuboEquipos(ag.tabla_juegos_equipo(juegos_equipo), ag.COLS_SUMA_4F)
+    for ventana in sorted({1, 2, 5, cubo.max_juegos, cubo.max_juegos + 3}):
+        esperado = ag.four_factors_por_equipo(juegos_equipo, ventana)
+        obtenido = cubo.tabla(ventana, ['GP'] + ag.COLS_SUMA_4F)
+        assert len(esperado) > 0
+        assert list(obtenido['equipo_nombre'].astype(str)) == list(esperado['equipo_nombre'].astype(str))
+        jugados = juegos_equipo.groupby('equipo_nombre', observed=True).size().clip(upper=ventana)
+        assert obtenido['GP'].tolist() == jugados.tolist()
+        for col in ag.COLS_SUMA_4F:
+            pd.testing.assert_series_equal(obtenido[col].astype(float), esperado[col].astype(float).reset_index(drop=True),
+                                           check_names=False, rtol=1e-9)
@@ -0,0 +1,101 @@
+# tests/test_fuentes.py
+import threading
+import pytest
+from postgrest.exceptions import APIError
+from modules import fuentes
+
+
+class _Respuesta:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    """Query PostgREST mínima: .csv() cambia el formato; execute() falla con `error_csv` si se pidió CSV."""
+    def __init__(self, error_csv=None):
+        self.error_csv, self.es_csv = error_csv, False
+
+    def csv(self):
+        self.es_csv = True
+        return self
+
+    def execute(self):
+        if self.es_csv:
+            if self.error_csv: raise self.error_csv
+            return _Respuesta("id_abe,sPoints\n1,10\n")
+        return _Respuesta([{'id_abe': 1, 'sPoints': 10}])
+
+
+@pytest.fixture(autouse=True)
+def csv_disponible(monkeypatch):
+    monkeypatch.setattr(fuentes, '_csv_no_disponible', threading.Event())
+
+
+def test_csv_sin_errores():
+    df = fuentes._ejecutar(lambda: _Query())
+    assert df.to_dict('records') == [{'id_abe': 1, 'sPoints': 10}]
+    assert not fuentes._csv_no_disponible.is_set()
+
+
+@pytest.mark.parametrize('error', [TimeoutError("read timeout"), ConnectionResetError("reset"),
+                                   APIError({'message': 'upstream', 'code': '503'})])
+def test_error_pasajero_no_apaga_csv(error):
+    with pytest.raises(type(error)):
+        fuentes._ejecutar(lambda: _Query(error))
+    assert not fuentes._csv_no_disponible.is_set()
+    assert len(fuentes._ejecutar(lambda: _Query())) == 1
+
+
+def test_columna_inexistente_sale_tal_cual():
+    with pytest.raises(APIError):
+        fuentes._ejecutar(lambda: _Query(APIError({'message': 'column does not exist', 'code': '42703'})))
+    assert not fuentes._csv_no_disponible.is_set()
+
+
+@pytest.mark.parametrize('error', [APIError({'message': 'None of these media types are available: text/csv', 'code': 'PGRST107'}),
+                                   APIError({'message': 'JSON could not be generated', 'code': 406})])
+def test_formato_rechazado_cae_a_json(error):
+    df = fuentes._ejecutar(lambda: _Query(error))
+    assert df.to_dict('records') == [{'id_abe': 1, 'sPoints': 10}]
+    assert fuentes._csv_no_disponible.is_set()
+
+
+class _FuentePaginada(fuentes.Fuente):
+    """Como PostgREST: sin ORDER BY, cada rango ve las filas en un orden distinto."""
+    nombre, paginada = 'paginada', True
+
+    def __init__(self, tablas):
+        self.tablas = tablas
+
+    def contar(self, tabla, filtros=None):
+        return len(self.tablas[tabla])
+
+    def leer(self, tabla, columnas=None, orden=(), filtros=None, inicio=None, fin=None, limite=None):
+        df = self.tablas[tabla]
+        df = df.sort_values(list(orden)) if orden else df.sample(frac=1, random_state=inicio)
+        return df.iloc[inicio:fin + 1].reset_index(drop=True)
+
+    def firma(self, tabla):
+        return None
+
+
+def test_fuente_incompleta_truena_al_construirse():
+    class SinFirma(fuentes.Fuente):
+        def contar(self, tabla, filtros=None): return 0
+        def leer(self, tabla, columnas=None, orden=(), filtros=None, inicio=None, fin=None, limite=None): return None
+
+    with pytest.raises(TypeError):
+        SinFirma()
+
+
+def test_exportar_pagina_en_orden_de_llave(tmp_path, monkeypatch):
+    import pandas as pd
+    from modules import data_loader
+    players = pd.DataFrame({'player_id': range(2500), 'first_name': [f"J{i}" for i in range(2500)]}).sample(frac=1, random_state=0)
+    monkeypatch.setattr(data_loader, 'fuente_datos', lambda: _FuentePaginada({data_loader.TABLA_PLAYERS: players}))
+
+    fuentes.exportar(str(tmp_path), [data_loader.TABLA_PLAYERS])
+    exportada = pd.read_parquet(tmp_path / f"{data_loader.TABLA_PLAYERS}.parquet")
+    assert len(exportada) == len(players)
+    assert exportada['player_id'].is_unique
+    assert exportada['player_id'].is_monotonic_increasing
@@ -0,0 +1,60 @@
+# tests/test_ingesta.py
+import os
+import pandas as pd
+import pytest
+from modules.benchmarks import master_sintetico
+from modules.data_loader import LLAVE_MASTER
+from modules.fuentes import COL_ACTUALIZACION
+from modules.ingesta import leer_archivo, validar, ingestar, sql_crear_tabla
+
+
+def _box_scores(n_filas):
+    return master_sintetico(n_filas).drop_duplicates(LLAVE_MASTER, ignore_index=True)
+
+
+def test_validar_rechaza_llaves_fechas_y_conteos_invalidos():
+    df = _box_scores(200)
+    df.loc[0, 'id_player'] = None
+    df.loc[1, 'Fecha'] = '01/02/2025'
+    df['sPoints'] = df['sPoints'].astype(object)
+    df.loc[2, 'sPoints'] = 'doce'
+    validas, errores = validar(df, 'lote')
+    assert len(validas) == len(df) - 3
+    assert len(errores) == 3
+
+
+def test_copy_y_upsert_en_postgres(tmp_path, url_postgres_prueba):
+    sa = pytest.importorskip('sqlalchemy')
+    crudo = _box_scores(3000)
+    ruta = tmp_path / 'lote.csv'
+    crudo.to_csv(ruta, index=False)
+    validas, _ = validar(leer_archivo(str(ruta)), 'lote')
+    tabla = f"boxscores_prueba_{os.getpid()}"
+    motor = sa.create_engine(url_postgres_prueba)
+    leer = lambda: pd.read_sql(sa.text(f'SELECT "id_abe", "id_player", "sPoints", "{COL_ACTUALIZACION}" FROM "{tabla}"'), motor)
+
+    with motor.begin() as conexion:
+        conexion.execute(sa.text(f'DROP TABLE IF EXISTS "{tabla}"'))
+        conexion.execute(sa.text(sql_crear_tabla(tabla, validas)))
+    try:
+        metricas = ingestar([str(ruta)], url_postgres_prueba, tabla, lote=1000)
+        assert metricas['cargadas'] == len(crudo)
+        assert metricas['lotes'] == -(-len(crudo) // 1000)
+        antes = leer()
+        assert len(antes) == len(crudo)
+
+        # Mismas llaves otra vez, la mitad con puntos corregidos: todo es upsert, nada se duplica
+        corregido = crudo.copy()
+        corregido.loc[::2, 'sPoints'] += 1
+        corregido.to_csv(ruta, index=False)
+        metricas = ingestar([str(ruta)], url_postgres_prueba, tabla, lote=1000)
+        assert metricas['cargadas'] == len(crudo)
+
+        despues = leer().merge(antes, on=LLAVE_MASTER, suffixes=('', '_antes'))
+        esperado = corregido[LLAVE_MASTER + ['sPoints']].merge(despues, on=LLAVE_MASTER, suffixes=('_esperado', ''))
+        assert len(despues) == len(crudo)
+        assert (esperado['sPoints'] == esperado['sPoints_esperado']).all()
+        assert (despues[COL_ACTUALIZACION] > despues[f'{COL_ACTUALIZACION}_antes']).all()
+    finally:
+        with motor.begin() as conexion:
+            conexion.execute(sa.text(f'DROP TABLE IF EXISTS "{tabla}"'))
@@ -0,0 +1,30 @@
+# tests/test_metricas.py
+"""Kernel fusionado (en sitio y con numba) contra el motor vectorizado de referencia."""
+import numpy as np
+import pytest
+from modules.benchmarks import totales_sinteticos
+from modules.metricas import metricas_avanzadas, metricas_avanzadas_fusionadas, numba
+
+CAMINOS = [False] + ([True] if numba is not None else [pytest.param(True, marks=pytest.mark.skip("sin numba"))])
+
+
+def _comparar(totales, jit):
+    referencia = metricas_avanzadas(totales)
+    fusionada = metricas_avanzadas_fusionadas(totales, jit=jit)
+    assert list(fusionada.columns) == list(referencia.columns)
+    np.testing.assert_allclose(fusionada.to_numpy(), referencia.to_numpy(), rtol=1e-12, equal_nan=True)
+
+
+@pytest.mark.parametrize('jit', CAMINOS)
+def test_fusionada_igual_a_referencia(jit):
+    _comparar(totales_sinteticos(500), jit)
+
+
+@pytest.mark.parametrize('jit', CAMINOS)
+def test_fusionada_con_denominadores_en_cero(jit):
+    totales = totales_sinteticos(50, seed=1)
+    totales.iloc[:10] = 0  # Jugador-ventana sin nada: todos los denominadores en 0
+    totales.loc[10:20, ['Tm_MIN', 'Tm_FGA', 'Tm_FTA', 'Tm_TOV', 'Opp_FGA', 'sMinutes']] = 0
+    _comparar(totales, jit)
+    assert not np.isinf(metricas_avanzadas_fusionadas(totales, jit=jit).to_numpy()).any()
+
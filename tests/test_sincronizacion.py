@@ -0,0 +1,47 @@
+# tests/test_sincronizacion.py
+import pandas as pd
+from modules.data_loader import TABLA_MASTER, LLAVE_MASTER, columnas_master, declarar_columnas, sincronizar_master
+from modules.fuentes import COL_ACTUALIZACION
+
+
+def _escribir(carpeta, df):
+    df.to_parquet(carpeta / f"{TABLA_MASTER}.parquet", index=False)
+
+
+def _puntos(hechos, id_abe, id_player):
+    df_jugadores = hechos[0]
+    fila = df_jugadores[(df_jugadores['id_abe'] == id_abe) & (df_jugadores['id_player'] == id_player)]
+    return int(fila['sPoints'].iloc[0])
+
+
+def test_proyeccion_incluye_updated_at():
+    declarar_columnas(TABLA_MASTER, ['sPoints', 'Nombre'])
+    assert COL_ACTUALIZACION in columnas_master()
+
+
+def test_delta_recoge_correccion_de_juego_viejo(master_crudo, fuente_local):
+    declarar_columnas(TABLA_MASTER, ['sPoints', 'Nombre', 'equipo_nombre', 'Categoria', 'Tm_FGA'])
+    columnas = columnas_master()
+    _escribir(fuente_local, master_crudo)
+    hechos = sincronizar_master(columnas)
+
+    # Corrección de un juego anterior a la marca de agua de id_abe, con updated_at adelantado
+    viejo = master_crudo.sort_values(LLAVE_MASTER).iloc[0]
+    corregido = master_crudo.copy()
+    es_viejo = (corregido['id_abe'] == viejo['id_abe']) & (corregido['id_player'] == viejo['id_player'])
+    corregido.loc[es_viejo, 'sPoints'] = int(viejo['sPoints']) + 7
+    corregido.loc[es_viejo, COL_ACTUALIZACION] = pd.Timestamp('2025-06-02', tz='UTC')
+    assert viejo['id_abe'] < master_crudo['id_abe'].max()
+    _escribir(fuente_local, corregido)
+
+    nuevos = sincronizar_master(columnas)
+    assert nuevos is not hechos
+    assert _puntos(nuevos, viejo['id_abe'], viejo['id_player']) == int(viejo['sPoints']) + 7
+    assert len(nuevos[0]) == len(hechos[0])
+
+
+def test_delta_sin_cambios_conserva_los_hechos(master_crudo, fuente_local):
+    columnas = columnas_master()
+    _escribir(fuente_local, master_crudo)
+    hechos = sincronizar_master(columnas)
+    assert sincronizar_master(columnas) is hechos
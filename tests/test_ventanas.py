@@ -0,0 +1,41 @@
+# tests/test_ventanas.py
+"""VentanasJugador (sumas acumuladas) contra ultimos_juegos_jugador + groupby en cada ventana."""
+import numpy as np
+import pandas as pd
+import pytest
+from modules import agregaciones as ag
+from modules.data_loader import sanitizar_master, compactar_tipos, separar_hechos, unir_equipo
+
+VENTANAS = [1, 2, 5, 20, None]
+
+
+@pytest.fixture(scope='module')
+def hechos():
+    """Jugador-juego (con columnas de equipo) de una categoría, con algunos minutos nulos."""
+    crudo = ag._master_consistente(3000)
+    df_jug, df_eq = separar_hechos(compactar_tipos(sanitizar_master(crudo)).sort_values(['id_abe', 'id_player'], ignore_index=True))
+    df_jug = unir_equipo(df_jug, df_eq)
+    df_jug = df_jug[df_jug['Categoria'] == 'Femenil D1'].reset_index(drop=True)
+    df_jug.loc[::23, 'sMinutes'] = np.nan  # groupby.mean ignora nulos: el índice también
+    return df_jug
+
+
+def _iguales(obtenido, esperado):
+    esperado = esperado.reset_index(drop=True)
+    assert list(obtenido.columns) == list(esperado.columns)
+    assert len(esperado) > 0
+    pd.testing.assert_frame_equal(obtenido, esperado, check_dtype=False, check_categorical=False, rtol=1e-6)
+
+
+@pytest.mark.parametrize('ventana', VENTANAS)
+def test_promedios_por_ventana(hechos, ventana):
+    df_jug = hechos
+    indice = ag.VentanasJugador(ag.ultimos_juegos_jugador(df_jug), [c for c in ag.AGG_PROMEDIOS if c != 'id_abe'])
+    _iguales(indice.promedios(ventana), ag.promedios_por_jugador(ag.ultimos_juegos_jugador(df_jug, ventana)))
+
+
+@pytest.mark.parametrize('ventana', VENTANAS)
+def test_totales_por_ventana(hechos, ventana):
+    df_jug = hechos
+    indice = ag.VentanasJugador(ag.ultimos_juegos_jugador(df_jug), [c for c in ag.AGG_TOTALES if c != 'id_abe'])
+    _iguales(indice.totales(ventana), ag.totales_por_jugador(ag.ultimos_juegos_jugador(df_jug, ventana)))
@@ -3,29 +3,93 @@ import pandas as pd
 import numpy as np
 import matplotlib.colors as mcolors
 import modules.utils as utils
-from modules.data_loader import cargar_datos_equipos_only
+from modules.data_loader import declarar_columnas, TABLA_MASTER
+from modules.agregaciones import CuboEquipos, juegos_equipo, rango_min, COLS_SUMA_4F
+from modules.almacen import derivado
+
+# --- COLUMNAS QUE USA ESTA VISTA (el loader solo descarga la unión de todas las vistas) ---
+COLUMNAS_EQUIPOS = declarar_columnas(TABLA_MASTER, [
+    'Categoria', 'equipo_nombre', 'id_abe', 'Fecha',
+    'Tm_Score', 'Tm_FG', 'Tm_FGA', 'Tm_3PM', 'Tm_FTM', 'Tm_FTA', 'Tm_ORB', 'Tm_DRB', 'Tm_TOV',
+    'Opp_Score', 'Opp_FG', 'Opp_FGA', 'Opp_3PM', 'Opp_FTM', 'Opp_FTA', 'Opp_ORB', 'Opp_DRB', 'Opp_TOV',
+])
+
+def _metricas_four_factors(d):
+    """Ratings, four factors y rankings sobre los arreglos equipos x ventanas del cubo (se agregan a `d`)."""
+    # 7. Métricas Four Factors
+    
+    # General
+    d['Off_Rtg'] = np.divide(d['Tm_PTS'], d['Tm_Poss'], out=np.zeros_like(d['Tm_PTS'], dtype=float), where=d['Tm_Poss']!=0) * 100
+    d['Def_Rtg'] = np.divide(d['Opp_PTS'], d['Opp_Poss'], out=np.zeros_like(d['Opp_PTS'], dtype=float), where=d['Opp_Poss']!=0) * 100
+    d['Net_Rtg'] = d['Off_Rtg'] - d['Def_Rtg']
+
+    # Ofensiva
+    # eFG%
+    num_efg = d['Tm_FG'] + (0.5 * d['Tm_3PM'])
+    d['Off_eFG'] = np.divide(num_efg, d['Tm_FGA'], out=np.zeros_like(num_efg, dtype=float), where=d['Tm_FGA']!=0)
+    # TOV%
+    denom_tov = d['Tm_FGA'] + (0.44 * d['Tm_FTA']) + d['Tm_TOV']
+    d['Off_TOV_Pct'] = np.divide(d['Tm_TOV'], denom_tov, out=np.zeros_like(d['Tm_TOV'], dtype=float), where=denom_tov!=0)
+    # ORB%
+    denom_orb_pct = d['Tm_ORB'] + d['Opp_DRB']
+    d['Off_ORB_Pct'] = np.divide(d['Tm_ORB'], denom_orb_pct, out=np.zeros_like(d['Tm_ORB'], dtype=float), where=denom_orb_pct!=0)
+    # FT Rate
+    d['Off_FTRate'] = np.divide(d['Tm_FTM'], d['Tm_FGA'], out=np.zeros_like(d['Tm_FTM'], dtype=float), where=d['Tm_FGA']!=0)
+
+    # Defensa
+    # Def eFG%
+    num_efg_def = d['Opp_FG'] + (0.5 * d['Opp_3PM'])
+    d['Def_eFG'] = np.divide(num_efg_def, d['Opp_FGA'], out=np.zeros_like(num_efg_def, dtype=float), where=d['Opp_FGA']!=0)
+    # Def TOV%
+    denom_tov_def = d['Opp_FGA'] + (0.44 * d['Opp_FTA']) + d['Opp_TOV']
+    d['Def_TOV_Pct'] = np.divide(d['Opp_TOV'], denom_tov_def, out=np.zeros_like(d['Opp_TOV'], dtype=float), where=denom_tov_def!=0)
+    # Def DRB%
+    denom_drb_pct = d['Opp_ORB'] + d['Tm_DRB']
+    d['Def_DRB_Pct'] = np.divide(d['Tm_DRB'], denom_drb_pct, out=np.zeros_like(d['Tm_DRB'], dtype=float), where=denom_drb_pct!=0)
+    # Def FT Rate
+    d['Def_FTRate'] = np.divide(d['Opp_FTM'], d['Opp_FGA'], out=np.zeros_like(d['Opp_FTM'], dtype=float), where=d['Opp_FGA']!=0)
+
+    # 8. Rankings (entre equipos, en cada ventana)
+    # General
+    d['Rk_Net'] = rango_min(d['Net_Rtg'])
+    
+    # Ofensiva
+    d['Rk_Off'] = rango_min(d['Off_Rtg'])
+    d['Rk_Off_eFG'] = rango_min(d['Off_eFG'])
+    d['Rk_Off_TOV'] = rango_min(d['Off_TOV_Pct'], ascendente=True) # Menos es mejor (Rank Asc)
+    d['Rk_Off_ORB'] = rango_min(d['Off_ORB_Pct'])
+    d['Rk_Off_FTR'] = rango_min(d['Off_FTRate'])
+
+    # Defensa
+    d['Rk_Def'] = rango_min(d['Def_Rtg'], ascendente=True) # Menos es mejor
+    d['Rk_Def_eFG'] = rango_min(d['Def_eFG'], ascendente=True) # Menos es mejor
+    d['Rk_Def_TOV'] = rango_min(d['Def_TOV_Pct']) # Más (forzados) es mejor
+    d['Rk_Def_DRB'] = rango_min(d['Def_DRB_Pct']) # Más es mejor
+    d['Rk_Def_FTR'] = rango_min(d['Def_FTRate'], ascendente=True) # Menos es mejor
+
+def cubo_four_factors(categoria_sel):
+    """Cubo equipos x ventanas (1..máx juegos) con sumas, four factors y rankings; uno por versión de datos y categoría."""
+    def construir():
+        # 4-6. Sumas de todas las ventanas a la vez sobre la tabla equipo-juego (puntos, W/L, posesiones)
+        cubo = CuboEquipos(juegos_equipo(categoria_sel), COLS_SUMA_4F)
+        _metricas_four_factors(cubo.datos)
+        return cubo
+    return derivado(('cubo_four_factors', categoria_sel), construir)
 
 def render_view(df_ignored, categoria_sel):
-    # 1. Cargar datos
+    # 1 y 2. Tabla equipo-juego de la categoría (compartida, ya con alias, puntos y posesiones)
     try:
-        df_teams_raw = cargar_datos_equipos_only()
+        df_teams = juegos_equipo(categoria_sel)
     except Exception as e:
         st.error(f"Error cargando datos: {e}")
-        df_teams_raw = pd.DataFrame()
-
-    if df_teams_raw.empty:
-        st.warning("No hay datos disponibles.")
-        st.stop()
+        df_teams = pd.DataFrame()
 
-    # 2. Filtrar Categoría
-    df_teams = df_teams_raw[df_teams_raw['Categoria'] == categoria_sel].copy()
     if df_teams.empty:
         st.warning(f"No hay equipos en: {categoria_sel}")
         st.stop()
 
     # 3. Slider y Header
-    max_games = df_teams.groupby('equipo_nombre')['id_abe'].nunique().max()
-    max_games = int(max_games) if (max_games and not pd.isna(max_games)) else 1
+    max_games = int(df_teams['Juego'].max())
     
     col_h, col_s = st.columns([1, 1])
     with col_h:
@@ -38,106 +102,8 @@ def render_view(df_ignored, categoria_sel):
             window = 1
         utils.rastrear_cambio("Slider 4Factors", window)
 
-    # 4. Preparación de Datos (Rellenar Nulos)
-    cols_check = [
-        'Tm_Score', 'Tm_FG', 'Tm_FGA', 'Tm_3PM', 'Tm_FTM', 'Tm_FTA', 'Tm_ORB', 'Tm_DRB', 'Tm_TOV',
-        'Opp_Score', 'Opp_FG', 'Opp_FGA', 'Opp_3PM', 'Opp_FTM', 'Opp_FTA', 'Opp_ORB', 'Opp_DRB', 'Opp_TOV'
-    ]
-    for c in cols_check:
-        if c not in df_teams.columns: df_teams[c] = 0.0
-        else: df_teams[c] = df_teams[c].fillna(0)
-
-    df_games = df_teams.copy()
-
-    # Calcular PTS si hace falta
-    if 'Tm_Score' in df_games.columns and df_games['Tm_Score'].sum() > 0:
-        df_games['Tm_PTS'] = df_games['Tm_Score']
-    else:
-        df_games['Tm_PTS'] = (2 * df_games['Tm_FG']) + df_games['Tm_3PM'] + df_games['Tm_FTM']
-
-    if 'Opp_Score' in df_games.columns and df_games['Opp_Score'].sum() > 0:
-        df_games['Opp_PTS'] = df_games['Opp_Score']
-    else:
-        df_games['Opp_PTS'] = (2 * df_games['Opp_FG']) + df_games['Opp_3PM'] + df_games['Opp_FTM']
-
-    df_games['W'] = np.where(df_games['Tm_PTS'] > df_games['Opp_PTS'], 1, 0)
-    df_games['L'] = np.where(df_games['Tm_PTS'] < df_games['Opp_PTS'], 1, 0)
-
-    # 5. Posesiones (Fórmula Original)
-    # Equipo
-    denom_orb = df_games['Tm_ORB'] + df_games['Opp_DRB']
-    orb_pct = np.divide(df_games['Tm_ORB'], denom_orb, out=np.zeros_like(df_games['Tm_ORB'], dtype=float), where=denom_orb!=0)
-    missed_fg = df_games['Tm_FGA'] - df_games['Tm_FG']
-    df_games['Tm_Poss'] = (df_games['Tm_FGA'] - (orb_pct * missed_fg * 1.07) + df_games['Tm_TOV'] + (0.4 * df_games['Tm_FTA']))
-
-    # Rival
-    denom_orb_opp = df_games['Opp_ORB'] + df_games['Tm_DRB']
-    orb_pct_opp = np.divide(df_games['Opp_ORB'], denom_orb_opp, out=np.zeros_like(df_games['Opp_ORB'], dtype=float), where=denom_orb_opp!=0)
-    opp_missed_fg = df_games['Opp_FGA'] - df_games['Opp_FG']
-    df_games['Opp_Poss'] = (df_games['Opp_FGA'] - (orb_pct_opp * opp_missed_fg * 1.07) + df_games['Opp_TOV'] + (0.4 * df_games['Opp_FTA']))
-
-    # 6. Agregación (Sumar)
-    df_sorted = df_games.sort_values(['equipo_nombre', 'Fecha'], ascending=[True, False])
-    df_window = df_sorted.groupby('equipo_nombre').head(window)
-
-    cols_sum = [
-        'W', 'L', 'Tm_PTS', 'Opp_PTS', 'Tm_Poss', 'Opp_Poss',
-        'Tm_FG', 'Tm_FGA', 'Tm_3PM', 'Tm_FTM', 'Tm_FTA', 'Tm_TOV', 'Tm_ORB', 'Tm_DRB',
-        'Opp_FG', 'Opp_FGA', 'Opp_3PM', 'Opp_FTM', 'Opp_FTA', 'Opp_TOV', 'Opp_ORB', 'Opp_DRB'
-    ]
-    agg_dict = {c: 'sum' for c in cols_sum if c in df_window.columns}
-    df_agg = df_window.groupby('equipo_nombre').agg(agg_dict).reset_index()
-
-    # 7. Métricas Four Factors
-    
-    # General
-    df_agg['Off_Rtg'] = np.divide(df_agg['Tm_PTS'], df_agg['Tm_Poss'], out=np.zeros_like(df_agg['Tm_PTS'], dtype=float), where=df_agg['Tm_Poss']!=0) * 100
-    df_agg['Def_Rtg'] = np.divide(df_agg['Opp_PTS'], df_agg['Opp_Poss'], out=np.zeros_like(df_agg['Opp_PTS'], dtype=float), where=df_agg['Opp_Poss']!=0) * 100
-    df_agg['Net_Rtg'] = df_agg['Off_Rtg'] - df_agg['Def_Rtg']
-
-    # Ofensiva
-    # eFG%
-    num_efg = df_agg['Tm_FG'] + (0.5 * df_agg['Tm_3PM'])
-    df_agg['Off_eFG'] = np.divide(num_efg, df_agg['Tm_FGA'], out=np.zeros_like(num_efg, dtype=float), where=df_agg['Tm_FGA']!=0)
-    # TOV%
-    denom_tov = df_agg['Tm_FGA'] + (0.44 * df_agg['Tm_FTA']) + df_agg['Tm_TOV']
-    df_agg['Off_TOV_Pct'] = np.divide(df_agg['Tm_TOV'], denom_tov, out=np.zeros_like(df_agg['Tm_TOV'], dtype=float), where=denom_tov!=0)
-    # ORB%
-    denom_orb_pct = df_agg['Tm_ORB'] + df_agg['Opp_DRB']
-    df_agg['Off_ORB_Pct'] = np.divide(df_agg['Tm_ORB'], denom_orb_pct, out=np.zeros_like(df_agg['Tm_ORB'], dtype=float), where=denom_orb_pct!=0)
-    # FT Rate
-    df_agg['Off_FTRate'] = np.divide(df_agg['Tm_FTM'], df_agg['Tm_FGA'], out=np.zeros_like(df_agg['Tm_FTM'], dtype=float), where=df_agg['Tm_FGA']!=0)
-
-    # Defensa
-    # Def eFG%
-    num_efg_def = df_agg['Opp_FG'] + (0.5 * df_agg['Opp_3PM'])
-    df_agg['Def_eFG'] = np.divide(num_efg_def, df_agg['Opp_FGA'], out=np.zeros_like(num_efg_def, dtype=float), where=df_agg['Opp_FGA']!=0)
-    # Def TOV%
-    denom_tov_def = df_agg['Opp_FGA'] + (0.44 * df_agg['Opp_FTA']) + df_agg['Opp_TOV']
-    df_agg['Def_TOV_Pct'] = np.divide(df_agg['Opp_TOV'], denom_tov_def, out=np.zeros_like(df_agg['Opp_TOV'], dtype=float), where=denom_tov_def!=0)
-    # Def DRB%
-    denom_drb_pct = df_agg['Opp_ORB'] + df_agg['Tm_DRB']
-    df_agg['Def_DRB_Pct'] = np.divide(df_agg['Tm_DRB'], denom_drb_pct, out=np.zeros_like(df_agg['Tm_DRB'], dtype=float), where=denom_drb_pct!=0)
-    # Def FT Rate
-    df_agg['Def_FTRate'] = np.divide(df_agg['Opp_FTM'], df_agg['Opp_FGA'], out=np.zeros_like(df_agg['Opp_FTM'], dtype=float), where=df_agg['Opp_FGA']!=0)
-
-    # 8. Rankings
-    # General
-    df_agg['Rk_Net'] = df_agg['Net_Rtg'].rank(ascending=False, method='min')
-    
-    # Ofensiva
-    df_agg['Rk_Off'] = df_agg['Off_Rtg'].rank(ascending=False, method='min')
-    df_agg['Rk_Off_eFG'] = df_agg['Off_eFG'].rank(ascending=False, method='min')
-    df_agg['Rk_Off_TOV'] = df_agg['Off_TOV_Pct'].rank(ascending=True, method='min') # Menos es mejor (Rank Asc)
-    df_agg['Rk_Off_ORB'] = df_agg['Off_ORB_Pct'].rank(ascending=False, method='min')
-    df_agg['Rk_Off_FTR'] = df_agg['Off_FTRate'].rank(ascending=False, method='min')
-
-    # Defensa
-    df_agg['Rk_Def'] = df_agg['Def_Rtg'].rank(ascending=True, method='min') # Menos es mejor
-    df_agg['Rk_Def_eFG'] = df_agg['Def_eFG'].rank(ascending=True, method='min') # Menos es mejor
-    df_agg['Rk_Def_TOV'] = df_agg['Def_TOV_Pct'].rank(ascending=False, method='min') # Más (forzados) es mejor
-    df_agg['Rk_Def_DRB'] = df_agg['Def_DRB_Pct'].rank(ascending=False, method='min') # Más es mejor
-    df_agg['Rk_Def_FTR'] = df_agg['Def_FTRate'].rank(ascending=True, method='min') # Menos es mejor
+    # 4-8. Four factors y rankings de todas las ventanas (una vez por versión); el slider solo rebana
+    df_agg = cubo_four_factors(categoria_sel).tabla(window)
 
     # 9. Visualización con Radio Buttons
     st.markdown("### Four Factors (ocho, más bien)")
@@ -3,22 +3,75 @@ import pandas as pd
 import numpy as np
 import matplotlib.colors as mcolors
 import modules.utils as utils
-from modules.data_loader import cargar_datos_equipos_only # Importamos la carga especial
+from modules.data_loader import declarar_columnas, TABLA_MASTER
+from modules.agregaciones import CuboEquipos, juegos_equipo, rango_min
+from modules.almacen import derivado
+
+# --- COLUMNAS QUE USA ESTA VISTA (el loader solo descarga la unión de todas las vistas) ---
+COLUMNAS_EQUIPOS = declarar_columnas(TABLA_MASTER, [
+    'Categoria', 'equipo_nombre', 'id_abe', 'Fecha', 'Tm_Score', 'Opp_Score',
+    'Tm_FG', 'Tm_FGA', 'Tm_FTA', 'Tm_ORB', 'Tm_DRB', 'Tm_TOV',
+    'Opp_FG', 'Opp_FGA', 'Opp_FTA', 'Opp_ORB', 'Opp_DRB', 'Opp_TOV',
+])
+
+def cubo_resumen(categoria_sel):
+    """
+    Récord, ratings, Pitágoras, bloque de últimos 5 y rankings de cada equipo para todas las ventanas
+    (1..máx juegos), calculados una vez por versión de datos y categoría.
+    """
+    return derivado(('cubo_resumen', categoria_sel), lambda: _construir_cubo(categoria_sel))
+
+def _construir_cubo(categoria_sel):
+    SEASON_GAMES = 30 if "Femenil" in categoria_sel else 36
+
+    # 5. Agregación: sumas de todas las ventanas a la vez sobre la tabla equipo-juego (puntos, W/L, posesiones)
+    cubo = CuboEquipos(juegos_equipo(categoria_sel), ['W', 'L', 'Tm_PTS', 'Opp_PTS', 'Tm_Poss', 'Opp_Poss'])
+    d = cubo.datos
+    d['Off_Rtg'] = np.divide(d['Tm_PTS'], d['Tm_Poss'], out=np.zeros_like(d['Tm_PTS'], dtype=float), where=d['Tm_Poss']!=0) * 100
+    d['Def_Rtg'] = np.divide(d['Opp_PTS'], d['Opp_Poss'], out=np.zeros_like(d['Opp_PTS'], dtype=float), where=d['Opp_Poss']!=0) * 100
+    d['Net_Rtg'] = d['Off_Rtg'] - d['Def_Rtg']
+    d['Win_Pct'] = np.divide(d['W'], d['GP'], out=np.zeros_like(d['W'], dtype=float), where=d['GP']!=0)
+
+    # Last 5 (igual en todas las ventanas)
+    cols_l5 = {'W': 'L5_W', 'L': 'L5_L', 'Net_Rtg': 'L5_Net', 'Off_Rtg': 'L5_Off', 'Def_Rtg': 'L5_Def'}
+    for col, col_l5 in cols_l5.items():
+        d[col_l5] = cubo.fija(col, 5)
+
+    # Pitágoras (Corregido con float 13.91)
+    pts_power = d['Tm_PTS'] ** 13.91
+    opp_pts_power = d['Opp_PTS'] ** 13.91
+    denom_pyth = pts_power + opp_pts_power
+    d['Pyth_Ratio'] = np.divide(pts_power, denom_pyth, out=np.zeros_like(pts_power, dtype=float), where=denom_pyth!=0)
+    
+    d['Exp_Total'] = d['Pyth_Ratio'] * SEASON_GAMES
+    d['Exp_Current'] = d['Pyth_Ratio'] * d['GP']
+    d['Diff_Wins'] = d['W'] - d['Exp_Current']
+
+    # Rankings (entre equipos, en cada ventana)
+    d['Rk_Net'] = rango_min(d['Net_Rtg'])
+    d['Rk_W'] = rango_min(d['W'].astype(float))
+    d['Rk_L'] = rango_min(d['L'].astype(float), ascendente=True)
+    d['Rk_Pct'] = rango_min(d['Win_Pct'])
+    d['Rk_ExpT'] = rango_min(d['Exp_Total'])
+    d['Rk_ExpC'] = rango_min(d['Exp_Current'])
+    d['Rk_Diff'] = rango_min(d['Diff_Wins'])
+    d['Rk_Off'] = rango_min(d['Off_Rtg'])
+    d['Rk_Def'] = rango_min(d['Def_Rtg'], ascendente=True)
+    d['Rk_L5_W'] = rango_min(d['L5_W'].astype(float))
+    d['Rk_L5_L'] = rango_min(d['L5_L'].astype(float), ascendente=True)
+    d['Rk_L5_Net'] = rango_min(d['L5_Net'])
+    d['Rk_L5_Off'] = rango_min(d['L5_Off'])
+    d['Rk_L5_Def'] = rango_min(d['L5_Def'], ascendente=True)
+    return cubo
 
 def render_view(df_ignored, categoria_sel):
     # Nota: df_ignored es el argumento que viene de app.py (df_raw), 
-    # pero aquí lo ignoramos porque usamos la carga optimizada propia.
+    # pero aquí lo ignoramos: la tabla juego x equipo se deriva del master cacheado.
     
-    # 1. Cargar datos optimizados (Carril B)
+    # 1 y 2. Tabla equipo-juego de la categoría (Carril B, compartida, ya con alias, puntos y posesiones)
     try:
-        df_teams_raw = cargar_datos_equipos_only()
+        df_teams = juegos_equipo(categoria_sel)
     except:
-        df_teams_raw = pd.DataFrame()
-
-    # 2. Filtrar por categoría
-    if not df_teams_raw.empty:
-        df_teams = df_teams_raw[df_teams_raw['Categoria'] == categoria_sel].copy()
-    else:
         df_teams = pd.DataFrame()
     
     if df_teams.empty:
@@ -26,9 +79,7 @@ def render_view(df_ignored, categoria_sel):
         st.stop()
 
     # 3. Slider y Config
-    max_games_found = df_teams.groupby('equipo_nombre')['id_abe'].nunique().max()
-    if not max_games_found or pd.isna(max_games_found): max_games_found = 1
-    else: max_games_found = int(max_games_found)
+    max_games_found = int(df_teams['Juego'].max())
     
     col_header, col_slider_eq = st.columns([1, 1])
     with col_header:
@@ -42,83 +93,8 @@ def render_view(df_ignored, categoria_sel):
             games_window_eq = 1
         utils.rastrear_cambio("Slider Juegos (Equipos)", games_window_eq)
 
-    SEASON_GAMES = 30 if "Femenil" in categoria_sel else 36
-
-    # 4. Preparación (Directa, sin GroupBy)
-    df_games = df_teams.copy()
-
-    # Cálculos con Score Real
-    df_games['Tm_PTS'] = df_games['Tm_Score']
-    df_games['Opp_PTS'] = df_games['Opp_Score']
-    df_games['W'] = np.where(df_games['Tm_PTS'] > df_games['Opp_PTS'], 1, 0)
-    df_games['L'] = np.where(df_games['Tm_PTS'] < df_games['Opp_PTS'], 1, 0)
-
-    # Posesiones
-    denom_orb = df_games['Tm_ORB'] + df_games['Opp_DRB']
-    orb_pct = np.divide(df_games['Tm_ORB'], denom_orb, out=np.zeros_like(df_games['Tm_ORB'], dtype=float), where=denom_orb!=0)
-    missed_fg = df_games['Tm_FGA'] - df_games['Tm_FG']
-    df_games['Tm_Poss'] = (df_games['Tm_FGA'] - (orb_pct * missed_fg * 1.07) + df_games['Tm_TOV'] + (0.4 * df_games['Tm_FTA']))
-
-    denom_orb_opp = df_games['Opp_ORB'] + df_games['Tm_DRB']
-    orb_pct_opp = np.divide(df_games['Opp_ORB'], denom_orb_opp, out=np.zeros_like(df_games['Opp_ORB'], dtype=float), where=denom_orb_opp!=0)
-    opp_missed_fg = df_games['Opp_FGA'] - df_games['Opp_FG']
-    df_games['Opp_Poss'] = (df_games['Opp_FGA'] - (orb_pct_opp * opp_missed_fg * 1.07) + df_games['Opp_TOV'] + (0.4 * df_games['Opp_FTA']))
-
-    # 5. Agregación
-    def calcular_metricas_agrupadas(dataframe_input):
-        agg = dataframe_input.groupby('equipo_nombre').agg({
-            'W': 'sum', 'L': 'sum',
-            'Tm_PTS': 'sum', 'Opp_PTS': 'sum',
-            'Tm_Poss': 'sum', 'Opp_Poss': 'sum',
-            'id_abe': 'count'
-        }).reset_index()
-        agg.rename(columns={'id_abe': 'GP'}, inplace=True)
-
-        agg['Off_Rtg'] = np.divide(agg['Tm_PTS'], agg['Tm_Poss'], out=np.zeros_like(agg['Tm_PTS'], dtype=float), where=agg['Tm_Poss']!=0) * 100
-        agg['Def_Rtg'] = np.divide(agg['Opp_PTS'], agg['Opp_Poss'], out=np.zeros_like(agg['Opp_PTS'], dtype=float), where=agg['Opp_Poss']!=0) * 100
-        agg['Net_Rtg'] = agg['Off_Rtg'] - agg['Def_Rtg']
-        agg['Win_Pct'] = np.divide(agg['W'], agg['GP'], out=np.zeros_like(agg['W'], dtype=float), where=agg['GP']!=0)
-        return agg
-
-    # Dinámicas
-    df_games_sorted = df_games.sort_values(['equipo_nombre', 'Fecha'], ascending=[True, False])
-    df_window_raw = df_games_sorted.groupby('equipo_nombre').head(games_window_eq)
-    df_dynamic = calcular_metricas_agrupadas(df_window_raw)
-
-    # Last 5
-    df_last5_raw = df_games_sorted.groupby('equipo_nombre').head(5)
-    df_l5 = calcular_metricas_agrupadas(df_last5_raw)
-    cols_rename_l5 = {'W': 'L5_W', 'L': 'L5_L', 'Net_Rtg': 'L5_Net', 'Off_Rtg': 'L5_Off', 'Def_Rtg': 'L5_Def'}
-    df_l5.rename(columns=cols_rename_l5, inplace=True)
-    df_l5 = df_l5[['equipo_nombre'] + list(cols_rename_l5.values())]
-
-    df_final = pd.merge(df_dynamic, df_l5, on='equipo_nombre', how='left')
-
-    # Pitágoras (Corregido con float 13.91)
-    pts_power = df_final['Tm_PTS'] ** 13.91
-    opp_pts_power = df_final['Opp_PTS'] ** 13.91
-    denom_pyth = pts_power + opp_pts_power
-    df_final['Pyth_Ratio'] = np.divide(pts_power, denom_pyth, out=np.zeros_like(pts_power, dtype=float), where=denom_pyth!=0)
-    
-    df_final['Exp_Total'] = df_final['Pyth_Ratio'] * SEASON_GAMES
-    df_final['Exp_Current'] = df_final['Pyth_Ratio'] * df_final['GP']
-    df_final['Diff_Wins'] = df_final['W'] - df_final['Exp_Current']
-
-    # Rankings
-    df_final['Rk_Net'] = df_final['Net_Rtg'].rank(ascending=False, method='min')
-    df_final['Rk_W'] = df_final['W'].rank(ascending=False, method='min')
-    df_final['Rk_L'] = df_final['L'].rank(ascending=True, method='min')
-    df_final['Rk_Pct'] = df_final['Win_Pct'].rank(ascending=False, method='min')
-    df_final['Rk_ExpT'] = df_final['Exp_Total'].rank(ascending=False, method='min')
-    df_final['Rk_ExpC'] = df_final['Exp_Current'].rank(ascending=False, method='min')
-    df_final['Rk_Diff'] = df_final['Diff_Wins'].rank(ascending=False, method='min')
-    df_final['Rk_Off'] = df_final['Off_Rtg'].rank(ascending=False, method='min')
-    df_final['Rk_Def'] = df_final['Def_Rtg'].rank(ascending=True, method='min')
-    df_final['Rk_L5_W'] = df_final['L5_W'].rank(ascending=False, method='min')
-    df_final['Rk_L5_L'] = df_final['L5_L'].rank(ascending=True, method='min')
-    df_final['Rk_L5_Net'] = df_final['L5_Net'].rank(ascending=False, method='min')
-    df_final['Rk_L5_Off'] = df_final['L5_Off'].rank(ascending=False, method='min')
-    df_final['Rk_L5_Def'] = df_final['L5_Def'].rank(ascending=True, method='min')
+    # 4. Métricas y rankings de todas las ventanas (una vez por versión); el slider solo rebana
+    df_final = cubo_resumen(categoria_sel).tabla(games_window_eq)
 
     # Visualización
     st.markdown("### 📋 Resumen del torneo")
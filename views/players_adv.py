@@ -3,13 +3,50 @@ import pandas as pd
 import numpy as np
 import math
 import modules.utils as utils
+from modules.data_loader import declarar_columnas, TABLA_MASTER, TABLA_PLAYERS, TABLA_ROSTERS
+from modules.agregaciones import ventanas_jugador, totales_por_jugador_sql
+from modules.almacen import memorizado
+from modules.metricas import metricas_avanzadas_fusionadas, dividir
+
+# --- COLUMNAS QUE USA ESTA VISTA (el loader solo descarga la unión de todas las vistas) ---
+COLUMNAS_MASTER = declarar_columnas(TABLA_MASTER, [
+    'id_player', 'Nombre', 'equipo_nombre', 'id_abe', 'Fecha', 'sMinutes', 'starter',
+    'sPoints', 'sFieldGoalsMade', 'sFieldGoalsAttempted', 'sTwoPointersMade', 'sThreePointersMade',
+    'sFreeThrowsMade', 'sFreeThrowsAttempted', 'sReboundsOffensive', 'sReboundsDefensive',
+    'sReboundsTotal', 'sAssists', 'sTurnovers', 'sSteals', 'sBlocks', 'sFoulsPersonal',
+    'Tm_FGA', 'Tm_FTA', 'Tm_TOV', 'Tm_MIN', 'Tm_FG', 'Tm_ORB', 'Tm_DRB', 'Tm_TRB',
+    'Tm_AST', 'Tm_STL', 'Tm_BLK', 'Tm_3PM', 'Tm_FTM', 'Tm_2PM', 'Tm_3PA', 'Tm_PF',
+    'Opp_DRB', 'Opp_ORB', 'Opp_TRB', 'Opp_FGA', 'Opp_FG', 'Opp_3PA', 'Opp_3PM',
+    'Opp_PF', 'Opp_FTA', 'Opp_FTM', 'Opp_TOV', 'Opp_MIN',
+])
+COLUMNAS_PLAYERS = declarar_columnas(TABLA_PLAYERS, ['player_id', 'height_cm', 'weight_kg'])
+COLUMNAS_ROSTERS = declarar_columnas(TABLA_ROSTERS, ['player_id', 'effective_start_date', 'playing_position'])
+
+@memorizado
+def calcular_avanzadas(categoria_sel, equipo_filtro, ventana):
+    """Totales por jugador de los últimos `ventana` juegos (None = todos) y sus métricas avanzadas."""
+    equipo = None if equipo_filtro == "Todos" else equipo_filtro
+    # --- 3. AGRUPACIÓN TOTALES ---
+    # En Postgres si está configurado (solo viajan las filas agregadas); si no, con las sumas
+    # acumuladas de la categoría/equipo (columnas Tm_*/Opp_* ya unidas una vez por versión)
+    totals = totales_por_jugador_sql(categoria_sel, equipo, ventana)
+    if totals is None:
+        totals = ventanas_jugador(categoria_sel, equipo, con_equipo=True).totales(ventana)
+
+    totals['MPG'] = dividir(totals['sMinutes'], totals['id_abe'])
+    totals.rename(columns={'id_abe': 'GP', 'starter': 'JT'}, inplace=True)
+
+    # --- 4. CÁLCULOS DEAN OLIVER (motor compartido de modules/metricas.py) ---
+    totals = totals.join(metricas_avanzadas_fusionadas(totals))
+    return totals
 
 def render_view(df, df_players, df_rosters, categoria_sel):
     st.title(f"Advanced Stats | {categoria_sel}")
 
     # --- 0. PREPARACIÓN DE METADATA ---
-    df_players['player_id_str'] = df_players['player_id'].astype(str)
-    df_rosters['player_id_str'] = df_rosters['player_id'].astype(str)
+    # Los frames vienen del almacén compartido: se trabaja sobre copias locales
+    df_players = df_players.assign(player_id_str=df_players['player_id'].astype(str))
+    df_rosters = df_rosters.assign(player_id_str=df_rosters['player_id'].astype(str))
     
     mapa_posicion = {}
     if not df_rosters.empty:
@@ -26,7 +63,7 @@ def render_view(df, df_players, df_rosters, categoria_sel):
         mapa_peso = pd.Series(df_players.weight_kg.values, index=df_players.player_id_str).to_dict()
 
     # --- 1. FILTROS BÁSICOS ---
-    max_games_found = df.groupby('equipo_nombre')['id_abe'].nunique().max()
+    max_games_found = df.groupby('equipo_nombre', observed=True)['id_abe'].nunique().max()
     if not max_games_found or pd.isna(max_games_found): max_games_found = 1
     else: max_games_found = int(max_games_found)
 
@@ -54,7 +91,7 @@ def render_view(df, df_players, df_rosters, categoria_sel):
         df_active_context['h_clean'] = df_active_context['h'].replace(0, np.nan)
         df_active_context['w_clean'] = df_active_context['w'].replace(0, np.nan)
         
-        team_stats_context = df_active_context.groupby('equipo_nombre').agg({
+        team_stats_context = df_active_context.groupby('equipo_nombre', observed=True).agg({
             'id_player': 'count', 'h_clean': 'mean', 'w_clean': 'mean'
         }).reset_index()
         
@@ -88,173 +125,23 @@ def render_view(df, df_players, df_rosters, categoria_sel):
     else:
         df_view = df
 
-    df_active_games = df_view[df_view['sMinutes'] > 0].copy()
-    
-    if games_window < max_games_found:
-        df_active_games = df_active_games.sort_values(by='Fecha', ascending=False)
-        df_active_games = df_active_games.groupby('id_player').head(games_window)
+    ventana = games_window if games_window < max_games_found else None
+    if ventana is not None:
         st.toast(f"Métricas basadas en los últimos {games_window} juegos.", icon="🛸")
 
     if games_window < max_games_found:
         threshold_games = math.ceil(games_window * 0.40)
     else:
         if equipo_filtro != "Todos":
-             base_games = df_view.groupby('equipo_nombre')['id_abe'].nunique().max()
+             base_games = df_view.groupby('equipo_nombre', observed=True)['id_abe'].nunique().max()
         else:
-             base_games = df_view.groupby('equipo_nombre')['id_abe'].nunique().min()
+             base_games = df_view.groupby('equipo_nombre', observed=True)['id_abe'].nunique().min()
         if pd.isna(base_games): base_games = 1
         threshold_games = math.ceil(base_games * 0.50)
 
-    # --- 3. AGRUPACIÓN TOTALES ---
-    totals = df_active_games.groupby(['id_player', 'Nombre', 'equipo_nombre']).agg({
-        'id_abe': 'count', 'sMinutes': 'sum', 'starter': 'sum',
-        'sPoints': 'sum', 'sFieldGoalsMade': 'sum', 'sFieldGoalsAttempted': 'sum',
-        'sThreePointersMade': 'sum', 'sTwoPointersMade': 'sum',
-        'sFreeThrowsMade': 'sum', 'sFreeThrowsAttempted': 'sum',
-        'sReboundsOffensive': 'sum', 'sReboundsDefensive': 'sum', 'sReboundsTotal': 'sum',
-        'sAssists': 'sum', 'sTurnovers': 'sum', 'sSteals': 'sum', 'sBlocks': 'sum',
-        'sFoulsPersonal': 'sum',
-        'Tm_FGA': 'sum', 'Tm_FTA': 'sum', 'Tm_TOV': 'sum', 'Tm_MIN': 'sum',
-        'Tm_FG': 'sum', 'Tm_ORB': 'sum', 'Tm_DRB': 'sum', 'Tm_TRB': 'sum',
-        'Tm_AST': 'sum', 'Tm_STL': 'sum', 'Tm_BLK': 'sum', 'Tm_3PM': 'sum',
-        'Tm_FTM': 'sum', 'Tm_2PM': 'sum', 'Tm_3PA': 'sum', 'Tm_PF': 'sum',
-        'Opp_DRB': 'sum', 'Opp_ORB': 'sum', 'Opp_TRB': 'sum', 'Opp_FGA': 'sum', 'Opp_FG': 'sum', 'Opp_3PA': 'sum', 'Opp_3PM': 'sum',
-        'Opp_PF': 'sum', 'Opp_FTA': 'sum', 'Opp_FTM': 'sum', 'Opp_TOV': 'sum', 'Opp_MIN': 'sum'
-    }).reset_index()
-
-    totals['MPG'] = np.divide(totals['sMinutes'], totals['id_abe'], out=np.zeros_like(totals['sMinutes'], dtype=float), where=totals['id_abe']!=0)
-    totals.rename(columns={'id_abe': 'GP', 'starter': 'JT'}, inplace=True)
-
-    # --- 4. CÁLCULOS DEAN OLIVER ---
-    denom_orb_perc = totals['Tm_ORB'] + totals['Opp_DRB']
-    orb_perc = np.divide(totals['Tm_ORB'], denom_orb_perc, out=np.zeros_like(totals['Tm_ORB'], dtype=float), where=denom_orb_perc!=0)
-    missed_fg = totals['Tm_FGA'] - totals['Tm_FG']
-    totals['Tm_Poss'] = totals['Tm_FGA'] - (orb_perc * missed_fg * 1.07) + totals['Tm_TOV'] + (0.4 * totals['Tm_FTA'])
-
-    denom_opp_orb_perc = totals['Opp_ORB'] + totals['Tm_DRB']
-    opp_orb_perc = np.divide(totals['Opp_ORB'], denom_opp_orb_perc, out=np.zeros_like(totals['Opp_ORB'], dtype=float), where=denom_opp_orb_perc!=0)
-    opp_missed_fg = totals['Opp_FGA'] - totals['Opp_FG']
-    Opp_Poss = totals['Opp_FGA'] - (opp_orb_perc * opp_missed_fg * 1.07) + totals['Opp_TOV'] + (0.4 * totals['Opp_FTA'])
-
-    totals['Opp_POSS'] = Opp_Poss 
-
-    tm_min_5 = totals['Tm_MIN'] / 5 
-    totals['Pace'] = 40 * np.divide((totals['Tm_Poss'] + Opp_Poss), (2 * tm_min_5), out=np.zeros_like(totals['Tm_Poss'], dtype=float), where=tm_min_5!=0)
-
-    time_ratio = np.divide(totals['sMinutes'], tm_min_5, out=np.zeros_like(totals['sMinutes'], dtype=float), where=tm_min_5!=0)
-    term_a = 1.14 * np.divide((totals['Tm_AST'] - totals['sAssists']), totals['Tm_FG'], out=np.zeros_like(totals['Tm_AST'], dtype=float), where=totals['Tm_FG']!=0)
-    part_a = time_ratio * term_a
-    tm_ast_pm = np.divide(totals['Tm_AST'], totals['Tm_MIN'], out=np.zeros_like(totals['Tm_AST'], dtype=float), where=totals['Tm_MIN']!=0)
-    tm_fg_pm = np.divide(totals['Tm_FG'], totals['Tm_MIN'], out=np.zeros_like(totals['Tm_FG'], dtype=float), where=totals['Tm_MIN']!=0)
-    num_b = (tm_ast_pm * totals['sMinutes'] * 5) - totals['sAssists']
-    den_b = (tm_fg_pm * totals['sMinutes'] * 5) - totals['sFieldGoalsMade']
-    term_b = np.divide(num_b, den_b, out=np.zeros_like(num_b, dtype=float), where=den_b!=0)
-    part_b = term_b * (1 - time_ratio)
-    qAST = part_a + part_b
-    pts_from_fg = totals['sPoints'] - totals['sFreeThrowsMade']
-    pts_fg_no_ast = 2 * (totals['sFieldGoalsMade'] + 0.5 * totals['sThreePointersMade'])
-    ratio_pts_att_num = 2 * totals['sFieldGoalsAttempted']
-    FG_Part = totals['sFieldGoalsMade'] * (1 - 0.5 * (np.divide(pts_from_fg, ratio_pts_att_num, out=np.zeros_like(pts_from_fg, dtype=float), where=ratio_pts_att_num!=0) * qAST))
-    Tm_PTS = (totals['Tm_FG'] * 2) + totals['Tm_3PM'] + totals['Tm_FTM']
-    tm_pts_fg = Tm_PTS - totals['Tm_FTM']
-    tm_pts_others = tm_pts_fg - pts_from_fg
-    tm_fga_others = totals['Tm_FGA'] - totals['sFieldGoalsAttempted']
-    factor_2 = np.divide(tm_pts_others, (2 * tm_fga_others), out=np.zeros_like(tm_pts_others, dtype=float), where=tm_fga_others!=0)
-    AST_Part = 0.5 * (factor_2 * totals['sAssists'])
-    ft_rate = np.divide(totals['sFreeThrowsMade'], totals['sFreeThrowsAttempted'], out=np.zeros_like(totals['sFreeThrowsMade'], dtype=float), where=totals['sFreeThrowsAttempted']!=0)
-    FT_Part = (1 - (1 - ft_rate)**2) * 0.4 * totals['sFreeThrowsAttempted']
-    denom_orb = totals['Tm_ORB'] + totals['Opp_DRB']
-    Team_ORB_Perc = np.divide(totals['Tm_ORB'], denom_orb, out=np.zeros_like(totals['Tm_ORB'], dtype=float), where=denom_orb!=0)
-    ft_rate_team = np.divide(totals['Tm_FTM'], totals['Tm_FTA'], out=np.zeros_like(totals['Tm_FTM'], dtype=float), where=totals['Tm_FTA']!=0)
-    tm_ft_poss = (1 - (1 - ft_rate_team)**2) * totals['Tm_FTA'] * 0.4
-    Team_Scoring_Poss = totals['Tm_FG'] + tm_ft_poss
-    denom_play = totals['Tm_FGA'] + (totals['Tm_FTA'] * 0.4) + totals['Tm_TOV']
-    Team_Play_Perc = np.divide(Team_Scoring_Poss, denom_play, out=np.zeros_like(Team_Scoring_Poss, dtype=float), where=denom_play!=0)
-    t1 = (1 - Team_ORB_Perc) * Team_Play_Perc
-    t2 = Team_ORB_Perc * (1 - Team_Play_Perc)
-    Team_ORB_Weight = np.divide(t1, (t1 + t2), out=np.zeros_like(t1, dtype=float), where=(t1 + t2)!=0)
-    ORB_Part = totals['sReboundsOffensive'] * Team_ORB_Weight * Team_Play_Perc
-    orb_ratio = np.divide(totals['Tm_ORB'], Team_Scoring_Poss, out=np.zeros_like(totals['Tm_ORB'], dtype=float), where=Team_Scoring_Poss!=0)
-    ORB_Adj = 1 - (orb_ratio * Team_ORB_Weight * Team_Play_Perc)
-    totals['ScPoss'] = (FG_Part + AST_Part + FT_Part) * ORB_Adj + ORB_Part
-    ratio_pts_att_num_pprod = 2 * totals['sFieldGoalsAttempted']
-    ratio_pts_att = np.divide(pts_from_fg, ratio_pts_att_num_pprod, out=np.zeros_like(pts_from_fg, dtype=float), where=ratio_pts_att_num_pprod!=0)
-    adjust_mult = 0.5 * ratio_pts_att * qAST
-    PProd_FG_Part = pts_fg_no_ast * (1 - adjust_mult)
-    tm_fg_others = totals['Tm_FG'] - totals['sFieldGoalsMade']
-    tm_3p_others = totals['Tm_3PM'] - totals['sThreePointersMade']
-    num_factor1 = tm_fg_others + (0.5 * tm_3p_others)
-    factor_1 = 2 * np.divide(num_factor1, tm_fg_others, out=np.zeros_like(num_factor1, dtype=float), where=tm_fg_others!=0)
-    factor_2_pprod = 0.5 * np.divide(tm_pts_others, (2 * tm_fga_others), out=np.zeros_like(tm_pts_others, dtype=float), where=tm_fga_others!=0)
-    PProd_AST_Part = factor_1 * factor_2_pprod * totals['sAssists']
-    base_orb = totals['sReboundsOffensive'] * Team_ORB_Weight * Team_Play_Perc
-    team_pps = np.divide(Tm_PTS, Team_Scoring_Poss, out=np.zeros_like(Tm_PTS, dtype=float), where=Team_Scoring_Poss!=0)
-    PProd_ORB_Part = base_orb * team_pps
-    totals['PProd'] = (PProd_FG_Part + PProd_AST_Part + totals['sFreeThrowsMade']) * ORB_Adj + PProd_ORB_Part
-    FGxPoss = (totals['sFieldGoalsAttempted'] - totals['sFieldGoalsMade']) * (1 - 1.07 * Team_ORB_Perc)
-    ft_rate_calc = np.divide(totals['sFreeThrowsMade'], totals['sFreeThrowsAttempted'], out=np.zeros_like(totals['sFreeThrowsMade'], dtype=float), where=totals['sFreeThrowsAttempted']!=0)
-    FTxPoss = ((1 - ft_rate_calc)**2) * 0.4 * totals['sFreeThrowsAttempted']
-    totals['TotPoss'] = totals['ScPoss'] + FGxPoss + FTxPoss + totals['sTurnovers']
-    totals['ORtg'] = np.divide(totals['PProd'], totals['TotPoss'], out=np.zeros_like(totals['PProd'], dtype=float), where=totals['TotPoss']!=0) * 100
-    totals['Floor%'] = np.divide(totals['ScPoss'], totals['TotPoss'], out=np.zeros_like(totals['ScPoss'], dtype=float), where=totals['TotPoss']!=0) * 100
-    
-    Opp_PTS = (totals['Opp_FG'] * 2) + totals['Opp_3PM'] + totals['Opp_FTM']
-    Team_Defensive_Rating = 100 * np.divide(Opp_PTS, Opp_Poss, out=np.zeros_like(Opp_PTS, dtype=float), where=Opp_Poss!=0)
-    denom_dor_perc = totals['Opp_ORB'] + totals['Tm_DRB']
-    DOR_Perc = np.divide(totals['Opp_ORB'], denom_dor_perc, out=np.zeros_like(totals['Opp_ORB'], dtype=float), where=denom_dor_perc!=0)
-    DFG_Perc = np.divide(totals['Opp_FG'], totals['Opp_FGA'], out=np.zeros_like(totals['Opp_FG'], dtype=float), where=totals['Opp_FGA']!=0)
-    den_fmwt = ( DFG_Perc * ( 1 - DOR_Perc ) + ( 1 - DFG_Perc ) * DOR_Perc )
-    FMwt = np.divide( ( DFG_Perc * ( 1 - DOR_Perc ) ), den_fmwt, out=np.zeros_like(DFG_Perc, dtype=float), where=den_fmwt!=0)
-    stops_1 = totals['sSteals'] + totals['sBlocks'] * FMwt * ( 1 - 1.07 * DOR_Perc ) + totals['sReboundsDefensive'] * ( 1 - FMwt )
-    den_tm_pf = totals['Tm_PF']
-    stops_2 = (
-        (np.divide( ( totals['Opp_FGA'] - totals['Opp_FG'] - totals['Tm_BLK'] ), totals['Tm_MIN'], out=np.zeros_like(totals['Opp_FGA'], dtype=float), where=totals['Tm_MIN']!=0) * FMwt * ( 1 - 1.07 * DOR_Perc ))
-        + ( np.divide( ( totals['Opp_TOV'] - totals['Tm_STL'] ), totals['Tm_MIN'], out=np.zeros_like(totals['Opp_TOV'], dtype=float), where=totals['Tm_MIN']!=0 ))
-    ) * totals['sMinutes'] + ( np.divide( totals['sFoulsPersonal'], den_tm_pf, out=np.zeros_like(totals['sFoulsPersonal'], dtype=float), where=den_tm_pf!=0 ) * 0.4 * totals['Opp_FTA'] * ( 1 - ( np.divide( totals['Opp_FTM'], totals['Opp_FTA'], out=np.zeros_like(totals['Opp_FTM'], dtype=float), where=totals['Opp_FTA']!=0 ) ) ) ** 2 )
-    Stops = stops_1 + stops_2
-    Stop_Perc = np.divide( (Stops * totals['Opp_MIN']), (totals['Tm_Poss'] * totals['sMinutes']), out=np.zeros_like(Stops, dtype=float), where=(totals['Tm_Poss'] * totals['sMinutes'])!=0)
-    Opp_Scoring_Poss = totals['Opp_FG'] + ( 1 - ( 1 - ( np.divide( totals['Opp_FTM'], totals['Opp_FTA'], out=np.zeros_like(totals['Opp_FTM'], dtype=float), where=totals['Opp_FTA']!=0 ) ) ) ** 2 ) * totals['Opp_FTA'] * 0.4
-    D_Pts_per_ScPoss = np.divide(Opp_PTS, Opp_Scoring_Poss, out=np.zeros_like(Opp_PTS, dtype=float), where=Opp_Scoring_Poss!=0)
-    totals['DRtg'] = Team_Defensive_Rating + 0.2 * (100 * D_Pts_per_ScPoss * (1 - Stop_Perc) - Team_Defensive_Rating)
-
-    totals['ORB%'] = np.divide((totals['sReboundsOffensive'] * tm_min_5), denom_orb, out=np.zeros_like(totals['sReboundsOffensive'], dtype=float), where=denom_orb!=0) * 100
-    denom_drb = totals['Tm_DRB'] + totals['Opp_ORB']
-    totals['DRB%'] = np.divide((totals['sReboundsDefensive'] * tm_min_5), denom_drb, out=np.zeros_like(totals['sReboundsDefensive'], dtype=float), where=denom_drb!=0) * 100
-    denom_trb = totals['Tm_TRB'] + totals['Opp_TRB']
-    totals['TRB%'] = np.divide((totals['sReboundsTotal'] * tm_min_5), denom_trb, out=np.zeros_like(totals['sReboundsTotal'], dtype=float), where=denom_trb!=0) * 100
-    denom_ast = ((totals['sMinutes'] / tm_min_5) * totals['Tm_FG']) - totals['sFieldGoalsMade']
-    totals['AST%'] = np.divide(totals['sAssists'], denom_ast, out=np.zeros_like(totals['sAssists'], dtype=float), where=denom_ast!=0) * 100
-    denom_blk = totals['Opp_FGA'] - totals['Opp_3PA']
-    totals['BLK%'] = np.divide((totals['sBlocks'] * tm_min_5), denom_blk, out=np.zeros_like(totals['sBlocks'], dtype=float), where=denom_blk!=0) * 100
-    totals['STL%'] = np.divide((totals['sSteals'] * tm_min_5), totals['Opp_POSS'], out=np.zeros_like(totals['sSteals'], dtype=float), where=totals['Opp_POSS']!=0) * 100
-
-    totals['FG3r'] = np.divide(totals['sThreePointersMade'], totals['sFieldGoalsAttempted'], out=np.zeros_like(totals['sThreePointersMade'], dtype=float), where=totals['sFieldGoalsAttempted']!=0)
-    foul_ratio = np.divide(totals['Tm_FTA'], totals['Opp_PF'], out=np.zeros_like(totals['Tm_FTA'], dtype=float), where=totals['Opp_PF']!=0)
-    foul_ratio = np.where(foul_ratio == 0, 1.0, foul_ratio) 
-    part_ft = np.divide(totals['sFreeThrowsAttempted'], foul_ratio, out=np.zeros_like(totals['sFreeThrowsAttempted'], dtype=float), where=foul_ratio!=0)
-    part_ast = totals['sAssists'] / 0.17
-    totals['Touches'] = totals['sFieldGoalsAttempted'] + totals['sTurnovers'] + part_ft + part_ast
-    totals['Touches_Per_Game'] = np.divide(totals['Touches'], totals['GP'], out=np.zeros_like(totals['Touches'], dtype=float), where=totals['GP']!=0)
-    touches_total = totals['Touches']
-    totals['%Pass'] = np.divide(part_ast, touches_total, out=np.zeros_like(part_ast, dtype=float), where=touches_total!=0) * 100
-    totals['%Shoot'] = np.divide(totals['sFieldGoalsAttempted'], touches_total, out=np.zeros_like(totals['sFieldGoalsAttempted'], dtype=float), where=touches_total!=0) * 100
-    totals['%Fouled'] = np.divide(part_ft, touches_total, out=np.zeros_like(part_ft, dtype=float), where=touches_total!=0) * 100
-    totals['%TO'] = np.divide(totals['sTurnovers'], touches_total, out=np.zeros_like(totals['sTurnovers'], dtype=float), where=touches_total!=0) * 100
-    totals['eFG%'] = np.divide((totals['sFieldGoalsMade'] + 0.5 * totals['sThreePointersMade']), totals['sFieldGoalsAttempted'], out=np.zeros_like(totals['sFieldGoalsMade'], dtype=float), where=totals['sFieldGoalsAttempted']!=0) * 100
-    poss = totals['sFieldGoalsAttempted'] + (0.44 * totals['sFreeThrowsAttempted']) + totals['sTurnovers']
-    totals['TOV%'] = np.divide(totals['sTurnovers'], poss, out=np.zeros_like(totals['sTurnovers'], dtype=float), where=poss!=0) * 100
-    totals['FTr'] = np.divide(totals['sFreeThrowsMade'], totals['sFieldGoalsAttempted'], out=np.zeros_like(totals['sFreeThrowsMade'], dtype=float), where=totals['sFieldGoalsAttempted']!=0)
-    tsa = 2 * (totals['sFieldGoalsAttempted'] + 0.44 * totals['sFreeThrowsAttempted'])
-    totals['TS%'] = np.divide(totals['sPoints'], tsa, out=np.zeros_like(totals['sPoints'], dtype=float), where=tsa!=0) * 100
-    totals['PF/40'] = np.divide(totals['sFoulsPersonal'], totals['sMinutes'], out=np.zeros_like(totals['sFoulsPersonal'], dtype=float), where=totals['sMinutes']!=0) * 40
-    pp_shot = (totals['sTwoPointersMade'] * 2) + (totals['sThreePointersMade'] * 3)
-    totals['PtsXShot'] = np.divide(pp_shot, totals['sFieldGoalsAttempted'], out=np.zeros_like(pp_shot, dtype=float), where=totals['sFieldGoalsAttempted']!=0)
-    usg_den_player = totals['sMinutes'] * (totals['Tm_FGA'] + 0.44 * totals['Tm_FTA'] + totals['Tm_TOV'])
-    usg_num_player = (totals['sFieldGoalsAttempted'] + 0.44 * totals['sFreeThrowsAttempted'] + totals['sTurnovers']) * (totals['Tm_MIN'] / 5)
-    totals['USG%'] = np.divide(usg_num_player, usg_den_player, out=np.zeros_like(usg_num_player, dtype=float), where=usg_den_player!=0) * 100
-
-    cols_clean = ['ORtg', 'DRtg', 'Floor%', 'eFG%', 'TOV%', 'FTr', 'TS%', 'PF/40', 'PtsXShot', 'USG%', 'ORB%', 'DRB%', 'TRB%', 'AST%', 'BLK%', 'STL%', 'FG3r', '%Pass', '%Shoot', '%Fouled', '%TO']
-    totals[cols_clean] = totals[cols_clean].fillna(0.0)
+    # --- 3-4. TOTALES Y CÁLCULOS DEAN OLIVER (memorizados por versión de datos + categoría/equipo/ventana) ---
+    # El resultado es compartido entre sesiones: se trabaja sobre una copia local
+    totals = calcular_avanzadas(categoria_sel, equipo_filtro, ventana).copy()
 
     # --- 5. ENRIQUECIMIENTO ---
     totals['id_player_str'] = totals['id_player'].astype(str)
@@ -3,13 +3,49 @@ import pandas as pd
 import numpy as np
 import math
 import modules.utils as utils 
+from modules.data_loader import declarar_columnas, TABLA_MASTER, TABLA_PLAYERS, TABLA_ROSTERS
+from modules.agregaciones import ventanas_jugador, promedios_por_jugador_sql
+from modules.almacen import memorizado
+
+# --- COLUMNAS QUE USA ESTA VISTA (el loader solo descarga la unión de todas las vistas) ---
+COLUMNAS_MASTER = declarar_columnas(TABLA_MASTER, [
+    'id_player', 'Nombre', 'equipo_nombre', 'id_abe', 'Fecha', 'sMinutes', 'starter',
+    'sPoints', 'sFieldGoalsMade', 'sFieldGoalsAttempted', 'sTwoPointersMade', 'sThreePointersMade',
+    'sFreeThrowsMade', 'sFreeThrowsAttempted', 'sReboundsOffensive', 'sReboundsDefensive',
+    'sReboundsTotal', 'sAssists', 'sTurnovers', 'sSteals', 'sBlocks', 'sFoulsPersonal',
+    'sTwoPointersAttempted', 'sThreePointersAttempted', 'sFoulsOn',
+])
+COLUMNAS_PLAYERS = declarar_columnas(TABLA_PLAYERS, ['player_id', 'height_cm', 'weight_kg'])
+COLUMNAS_ROSTERS = declarar_columnas(TABLA_ROSTERS, ['player_id', 'effective_start_date', 'playing_position'])
+
+@memorizado
+def calcular_leaderboard(categoria_sel, equipo_filtro, ventana):
+    """Promedios por jugador de los últimos `ventana` juegos (None = todos) con porcentajes de tiro."""
+    equipo = None if equipo_filtro == "Todos" else equipo_filtro
+    # En Postgres si está configurado (solo viajan las filas agregadas); si no, con las sumas
+    # acumuladas de la categoría/equipo (cambiar de ventana no vuelve a ordenar ni agrupar)
+    leaderboard = promedios_por_jugador_sql(categoria_sel, equipo, ventana)
+    if leaderboard is None:
+        leaderboard = ventanas_jugador(categoria_sel, equipo).promedios(ventana)
+
+    leaderboard.rename(columns={'id_abe': 'GP', 'sMinutes': 'MPG', 'starter': 'JT', 'sFieldGoalsMade': 'FGM', 'sFieldGoalsAttempted': 'FGA', 'sTwoPointersMade': '2PM', 'sTwoPointersAttempted': '2PA', 'sThreePointersAttempted': '3PA', 'sFreeThrowsMade': 'FTM', 'sFreeThrowsAttempted': 'FTA', 'sReboundsOffensive': 'RBO', 'sReboundsDefensive': 'RBD', 'sTurnovers': 'TOV', 'sSteals': 'STL', 'sBlocks': 'BLK', 'sFoulsPersonal': 'PF', 'sFoulsOn': 'PFR'}, inplace=True)
+
+    def calc_pct(num, den):
+        return np.divide(num, den, out=np.zeros_like(num, dtype=float), where=den!=0) * 100
+
+    leaderboard['FG%'] = calc_pct(leaderboard['FGM'], leaderboard['FGA'])
+    leaderboard['2P%'] = calc_pct(leaderboard['2PM'], leaderboard['2PA'])
+    leaderboard['3P%'] = calc_pct(leaderboard['sThreePointersMade'], leaderboard['3PA'])
+    leaderboard['FT%'] = calc_pct(leaderboard['FTM'], leaderboard['FTA'])
+    return leaderboard
 
 def render_view(df, df_players, df_rosters, categoria_sel):
     st.title(f"Leaderboard por partido | {categoria_sel}")
 
     # --- 0. PREPARACIÓN DE METADATA ---
-    df_players['player_id_str'] = df_players['player_id'].astype(str)
-    df_rosters['player_id_str'] = df_rosters['player_id'].astype(str)
+    # Los frames vienen del almacén compartido: se trabaja sobre copias locales
+    df_players = df_players.assign(player_id_str=df_players['player_id'].astype(str))
+    df_rosters = df_rosters.assign(player_id_str=df_rosters['player_id'].astype(str))
     
     mapa_posicion = {}
     if not df_rosters.empty:
@@ -26,7 +62,7 @@ def render_view(df, df_players, df_rosters, categoria_sel):
         mapa_peso = pd.Series(df_players.weight_kg.values, index=df_players.player_id_str).to_dict()
 
     # --- 1. FILTROS BÁSICOS ---
-    max_games_found = df.groupby('equipo_nombre')['id_abe'].nunique().max()
+    max_games_found = df.groupby('equipo_nombre', observed=True)['id_abe'].nunique().max()
     if not max_games_found or pd.isna(max_games_found): max_games_found = 1
     else: max_games_found = int(max_games_found)
 
@@ -54,7 +90,7 @@ def render_view(df, df_players, df_rosters, categoria_sel):
         df_active_context['h_clean'] = df_active_context['h'].replace(0, np.nan)
         df_active_context['w_clean'] = df_active_context['w'].replace(0, np.nan)
         
-        team_stats_context = df_active_context.groupby('equipo_nombre').agg({
+        team_stats_context = df_active_context.groupby('equipo_nombre', observed=True).agg({
             'id_player': 'count', 'h_clean': 'mean', 'w_clean': 'mean'
         }).reset_index()
         
@@ -88,43 +124,21 @@ def render_view(df, df_players, df_rosters, categoria_sel):
     else:
         df_view = df
 
-    df_active_games = df_view[df_view['sMinutes'] > 0].copy()
-    if games_window < max_games_found:
-        df_active_games = df_active_games.sort_values(by='Fecha', ascending=False)
-        df_active_games = df_active_games.groupby('id_player').head(games_window)
+    ventana = games_window if games_window < max_games_found else None
 
     if games_window < max_games_found:
         threshold_games = math.ceil(games_window * 0.40)
     else:
         if equipo_filtro != "Todos":
-            base_games = df_view.groupby('equipo_nombre')['id_abe'].nunique().max()
+            base_games = df_view.groupby('equipo_nombre', observed=True)['id_abe'].nunique().max()
         else:
-            base_games = df_view.groupby('equipo_nombre')['id_abe'].nunique().min()
+            base_games = df_view.groupby('equipo_nombre', observed=True)['id_abe'].nunique().min()
         if pd.isna(base_games): base_games = 1
         threshold_games = math.ceil(base_games * 0.50)
 
-    # --- 3. AGRUPACIÓN ---
-    leaderboard = df_active_games.groupby(['id_player', 'Nombre', 'equipo_nombre']).agg({
-        'sPoints': 'mean', 'sReboundsTotal': 'mean', 'sAssists': 'mean',
-        'sThreePointersMade': 'mean', 'sMinutes': 'mean', 'starter': 'sum',
-        'sFieldGoalsMade': 'mean', 'sFieldGoalsAttempted': 'mean',
-        'sTwoPointersMade': 'mean', 'sTwoPointersAttempted': 'mean',
-        'sThreePointersAttempted': 'mean', 'sFreeThrowsMade': 'mean',
-        'sFreeThrowsAttempted': 'mean', 'sReboundsOffensive': 'mean',
-        'sReboundsDefensive': 'mean', 'sTurnovers': 'mean', 'sSteals': 'mean',
-        'sBlocks': 'mean', 'sFoulsPersonal': 'mean', 'sFoulsOn': 'mean',
-        'id_abe': 'count'
-    }).reset_index()
-
-    leaderboard.rename(columns={'id_abe': 'GP', 'sMinutes': 'MPG', 'starter': 'JT', 'sFieldGoalsMade': 'FGM', 'sFieldGoalsAttempted': 'FGA', 'sTwoPointersMade': '2PM', 'sTwoPointersAttempted': '2PA', 'sThreePointersAttempted': '3PA', 'sFreeThrowsMade': 'FTM', 'sFreeThrowsAttempted': 'FTA', 'sReboundsOffensive': 'RBO', 'sReboundsDefensive': 'RBD', 'sTurnovers': 'TOV', 'sSteals': 'STL', 'sBlocks': 'BLK', 'sFoulsPersonal': 'PF', 'sFoulsOn': 'PFR'}, inplace=True)
-
-    def calc_pct(num, den):
-        return np.divide(num, den, out=np.zeros_like(num, dtype=float), where=den!=0) * 100
-
-    leaderboard['FG%'] = calc_pct(leaderboard['FGM'], leaderboard['FGA'])
-    leaderboard['2P%'] = calc_pct(leaderboard['2PM'], leaderboard['2PA'])
-    leaderboard['3P%'] = calc_pct(leaderboard['sThreePointersMade'], leaderboard['3PA'])
-    leaderboard['FT%'] = calc_pct(leaderboard['FTM'], leaderboard['FTA'])
+    # --- 3. AGRUPACIÓN (memorizada por versión de datos + categoría/equipo/ventana) ---
+    # El resultado es compartido entre sesiones: se trabaja sobre una copia local
+    leaderboard = calcular_leaderboard(categoria_sel, equipo_filtro, ventana).copy()
 
     # --- 4. ENRIQUECIMIENTO ---
     leaderboard['id_player_str'] = leaderboard['id_player'].astype(str)
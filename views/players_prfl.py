@@ -3,6 +3,28 @@ import pandas as pd
 import numpy as np
 import altair as alt
 from datetime import datetime
+from modules.data_loader import declarar_columnas, con_datos_de_equipo, columnas_master, TABLA_MASTER, TABLA_PLAYERS, TABLA_ROSTERS
+from modules.metricas import metricas_tiro, porcentaje
+
+# --- COLUMNAS QUE USA ESTA VISTA (el loader solo descarga la unión de todas las vistas) ---
+COLUMNAS_MASTER = declarar_columnas(TABLA_MASTER, [
+    'id_player', 'Nombre', 'equipo_nombre', 'id_abe', 'Fecha', 'sMinutes', 'starter',
+    'sPoints', 'sFieldGoalsMade', 'sFieldGoalsAttempted', 'sTwoPointersMade', 'sThreePointersMade',
+    'sFreeThrowsMade', 'sFreeThrowsAttempted', 'sReboundsOffensive', 'sReboundsDefensive',
+    'sReboundsTotal', 'sAssists', 'sTurnovers', 'sSteals', 'sBlocks', 'sFoulsPersonal',
+    'sTwoPointersAttempted', 'sThreePointersAttempted', 'sFoulsOn',
+    'Tm_FGA', 'Tm_FTA', 'Tm_TOV', 'Tm_MIN', 'Tm_FG', 'Tm_ORB', 'Tm_DRB', 'Tm_TRB',
+    'Tm_AST', 'Tm_STL', 'Tm_BLK', 'Tm_3PM', 'Tm_FTM', 'Tm_2PM', 'Tm_3PA', 'Tm_PF',
+    'Opp_DRB', 'Opp_ORB', 'Opp_TRB', 'Opp_FGA', 'Opp_FG', 'Opp_3PA', 'Opp_3PM',
+    'Opp_PF', 'Opp_FTA', 'Opp_FTM', 'Opp_TOV', 'Opp_MIN',
+    'Opp_Name', 'Tm_Score', 'Opp_Score',
+])
+COLUMNAS_PLAYERS = declarar_columnas(TABLA_PLAYERS, [
+    'player_id', 'first_name', 'family_name', 'date_of_birth', 'height_cm', 'weight_kg', 'nationality',
+])
+COLUMNAS_ROSTERS = declarar_columnas(TABLA_ROSTERS, [
+    'player_id', 'equipo_id', 'shirt_number', 'playing_position', 'effective_start_date',
+])
 
 # --- IMPORTACIÓN DEL LOGGER ---
 # Ajusta esto si tu función está en otro archivo o se llama distinto
@@ -19,8 +41,9 @@ def render_view(id_jugador, df_games, df_players, df_rosters, df_teams):
     # Usamos el ID dinámico que viene de main.py
     pid_str = str(id_jugador)
     
-    df_players['player_id_str'] = df_players['player_id'].astype(str)
-    df_rosters['player_id_str'] = df_rosters['player_id'].astype(str)
+    # Los frames vienen del almacén compartido: se trabaja sobre copias locales
+    df_players = df_players.assign(player_id_str=df_players['player_id'].astype(str))
+    df_rosters = df_rosters.assign(player_id_str=df_rosters['player_id'].astype(str))
     
     # Buscar Datos Personales
     player_data = df_players[df_players['player_id_str'] == pid_str]
@@ -49,9 +72,8 @@ def render_view(id_jugador, df_games, df_players, df_rosters, df_teams):
         # Cruce con Equipos
         if equipo_id_encontrado is not None and not df_teams.empty:
             if 'equipo_id' in df_teams.columns:
-                df_teams['equipo_id_str'] = df_teams['equipo_id'].astype(str).str.strip()
                 id_buscado = str(equipo_id_encontrado).strip()
-                team_match = df_teams[df_teams['equipo_id_str'] == id_buscado]
+                team_match = df_teams[df_teams['equipo_id'].astype(str).str.strip() == id_buscado]
                 if not team_match.empty:
                     equipo_nombre = team_match.iloc[0].get('nombre', 'Nombre no encontrado')
                 else:
@@ -80,8 +102,8 @@ def render_view(id_jugador, df_games, df_players, df_rosters, df_teams):
         max_games = 0
     else:
         if 'id_player' in df_games.columns:
-            df_games['id_player_str'] = df_games['id_player'].astype(str)
-            df_player_stats = df_games[df_games['id_player_str'] == pid_str].copy()
+            df_player_stats = con_datos_de_equipo(df_games[df_games['id_player'].astype(str) == pid_str], columnas_master()).copy()
+            df_player_stats['id_player_str'] = pid_str
             df_player_stats['sMinutes'] = pd.to_numeric(df_player_stats['sMinutes'], errors='coerce').fillna(0)
             df_active_games = df_player_stats[df_player_stats['sMinutes'] > 0].copy()
             
@@ -165,11 +187,10 @@ def render_view(id_jugador, df_games, df_players, df_rosters, df_teams):
 
     leaderboard.rename(columns={'id_abe': 'GP', 'sMinutes': 'MPG', 'starter': 'JT', 'sFieldGoalsMade': 'FGM', 'sFieldGoalsAttempted': 'FGA', 'sTwoPointersMade': '2PM', 'sTwoPointersAttempted': '2PA', 'sThreePointersAttempted': '3PA', 'sFreeThrowsMade': 'FTM', 'sFreeThrowsAttempted': 'FTA', 'sReboundsOffensive': 'RBO', 'sReboundsDefensive': 'RBD', 'sTurnovers': 'TOV', 'sSteals': 'STL', 'sBlocks': 'BLK', 'sFoulsPersonal': 'PF', 'sFoulsOn': 'PFR'}, inplace=True)
 
-    def calc_pct(num, den): return np.divide(num, den, out=np.zeros_like(num, dtype=float), where=den!=0) * 100
-    leaderboard['FG%'] = calc_pct(leaderboard['FGM'], leaderboard['FGA'])
-    leaderboard['2P%'] = calc_pct(leaderboard['2PM'], leaderboard['2PA'])
-    leaderboard['3P%'] = calc_pct(leaderboard['sThreePointersMade'], leaderboard['3PA'])
-    leaderboard['FT%'] = calc_pct(leaderboard['FTM'], leaderboard['FTA'])
+    leaderboard['FG%'] = porcentaje(leaderboard['FGM'], leaderboard['FGA'])
+    leaderboard['2P%'] = porcentaje(leaderboard['2PM'], leaderboard['2PA'])
+    leaderboard['3P%'] = porcentaje(leaderboard['sThreePointersMade'], leaderboard['3PA'])
+    leaderboard['FT%'] = porcentaje(leaderboard['FTM'], leaderboard['FTA'])
 
     cols_order = ["GP", "JT", "MPG", "FGM", "FGA", "FG%", "2PM", "2PA", "2P%", "3PM", "3PA", "3P%", "FTM", "FTA", "FT%", "RBO", "RBD", "sReboundsTotal", "sAssists", "TOV", "STL", "BLK", "PF", "PFR", "sPoints"]
     leaderboard['3PM'] = leaderboard['sThreePointersMade']
@@ -212,15 +233,8 @@ def render_view(id_jugador, df_games, df_players, df_rosters, df_teams):
     }).reset_index()
 
     if not totals.empty:
-        totals['eFG%'] = np.divide((totals['sFieldGoalsMade'] + 0.5 * totals['sThreePointersMade']), totals['sFieldGoalsAttempted'], out=np.zeros_like(totals['sFieldGoalsMade'], dtype=float), where=totals['sFieldGoalsAttempted']!=0) * 100
-        tsa = 2 * (totals['sFieldGoalsAttempted'] + 0.44 * totals['sFreeThrowsAttempted'])
-        totals['TS%'] = np.divide(totals['sPoints'], tsa, out=np.zeros_like(totals['sPoints'], dtype=float), where=tsa!=0) * 100
-        pp_shot = (totals['sTwoPointersMade'] * 2) + (totals['sThreePointersMade'] * 3)
-        totals['PtsXShot'] = np.divide(pp_shot, totals['sFieldGoalsAttempted'], out=np.zeros_like(pp_shot, dtype=float), where=totals['sFieldGoalsAttempted']!=0)
-        
-        usg_den = totals['sMinutes'] * (totals['Tm_FGA'] + 0.44 * totals['Tm_FTA'] + totals['Tm_TOV'])
-        usg_num = (totals['sFieldGoalsAttempted'] + 0.44 * totals['sFreeThrowsAttempted'] + totals['sTurnovers']) * (totals['Tm_MIN'] / 5)
-        totals['USG%'] = np.divide(usg_num, usg_den, out=np.zeros_like(usg_num, dtype=float), where=usg_den!=0) * 100
+        # Motor compartido (modules/metricas.py): mismas fórmulas que players_adv
+        totals = totals.join(metricas_tiro(totals)[['eFG%', 'TS%', 'PtsXShot', 'USG%']])
 
         cols_blindaje = ['USG%', 'TS%', 'eFG%', 'PtsXShot']
         for c in cols_blindaje:
@@ -279,37 +293,11 @@ def render_view(id_jugador, df_games, df_players, df_rosters, df_teams):
             emojis = np.select(condiciones, elecciones, default='➖ ')
             df_filtered_games[col_rival_final] = emojis + df_filtered_games[col_rival_final]
 
-        # CÁLCULOS FILA POR FILA (NUMÉRICOS PRIMERO)
-        if 'sFieldGoalsAttempted' in df_filtered_games.columns:
-            df_filtered_games['FG%_val'] = np.where(df_filtered_games['sFieldGoalsAttempted'] > 0, (df_filtered_games['sFieldGoalsMade'] / df_filtered_games['sFieldGoalsAttempted']) * 100, 0.0)
-        
-        if 'sThreePointersAttempted' in df_filtered_games.columns:
-            df_filtered_games['3P%_val'] = np.where(df_filtered_games['sThreePointersAttempted'] > 0, (df_filtered_games['sThreePointersMade'] / df_filtered_games['sThreePointersAttempted']) * 100, 0.0)
-
-        if 'sFreeThrowsAttempted' in df_filtered_games.columns:
-            df_filtered_games['FT%_val'] = np.where(df_filtered_games['sFreeThrowsAttempted'] > 0, (df_filtered_games['sFreeThrowsMade'] / df_filtered_games['sFreeThrowsAttempted']) * 100, 0.0)
-
-        if 'sFieldGoalsAttempted' in df_filtered_games.columns:
-            num_efg = df_filtered_games['sFieldGoalsMade'] + 0.5 * df_filtered_games['sThreePointersMade']
-            den_efg = df_filtered_games['sFieldGoalsAttempted']
-            df_filtered_games['eFG%_val'] = np.divide(num_efg, den_efg, out=np.zeros_like(num_efg, dtype=float), where=den_efg!=0) * 100
-
-        if 'sPoints' in df_filtered_games.columns:
-            tsa = 2 * (df_filtered_games['sFieldGoalsAttempted'] + 0.44 * df_filtered_games['sFreeThrowsAttempted'])
-            df_filtered_games['TS%_val'] = np.divide(df_filtered_games['sPoints'], tsa, out=np.zeros_like(tsa, dtype=float), where=tsa!=0) * 100
-
-        if 'sFieldGoalsAttempted' in df_filtered_games.columns:
-            pts_shots = (df_filtered_games['sTwoPointersMade'] * 2) + (df_filtered_games['sThreePointersMade'] * 3)
-            den_pps = df_filtered_games['sFieldGoalsAttempted']
-            df_filtered_games['PPS_val'] = np.divide(pts_shots, den_pps, out=np.zeros_like(den_pps, dtype=float), where=den_pps!=0)
-
-        tm_cols = ['Tm_FGA', 'Tm_FTA', 'Tm_TOV', 'Tm_MIN']
-        if all(col in df_filtered_games.columns for col in tm_cols):
-            usg_num = (df_filtered_games['sFieldGoalsAttempted'] + 0.44 * df_filtered_games['sFreeThrowsAttempted'] + df_filtered_games['sTurnovers']) * (df_filtered_games['Tm_MIN'] / 5)
-            usg_den = df_filtered_games['sMinutes'] * (df_filtered_games['Tm_FGA'] + 0.44 * df_filtered_games['Tm_FTA'] + df_filtered_games['Tm_TOV'])
-            df_filtered_games['USG%_val'] = np.divide(usg_num, usg_den, out=np.zeros_like(usg_num, dtype=float), where=usg_den!=0) * 100
-        else:
-            df_filtered_games['USG%_val'] = 0.0
+        # CÁLCULOS FILA POR FILA (NUMÉRICOS PRIMERO, motor compartido de modules/metricas.py)
+        tiro = metricas_tiro(df_filtered_games)
+        for col, col_val in [('FG%', 'FG%_val'), ('3P%', '3P%_val'), ('FT%', 'FT%_val'), ('eFG%', 'eFG%_val'),
+                             ('TS%', 'TS%_val'), ('PtsXShot', 'PPS_val'), ('USG%', 'USG%_val')]:
+            df_filtered_games[col_val] = tiro[col]
 
         # FORMATEO VISUAL (STRING)
         def format_pct(made, att): return f"{(made/att)*100:.1f}%" if att > 0 else "-"
@@ -380,36 +368,10 @@ def render_view(id_jugador, df_games, df_players, df_rosters, df_teams):
         # 1. Preparar data ASCENDENTE
         df_trends = df_filtered_games.sort_values('Fecha', ascending=True).copy()
         
-        # Calcular 2P% (Faltaba)
-        if 'sTwoPointersAttempted' in df_trends.columns:
-            df_trends['2P%_val'] = np.where(df_trends['sTwoPointersAttempted'] > 0, 
-                                            (df_trends['sTwoPointersMade'] / df_trends['sTwoPointersAttempted']) * 100, 
-                                            0.0)
-        else:
-            df_trends['2P%_val'] = 0.0
-
-        # Recalcular valores si no existen (copia de seguridad)
-        if 'sFieldGoalsAttempted' in df_trends.columns:
-            df_trends['FG%_val'] = np.where(df_trends['sFieldGoalsAttempted'] > 0, (df_trends['sFieldGoalsMade'] / df_trends['sFieldGoalsAttempted']) * 100, 0.0)
-            num_efg = df_trends['sFieldGoalsMade'] + 0.5 * df_trends['sThreePointersMade']
-            df_trends['eFG%_val'] = np.divide(num_efg, df_trends['sFieldGoalsAttempted'], out=np.zeros_like(num_efg, dtype=float), where=df_trends['sFieldGoalsAttempted']!=0) * 100
-
-        if 'sThreePointersAttempted' in df_trends.columns:
-            df_trends['3P%_val'] = np.where(df_trends['sThreePointersAttempted'] > 0, (df_trends['sThreePointersMade'] / df_trends['sThreePointersAttempted']) * 100, 0.0)
-
-        if 'sFreeThrowsAttempted' in df_trends.columns:
-            df_trends['FT%_val'] = np.where(df_trends['sFreeThrowsAttempted'] > 0, (df_trends['sFreeThrowsMade'] / df_trends['sFreeThrowsAttempted']) * 100, 0.0)
-
-        if 'sPoints' in df_trends.columns:
-            tsa = 2 * (df_trends['sFieldGoalsAttempted'] + 0.44 * df_trends['sFreeThrowsAttempted'])
-            df_trends['TS%_val'] = np.divide(df_trends['sPoints'], tsa, out=np.zeros_like(tsa, dtype=float), where=tsa!=0) * 100
-
-        if all(col in df_trends.columns for col in ['Tm_FGA', 'Tm_FTA', 'Tm_TOV', 'Tm_MIN']):
-            usg_num = (df_trends['sFieldGoalsAttempted'] + 0.44 * df_trends['sFreeThrowsAttempted'] + df_trends['sTurnovers']) * (df_trends['Tm_MIN'] / 5)
-            usg_den = df_trends['sMinutes'] * (df_trends['Tm_FGA'] + 0.44 * df_trends['Tm_FTA'] + df_trends['Tm_TOV'])
-            df_trends['USG%_val'] = np.divide(usg_num, usg_den, out=np.zeros_like(usg_num, dtype=float), where=usg_den!=0) * 100
-        else:
-            df_trends['USG%_val'] = 0.0
+        # Porcentajes por juego (motor compartido de modules/metricas.py)
+        tiro = metricas_tiro(df_trends)
+        for col in ['FG%', '2P%', '3P%', 'FT%', 'eFG%', 'TS%', 'USG%']:
+            df_trends[f'{col}_val'] = tiro[col]
 
         # Construir dataframe de gráfica
         df_trends['Fecha_Str'] = df_trends['Fecha'].dt.strftime('%d/%m/%y')